@@ -0,0 +1,263 @@
+import argparse
+import glob
+import os
+import sys
+
+import instellingen
+
+# Stel encoding in voor Windows console
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+
+# De commando's importeren pandas, requests e.d. pas bij het uitvoeren (in run_*), zodat --help en
+# fouten in de argumenten direct gemeld worden. Dezelfde opties gelden voor excel_to_json.py en
+# nearest_employees.py als die los worden aangeroepen.
+
+
+def add_geocoder_arguments(parser):
+    """Keuze en instellingen van de geocoding provider (gedeeld door alle commando's)"""
+    parser.add_argument('--geocoder', choices=sorted(instellingen.GEOCODE_PROVIDERS), default='nominatim',
+                        help="Geocoding provider (bepaalt standaard URL, rate limit en aantal workers)")
+    parser.add_argument('--geocode-url', help="Nominatim-compatibel /search endpoint (overschrijft de provider URL)")
+    parser.add_argument('--geocode-rate', type=float, help="Maximaal aantal requests per seconde (0 = onbeperkt)")
+    parser.add_argument('--geocode-workers', type=int, help="Aantal gelijktijdige geocoding requests")
+
+
+def add_convert_arguments(parser):
+    """Opties van convert: medewerker Excel -> adressen.json"""
+    parser.add_argument('--excel', nargs='+', default=[instellingen.excel_path], metavar='BESTAND',
+                        help="Excel bestand(en) met medewerker adressen, ook glob patronen zoals 'regio_*.xlsx'; "
+                             "meerdere bestanden worden tegelijk ingelezen en samengevoegd (standaard %s)"
+                             % instellingen.excel_path)
+    parser.add_argument('--sheet', action='append', metavar='WERKBLAD',
+                        help="Werkblad om te lezen (herhaalbaar; '*' = alle werkbladen); standaard het eerste werkblad")
+    parser.add_argument('--afas', nargs='+', default=[instellingen.afas_export_path], metavar='BESTAND',
+                        help="AFAS export(s) met de OE namen, ook glob patronen (standaard %s)"
+                             % instellingen.afas_export_path)
+    parser.add_argument('-o', '--output', default=instellingen.output_path,
+                        help="JSON output (standaard %(default)s)")
+    parser.add_argument('--compact', action='store_true',
+                        help="Schrijf de JSON output zonder opmaak (kleiner en sneller; zelfde inhoud)")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Hergebruik ongewijzigde adressen (incl. coördinaten en BU) uit de vorige adressen.json")
+    parser.add_argument('--resume', action='store_true',
+                        help="Ga verder waar een onderbroken run stopte (checkpoint %s, of <output>_checkpoint.jsonl "
+                             "bij -o): al geconverteerde en gegeocodeerde adressen worden overgenomen, als de "
+                             "invoerbestanden niet gewijzigd zijn"
+                             % instellingen.checkpoint_path)
+    add_geocoder_arguments(parser)
+    parser.add_argument('--no-geocode', action='store_true',
+                        help="Geen geocoding: adressen zonder coördinaten (uit Excel, postcode tabel of vorige "
+                             "output) blijven zonder")
+    parser.add_argument('--postcode-table',
+                        help="CSV/Parquet tabel met postcode -> latitude/longitude; adressen met een bekende "
+                             "postcode krijgen de centroid zonder netwerk request")
+    parser.add_argument('--compare-matcher', action='store_true',
+                        help="Vergelijk de geïndexeerde OE matcher met de lineaire scan en stop (geen output)")
+    parser.add_argument('--stream', action='store_true',
+                        help="Lees de Excel bestanden rij voor rij (openpyxl read_only) met beperkt geheugengebruik")
+    parser.add_argument('--chunk-size', type=int, default=5000,
+                        help="Aantal rijen per verwerkingsblok in streaming modus (standaard 5000)")
+    parser.add_argument('--workers', type=int,
+                        help="Aantal processen voor namen formatteren, adressen parsen en OE matching "
+                             "(standaard alle cores vanaf %d rijen, anders 1) en voor het inlezen van meerdere "
+                             "bestanden (standaard alle cores)" % instellingen.PARALLEL_MIN_RIJEN)
+    parser.add_argument('--no-snapshot-cache', action='store_true',
+                        help="Lees de Excel bestanden altijd opnieuw in (geen snapshot cache)")
+    parser.add_argument('--write-excel-names', action='store_true',
+                        help="Schrijf de kolom 'Naam Geformatteerd' terug in het bron Excel bestand "
+                             "(standaard alleen naar %s)" % instellingen.naam_sidecar_path)
+    parser.add_argument('--index', action='store_true',
+                        help="Schrijf daarnaast een compacte ruimtelijke index (%s, of <output>.index.json bij -o)"
+                             % instellingen.spatial_index_path)
+    parser.add_argument('--grid-cell-size', type=float, default=instellingen.SPATIAL_INDEX_CEL_GROOTTE,
+                        help="Celgrootte van de ruimtelijke index (--index) in graden (standaard %(default)s)")
+    parser.add_argument('--clusters', action='store_true',
+                        help="Schrijf daarnaast voorberekende marker clusters per zoomniveau en BU "
+                             "(%s, of <output>.clusters.json bij -o)" % instellingen.cluster_path)
+    parser.add_argument('--cluster-zooms', type=int, nargs=2, metavar=('MIN', 'MAX'),
+                        default=[instellingen.CLUSTER_ZOOM_MIN, instellingen.CLUSTER_ZOOM_MAX],
+                        help="Zoomniveaus (Leaflet) waarvoor --clusters berekend worden (standaard %d %d)"
+                             % (instellingen.CLUSTER_ZOOM_MIN, instellingen.CLUSTER_ZOOM_MAX))
+    parser.add_argument('--shard-by-bu', nargs='?', const=instellingen.shard_dir, metavar='DIR',
+                        help="Schrijf daarnaast geminificeerde, gecomprimeerde shards per BU met manifest "
+                             "(standaard map %s)" % instellingen.shard_dir)
+    parser.add_argument('--delta', nargs='?', const=instellingen.delta_dir, metavar='DIR',
+                        help="Vergelijk met de vorige adressen.json en schrijf een delta (toegevoegd, verwijderd, "
+                             "gewijzigd per ID) met versie manifest (standaard map %s); gebruik samen met "
+                             "--incremental" % instellingen.delta_dir)
+    parser.add_argument('--log-level', choices=sorted(instellingen.LOG_NIVEAUS, key=instellingen.LOG_NIVEAUS.get),
+                        default=instellingen.log_niveau,
+                        help="Meldingen per rij: debug (alles), info (standaard: voortgang en fouten), warning (alleen fouten)")
+    parser.add_argument('--report', default=instellingen.run_report_path,
+                        help="JSON run rapport met tijden en tellers per stap (standaard %(default)s)")
+
+
+def add_geocode_arguments(parser):
+    """Opties van geocode: coördinaten zoeken voor een lijst met adressen"""
+    parser.add_argument('invoer', help="CSV of Excel bestand met adressen (zelfde kolomnamen als het medewerker bestand)")
+    parser.add_argument('-o', '--output', default=instellingen.geocode_output_path,
+                        help="CSV output met latitude/longitude per adres (standaard %(default)s)")
+    add_geocoder_arguments(parser)
+
+
+def add_match_arguments(parser):
+    """Opties van match: de k dichtstbijzijnde medewerkers per adres"""
+    parser.add_argument('queries', help="CSV of Excel bestand met zoekadressen (zelfde kolomnamen als het medewerker bestand)")
+    parser.add_argument('--adressen', default=instellingen.adressen_path,
+                        help="adressen.json met medewerkers (standaard %(default)s)")
+    parser.add_argument('-k', type=int, default=5, help="Aantal dichtstbijzijnde medewerkers per adres (standaard 5)")
+    parser.add_argument('--per-bu', action='store_true', help="Bepaal de k dichtstbijzijnde medewerkers per BU")
+    parser.add_argument('-o', '--output', default=instellingen.nearest_output_path,
+                        help="Output bestand; .json voor JSON, anders CSV (standaard %(default)s)")
+    parser.add_argument('--max-matrix-mb', type=float, default=instellingen.MAX_MATRIX_MB,
+                        help="Maximaal geheugen voor een blok afstanden in MB, inclusief tijdelijke matrices "
+                             "(standaard %(default)s)")
+    add_geocoder_arguments(parser)
+    parser.add_argument('--routing', choices=sorted(instellingen.ROUTING_BACKENDS),
+                        help="Rangschik op reistijd via een routing backend (OSRM /table) en voeg reistijd en rijafstand toe")
+    parser.add_argument('--routing-url', help="Basis URL van de OSRM-compatibele server (overschrijft de backend URL)")
+    parser.add_argument('--routing-profile', help="OSRM profiel (standaard driving)")
+    parser.add_argument('--routing-rate', type=float, help="Maximaal aantal route requests per seconde (0 = onbeperkt)")
+    parser.add_argument('--routing-candidates', type=int, default=instellingen.ROUTING_KANDIDATEN,
+                        help="Aantal hemelsbreed dichtstbijzijnde medewerkers om op reistijd te vergelijken "
+                             "(standaard %(default)s)")
+
+
+def add_pc4_arguments(parser):
+    """Opties van pc4: per PC4 gebied de k dichtstbijzijnde medewerkers vooraf berekenen"""
+    parser.add_argument('postcode_table',
+                        help="CSV/Parquet tabel met PC4 (of PC6) postcodes en latitude/longitude, zelfde formaat "
+                             "als convert --postcode-table")
+    parser.add_argument('--adressen', default=instellingen.adressen_path,
+                        help="adressen.json met medewerkers (standaard %(default)s)")
+    parser.add_argument('-k', type=int, default=instellingen.PC4_K,
+                        help="Aantal dichtstbijzijnde medewerkers per PC4 gebied en per BU (standaard %(default)s)")
+    parser.add_argument('-o', '--output', default=instellingen.pc4_lookup_path,
+                        help="JSON output (standaard %(default)s)")
+    parser.add_argument('--max-matrix-mb', type=float, default=instellingen.MAX_MATRIX_MB,
+                        help="Maximaal geheugen voor een blok afstanden in MB, inclusief tijdelijke matrices "
+                             "(standaard %(default)s)")
+
+
+def add_serve_arguments(parser):
+    """Opties van serve: HTTP service voor de dichtstbijzijnde medewerkers"""
+    parser.add_argument('--adressen', default=instellingen.adressen_path,
+                        help="adressen.json met medewerkers; wordt opnieuw geladen als het bestand wijzigt "
+                             "(standaard %(default)s)")
+    parser.add_argument('--host', default=instellingen.SERVER_HOST, help="Adres om op te luisteren (standaard %(default)s)")
+    parser.add_argument('--port', type=int, default=instellingen.SERVER_PORT, help="Poort (standaard %(default)s)")
+    parser.add_argument('--geocode-cache', default=instellingen.geocode_cache_path,
+                        help="Geocode cache voor zoeken op adres zonder coördinaten (standaard %(default)s)")
+    parser.add_argument('--no-geocode-cache', action='store_true',
+                        help="Laad de geocode cache niet; zoekopdrachten moeten dan lat/lon bevatten")
+    parser.add_argument('--reload-interval', type=float, default=instellingen.SERVER_RELOAD_INTERVAL,
+                        help="Seconden tussen controles op een gewijzigde adressen.json (standaard %(default)s)")
+    parser.add_argument('--grid-cell-size', type=float, default=instellingen.SPATIAL_INDEX_CEL_GROOTTE,
+                        help="Celgrootte van de index in graden (standaard %(default)s)")
+
+
+def check_bestanden(parser, args):
+    """Meld ontbrekende invoerbestanden voordat er iets zwaars geïmporteerd wordt"""
+    for veld in args.bestanden:
+        paden = getattr(args, veld)
+        for pad in paden if isinstance(paden, list) else [paden]:
+            if any(teken in pad for teken in '*?['):
+                if not glob.glob(pad):
+                    parser.error(f"geen bestanden gevonden voor: {pad}")
+            elif not os.path.exists(pad):
+                parser.error(f"bestand niet gevonden: {pad}")
+
+
+def run_convert(args):
+    import excel_to_json
+    return excel_to_json.run(args)
+
+
+def run_geocode(args):
+    import excel_to_json
+    from nearest_employees import read_queries, geocode_queries
+
+    print("=" * 60)
+    print("Adressen geocoden")
+    print("=" * 60)
+
+    queries = read_queries(args.invoer)
+    print(f"[INFO] {len(queries)} adressen gelezen uit {args.invoer}")
+    if queries["lat"].isna().any() or queries["lon"].isna().any():
+        geocoder = excel_to_json.open_geocoder(args.geocoder, args.geocode_url, args.geocode_rate,
+                                               args.geocode_workers)
+        geocode_queries(queries, geocoder)
+        geocoder.print_stats()
+        geocoder.close()
+
+    uitvoer = queries.rename(columns={"lat": "latitude", "lon": "longitude"})
+    with excel_to_json.atomic_open(args.output, encoding='utf-8-sig', newline='') as f:
+        uitvoer.to_csv(f, index=False)
+    zonder = int(uitvoer[["latitude", "longitude"]].isna().any(axis=1).sum())
+    print(f"\n[OK] {len(uitvoer) - zonder} van {len(uitvoer)} adressen met coördinaten opgeslagen in {args.output}")
+
+
+def run_match(args):
+    import nearest_employees
+    return nearest_employees.run(args)
+
+
+def run_pc4(args):
+    import nearest_employees
+    return nearest_employees.run_pc4(args)
+
+
+def run_serve(args):
+    import nearest_server
+    return nearest_server.run(args)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='adrestool',
+                                     description="Medewerker adressen converteren, geocoden en koppelen aan de "
+                                                 "dichtstbijzijnde medewerkers")
+    commandos = parser.add_subparsers(dest='commando', metavar='COMMANDO', required=True)
+
+    convert = commandos.add_parser('convert', help="Medewerker Excel -> adressen.json (zoals excel_to_json.py)",
+                                   description="Converteer medewerker adressen (Excel) naar adressen.json")
+    add_convert_arguments(convert)
+    convert.set_defaults(functie=run_convert, bestanden=['excel'])
+
+    geocode = commandos.add_parser('geocode', help="Coördinaten zoeken voor een CSV/Excel met adressen",
+                                   description="Zoek coördinaten voor een lijst met adressen (met de geocode cache)")
+    add_geocode_arguments(geocode)
+    geocode.set_defaults(functie=run_geocode, bestanden=['invoer'])
+
+    match = commandos.add_parser('match', help="Dichtstbijzijnde medewerkers per adres (zoals nearest_employees.py)",
+                                 description="Bepaal de k dichtstbijzijnde medewerkers voor een lijst met adressen")
+    add_match_arguments(match)
+    match.set_defaults(functie=run_match, bestanden=['queries', 'adressen'])
+
+    pc4 = commandos.add_parser('pc4', help="Per PC4 gebied de dichtstbijzijnde medewerkers (opzoektabel)",
+                               description="Bereken voor elk PC4 gebied uit een postcode tabel de k dichtstbijzijnde "
+                                           "medewerkers (totaal en per BU) en schrijf een compacte opzoektabel")
+    add_pc4_arguments(pc4)
+    pc4.set_defaults(functie=run_pc4, bestanden=['postcode_table', 'adressen'])
+
+    serve = commandos.add_parser('serve', help="HTTP service voor de dichtstbijzijnde medewerkers (index in het geheugen)",
+                                 description="Beantwoord dichtstbijzijnde medewerker zoekopdrachten over HTTP; "
+                                             "adressen.json wordt één keer geladen en opnieuw bij een wijziging")
+    add_serve_arguments(serve)
+    serve.set_defaults(functie=run_serve, bestanden=['adressen'])
+    return parser, {'convert': convert, 'geocode': geocode, 'match': match, 'pc4': pc4, 'serve': serve}
+
+
+def main(argv=None):
+    """adrestool.py convert|geocode|match|pc4|serve [opties]; geeft de exit code terug"""
+    parser, commandos = build_parser()
+    args = parser.parse_args(argv)
+    check_bestanden(commandos[args.commando], args)
+    functie = args.functie
+    # Alleen de opties van het commando gaan door (die komen ook in het run rapport)
+    del args.functie, args.bestanden, args.commando
+    return functie(args) or 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
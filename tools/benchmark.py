@@ -0,0 +1,333 @@
+import pandas as pd
+import json
+import os
+import sys
+import time
+import random
+import hashlib
+import argparse
+import platform
+import subprocess
+import statistics
+import contextlib
+import tempfile
+import shutil
+import threading
+
+import excel_to_json
+import instellingen
+from excel_to_json import (
+    format_naam, format_naam_column, parse_address_string, parse_address_column,
+    find_oe_naam, NameMatcher, load_afas_oe_mapping, detect_columns, read_excel_file,
+    open_excel_stream, AdresConverter, geocode_query_tekst, write_marker_clusters, AdresRecord,
+)
+
+# Stel encoding in voor Windows console
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+
+# Gegenereerde werkboeken worden bewaard zodat herhaalde runs (en andere commits) dezelfde invoer gebruiken
+data_dir = 'benchmark_data'
+STANDAARD_GROOTTES = [1000, 10000, 100000]
+LINEAIRE_SCAN_PAREN = 50000  # find_oe_naam is O(n) per naam; meet op een steekproef van ~50k vergelijkingen
+
+VOORNAMEN = [
+    "Jan", "Piet", "Kees", "Evi", "Sanne", "Lotte", "Daan", "Bram", "Tijn", "Fleur", "Anouk", "Maaike",
+    "Chantal", "Arusha", "Willem", "Johanna", "Gerrit", "Ingrid", "Mohamed", "Fatima", "Sem", "Noor",
+    "Lianne", "Ruud", "Hendrika", "Marloes", "Joost", "Femke", "Thijs", "Yara",
+]
+OFFICIELE_VOORNAMEN = ["Johannes", "Petrus", "Cornelis", "Adriana", "Maria", "Wilhelmina", "Hendrik", "Geertruida"]
+ACHTERNAMEN = [
+    "Jansen", "Vries", "Berg", "Dijk", "Bakker", "Visser", "Smit", "Meijer", "Boer", "Mulder", "Groot",
+    "Bos", "Vos", "Peters", "Hendriks", "Leeuwen", "Dekker", "Brouwer", "Wit", "Dijkstra", "Aarts",
+    "Adrichem", "Stege", "Lensink", "Woudman", "Heuvel", "Veen", "Broek", "Kok", "Jacobs",
+]
+# Extra achternamen uit stam + achtervoegsel, zodat ook 100k rijen niet vooral uit dubbele namen bestaan
+STAMMEN = ["Ver", "Hen", "Bos", "Kamp", "Wester", "Ooster", "Zuider", "Mole", "Brink", "Hoek", "Kool", "Stroo",
+           "Lind", "Haver", "Bleek", "Roze", "Groen", "Zwart", "Klein", "Hof"]
+ACHTERVOEGSELS = ["sen", "kamp", "man", "ink", "stra", "huis", "hof", "beek", "ga", "veld", "mans", "ma"]
+TUSSENVOEGSELS = ["", "", "", "", "van", "de", "van der", "van den", "van de", "ten", "ter", "in 't", "den"]
+STRATEN = [
+    "Hogeweg", "Dorpsstraat", "Kerkstraat", "Slotboomstraat", "Laan 1940-1945", "Molenweg", "Stationsplein",
+    "Julianastraat", "Prins Hendrikkade", "Burgemeester de Withstraat", "Oude Gracht", "Nieuwe Binnenweg",
+]
+PLAATSEN = [
+    "DREUMEL", "ROTTERDAM", "Utrecht", "Amsterdam", "DEN HAAG", "Nijmegen", "ALPHEN AAN DEN RIJN",
+    "Heerlen", "Zwolle", "S-HERTOGENBOSCH", "Groningen", "Eindhoven",
+]
+OE_NAMEN = [
+    "Kwaliteit van zorg", "Integrale zorg", "Sturen op resultaat", "P&O", "Leren&Ontwikkelen", "Staf",
+    "O&C", "Integraal capaciteitsmanagement",
+]
+
+
+def naam_delen(rng):
+    """Willekeurige (roepnaam, initialen, tussenvoegsel, achternaam)"""
+    roepnaam = rng.choice(VOORNAMEN)
+    officieel = [rng.choice(OFFICIELE_VOORNAMEN + [roepnaam]) for _ in range(rng.randint(1, 3))]
+    initialen = "".join(v[0] + "." for v in officieel)
+    achternaam = rng.choice(ACHTERNAMEN) if rng.random() < 0.6 else rng.choice(STAMMEN) + rng.choice(ACHTERVOEGSELS)
+    if rng.random() < 0.05:
+        achternaam = f"{achternaam} - {rng.choice(ACHTERNAMEN)}"
+    return roepnaam, initialen, rng.choice(TUSSENVOEGSELS), achternaam
+
+
+def generate_workbooks(aantal, directory, seed=42):
+    """Schrijf een synthetisch medewerker bestand en AFAS export met `aantal` medewerkers
+    Medewerker: "Achternaam, I.N. tussenvoegsel (Roepnaam)", adres "Straat 12 a, 1234 AB  PLAATS".
+    AFAS: zelfde kolommen als de echte export (B = naam, C = status, L = OE), met ~10% afwijkende
+    spelling (fuzzy match) en extra medewerkers uit dienst.
+    Bestaande bestanden met dezelfde grootte en seed worden hergebruikt.
+    """
+    map_pad = os.path.join(directory, f"{aantal}_{seed}")
+    medewerker_pad = os.path.join(map_pad, os.path.basename(instellingen.excel_path))
+    afas_pad = os.path.join(map_pad, os.path.basename(excel_to_json.afas_export_path))
+    if os.path.exists(medewerker_pad) and os.path.exists(afas_pad):
+        return medewerker_pad, afas_pad
+
+    rng = random.Random(seed)
+    medewerkers, afas = [], []
+    for i in range(aantal):
+        roepnaam, initialen, tussenvoegsel, achternaam = naam_delen(rng)
+        medewerker = f"{achternaam}, {initialen}" + (f" {tussenvoegsel}" if tussenvoegsel else "") + f" ({roepnaam})"
+        huisnummer = str(rng.randint(1, 250)) + rng.choice(["", "", "", " a", " b", "A", "-2"])
+        postcode = f"{rng.randint(1000, 9999)} {rng.choice('ABCDEFGHJKLMNPRSTVWXZ')}{rng.choice('ABCDEFGHJKLMNPRSTVWXZ')}"
+        adres = f"{rng.choice(STRATEN)} {huisnummer}, {postcode}  {rng.choice(PLAATSEN)}"
+        medewerkers.append({"Medewerker": medewerker, "Adres": adres})
+
+        # AFAS naam: "Roepnaam tussenvoegsel Achternaam", soms met een afwijking voor de fuzzy matcher
+        afas_naam = " ".join(d for d in (roepnaam, tussenvoegsel, achternaam) if d)
+        if rng.random() < 0.1:
+            afas_naam = afas_naam.replace(roepnaam, rng.choice(VOORNAMEN), 1) if rng.random() < 0.5 \
+                else afas_naam + "-" + rng.choice(ACHTERNAMEN)
+        afas.append(afas_rij(i, afas_naam, "In dienst", rng))
+
+    for i in range(aantal, aantal + aantal // 10):
+        roepnaam, _, tussenvoegsel, achternaam = naam_delen(rng)
+        afas.append(afas_rij(i, " ".join(d for d in (roepnaam, tussenvoegsel, achternaam) if d), "Uit dienst", rng))
+    rng.shuffle(afas)
+
+    os.makedirs(map_pad, exist_ok=True)
+    pd.DataFrame(medewerkers).to_excel(medewerker_pad, index=False, engine='openpyxl')
+    pd.DataFrame(afas).to_excel(afas_pad, index=False, engine='openpyxl')
+    return medewerker_pad, afas_pad
+
+
+def afas_rij(i, naam, status, rng):
+    """Eén rij in het formaat van de AFAS export (12 kolommen, OE in kolom L)"""
+    oe = rng.choice(OE_NAMEN)
+    return {
+        "medewerkercode": str(10000 + i), "Naam": naam, "Status dienstverband": status,
+        "Jaren in dienst": rng.randint(0, 30), "Functie": "Consultant", "persooncode": str(10000 + i),
+        "Kostpl.": str(rng.randint(1000, 4000)), "Omschr.": oe, "Gebr.": f"87692.{i}", "OE": oe[:4].upper(),
+        "Uit dienst": None, "goeie OE": oe,
+    }
+
+
+class MockGeocoder:
+    """Vervangt GeocodeEngine zonder netwerk: deterministische coördinaten op basis van de query
+    Ongeveer 5% van de volledige adressen 'faalt', zodat ook de fallbacks van geocode_with_fallback meetellen.
+    """
+
+    def __init__(self, workers=8):
+        self.url = "mock://geocoder"
+        self.workers = workers
+        self.requests = 0
+        self.herhaald = 0
+        self.fouten = 0
+        self.samengevoegd = 0
+        self.cache = None
+        self.limiter = None
+        self.lock = threading.Lock()
+
+    def search(self, address_query):
+        with self.lock:
+            self.requests += 1
+        # Gestructureerde zoekopdrachten (dict) zoals GeocodeEngine die ook krijgt
+        volledig = len(address_query) >= 3 if isinstance(address_query, dict) else address_query.count(",") >= 2
+        address_query = geocode_query_tekst(address_query)
+        h = int(hashlib.md5(address_query.lower().encode('utf-8')).hexdigest(), 16)
+        if h % 20 == 0 and volledig:
+            return None, None
+        return 50.8 + (h % 25000) / 10000, 3.4 + (h // 25000 % 36000) / 10000
+
+    def close(self):
+        pass
+
+    def print_stats(self):
+        print(f"[INFO] Mock geocoder: {self.requests} lookups")
+
+
+def meet(functie, herhalingen):
+    """Voer functie `herhalingen` keer uit (met onderdrukte console output) en geef de tijden in seconden"""
+    tijden = []
+    with open(os.devnull, 'w', encoding='utf-8') as stil:
+        for _ in range(herhalingen):
+            with contextlib.redirect_stdout(stil):
+                start = time.perf_counter()
+                functie()
+                tijden.append(time.perf_counter() - start)
+    return tijden
+
+
+def run_end_to_end(medewerker_pad, afas_pad, extra_args=()):
+    """Volledige conversie (excel_to_json.main) in een tijdelijke map, met MockGeocoder
+    Een mislukte conversie (exit code niet 0) geeft een RuntimeError: die tijd is geen meting.
+    """
+    werkmap = tempfile.mkdtemp(prefix='bench_')
+    oude_map = os.getcwd()
+    origineel = excel_to_json.open_geocoder
+    try:
+        shutil.copy(medewerker_pad, os.path.join(werkmap, os.path.basename(instellingen.excel_path)))
+        shutil.copy(afas_pad, os.path.join(werkmap, os.path.basename(excel_to_json.afas_export_path)))
+        os.chdir(werkmap)
+        excel_to_json.open_geocoder = lambda *args, **kwargs: MockGeocoder()
+        code = excel_to_json.main(['--no-snapshot-cache'] + list(extra_args))
+        if code != 0:
+            raise RuntimeError(f"conversie mislukt met exit code {code}")
+    finally:
+        excel_to_json.open_geocoder = origineel
+        excel_to_json.geocoder = None
+        os.chdir(oude_map)
+        shutil.rmtree(werkmap, ignore_errors=True)
+
+
+def benchmarks_voor(aantal, medewerker_pad, afas_pad, stages):
+    """Bouw de benchmarks voor één grootte: lijst van (naam, aantal rijen, functie)"""
+    df = read_excel_file(medewerker_pad)
+    kolommen = detect_columns(df)
+    namen = df[kolommen["naam"]]
+    adressen = df[kolommen["volledig_adres"]]
+
+    def afas_laden(stream=False):
+        with open(os.devnull, 'w', encoding='utf-8') as stil, contextlib.redirect_stdout(stil):
+            return load_afas_oe_mapping(stream=stream, path=afas_pad, snapshot_dir=None)
+
+    oe_mapping = afas_laden()
+    geformatteerd = [n for n in format_naam_column(namen) if n]
+    steekproef = geformatteerd[:max(1, LINEAIRE_SCAN_PAREN // max(1, len(oe_mapping)))]
+    matcher = NameMatcher(oe_mapping)
+    df_met_namen = df.copy()
+    df_met_namen['Naam Geformatteerd'] = format_naam_column(namen)
+
+    def stream_lezen():
+        _, rijen = open_excel_stream(medewerker_pad)
+        for _ in rijen:
+            pass
+
+    def converteren():
+        AdresConverter(kolommen, oe_mapping, matcher).convert(df_met_namen)
+
+    # Marker clusters: willekeurige coördinaten binnen Nederland, BU uit de OE namen
+    rng = random.Random(42)
+    cluster_adressen = [
+        AdresRecord(f"shared-{i}", f"Adres {i}", latitude=rng.uniform(50.75, 53.5), longitude=rng.uniform(3.4, 7.2),
+                    bu=rng.choice(OE_NAMEN))
+        for i in range(aantal)
+    ]
+
+    def clusters_schrijven():
+        werkmap = tempfile.mkdtemp(prefix='bench_')
+        try:
+            write_marker_clusters(cluster_adressen, os.path.join(werkmap, 'adressen.clusters.json'))
+        finally:
+            shutil.rmtree(werkmap, ignore_errors=True)
+
+    alle = [
+        ("load_afas", aantal, afas_laden),
+        ("load_afas_stream", aantal, lambda: afas_laden(stream=True)),
+        ("read_excel", aantal, lambda: read_excel_file(medewerker_pad)),
+        ("read_excel_stream", aantal, stream_lezen),
+        ("format_naam", aantal, lambda: [format_naam(n) for n in namen]),
+        ("format_naam_column", aantal, lambda: format_naam_column(namen)),
+        ("parse_address_string", aantal, lambda: [parse_address_string(a) for a in adressen]),
+        ("parse_address_column", aantal, lambda: parse_address_column(adressen)),
+        ("find_oe_naam", len(steekproef), lambda: [find_oe_naam(n, oe_mapping) for n in steekproef]),
+        ("name_matcher_build", len(oe_mapping), lambda: NameMatcher(oe_mapping)),
+        ("name_matcher_match", len(geformatteerd), lambda: [matcher.match(n) for n in geformatteerd]),
+        ("convert", aantal, converteren),
+        ("marker_clusters", aantal, clusters_schrijven),
+        ("end_to_end", aantal, lambda: run_end_to_end(medewerker_pad, afas_pad)),
+        ("end_to_end_stream", aantal, lambda: run_end_to_end(medewerker_pad, afas_pad, ['--stream'])),
+    ]
+    return [b for b in alle if not stages or b[0] in stages]
+
+
+def git_commit():
+    """Huidige commit (kort), of None buiten een git repository"""
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_vergelijking(resultaten, vorige):
+    """Vergelijk de mediaan per benchmark met een eerder resultaatbestand"""
+    vorige_tijden = {(r["grootte"], r["benchmark"]): r["mediaan_s"] for r in vorige["resultaten"]}
+    print(f"\n[INFO] Vergelijking met {vorige.get('commit') or 'vorige run'}:")
+    for r in resultaten:
+        oud = vorige_tijden.get((r["grootte"], r["benchmark"]))
+        if oud:
+            verschil = (r["mediaan_s"] - oud) / oud * 100
+            markering = "  [TRAGER]" if verschil > 10 else ""
+            print(f"   {r['grootte']:>7} {r['benchmark']:<22} {oud:9.4f}s -> {r['mediaan_s']:9.4f}s "
+                  f"({verschil:+.1f}%){markering}")
+
+
+def main(argv=None):
+    """Benchmarks van de conversie stappen en de volledige conversie (command line); geeft de exit code terug"""
+    parser = argparse.ArgumentParser(description="Benchmark de Excel naar JSON conversie op synthetische data")
+    parser.add_argument('--sizes', type=int, nargs='+', default=STANDAARD_GROOTTES,
+                        help="Aantal medewerkers per benchmark (standaard %(default)s)")
+    parser.add_argument('--repeat', type=int, default=3, help="Aantal herhalingen per benchmark (standaard 3)")
+    parser.add_argument('--stages', nargs='+', help="Alleen deze benchmarks uitvoeren (bijv. format_naam convert)")
+    parser.add_argument('--seed', type=int, default=42, help="Seed voor de generator (standaard 42)")
+    parser.add_argument('--data-dir', default=data_dir, help="Map voor gegenereerde werkboeken (standaard %(default)s)")
+    parser.add_argument('-o', '--output', help="Schrijf de resultaten als JSON naar dit bestand")
+    parser.add_argument('--compare', help="Vergelijk met een eerder JSON resultaatbestand")
+    args = parser.parse_args(argv)
+
+    resultaten = []
+    for aantal in args.sizes:
+        print(f"\n[INFO] Werkboeken met {aantal} medewerkers voorbereiden...")
+        medewerker_pad, afas_pad = generate_workbooks(aantal, args.data_dir, args.seed)
+        for naam, rijen, functie in benchmarks_voor(aantal, medewerker_pad, afas_pad, args.stages):
+            try:
+                tijden = meet(functie, args.repeat)
+            except RuntimeError as e:
+                print(f"[FOUT] {naam}: {e}")
+                return 1
+            mediaan = statistics.median(tijden)
+            resultaten.append({
+                "grootte": aantal,
+                "benchmark": naam,
+                "rijen": rijen,
+                "min_s": min(tijden),
+                "mediaan_s": mediaan,
+                "rijen_per_s": rijen / mediaan if mediaan else None,
+            })
+            print(f"   {naam:<22} {rijen:>8} rijen  min {min(tijden):9.4f}s  mediaan {mediaan:9.4f}s")
+
+    rapport = {
+        "commit": git_commit(),
+        "datum": time.strftime('%Y-%m-%dT%H:%M:%S'),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "platform": platform.platform(),
+        "seed": args.seed,
+        "herhalingen": args.repeat,
+        "resultaten": resultaten,
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(rapport, f, indent=2)
+        print(f"\n[OK] Resultaten opgeslagen in {args.output}")
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            print_vergelijking(resultaten, json.load(f))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
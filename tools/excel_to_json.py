@@ -1,20 +1,138 @@
 import pandas as pd
+import numpy as np
 import json
 from datetime import datetime
 import os
 import re
-import requests
 import time
 import sys
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, Future
+import hashlib
+import gzip
+import glob
+import argparse
+import contextlib
+import io
+import itertools
+from collections import Counter, defaultdict, deque
 from difflib import SequenceMatcher
 
 # Stel encoding in voor Windows console
 if sys.platform == 'win32':
     sys.stdout.reconfigure(encoding='utf-8')
 
-# Pad naar de Excel bestanden
-excel_path = r'alle medewerker adressen.xlsx'
-afas_export_path = r'afas export.xlsx'
+# Bestanden en instellingen (module globals, zie instellingen.py)
+from instellingen import (
+    afas_export_path, output_path, incremental_state_path, geocode_cache_path,
+    GEOCODE_CACHE_TTL_HIT, GEOCODE_CACHE_TTL_MISS, GEOCODE_CACHE_MAX_ENTRIES, snapshot_cache_dir,
+    SNAPSHOT_VERSIE, naam_sidecar_path, spatial_index_path, SPATIAL_INDEX_VERSIE, SPATIAL_INDEX_CEL_GROOTTE,
+    cluster_path, CLUSTER_VERSIE, CLUSTER_ZOOM_MIN, CLUSTER_ZOOM_MAX, CLUSTER_CEL_PIXELS,
+    SHARD_MANIFEST, SHARD_VERSIE, DELTA_MANIFEST, OUD_MANIFEST, DELTA_VERSIE, DELTA_BEWAAR, LOG_NIVEAUS, log_niveau,
+    PARALLEL_MIN_RIJEN, PARALLEL_CHUNK_RIJEN, NOMINATIM_PUBLIC_URL, GEOCODE_PROVIDERS, checkpoint_path,
+    CHECKPOINT_VERSIE, CHECKPOINT_FLUSH_SECONDEN, GEOCODE_RETRIES, GEOCODE_BACKOFF, GEOCODE_BACKOFF_MAX,
+)
+
+# Voorgecompileerde patronen (gedeeld door de per-rij functies en de kolomsgewijze varianten)
+LEESTEKENS_RE = re.compile(r'[^\w\s]')
+SPATIES_RE = re.compile(r'\s+')
+NIET_WOORD_RE = re.compile(r'[^\w]')
+HAAKJES_RE = re.compile(r'\(([^)]+)\)')
+POSTCODE_RE = re.compile(r'\b(\d{4}\s+[A-Z]{2})\b', re.IGNORECASE)
+HUISNUMMER_RE = re.compile(r'\s+(\d+[a-zA-Z]?)(?:\s+([a-z]+))?\s*$', re.IGNORECASE)
+HUISNUMMER_FALLBACK_RE = re.compile(r'\s+(\d+[a-zA-Z]?)\s*$')
+
+# Provincie-afkortingen achter plaatsnamen in de bron ("AFFERDEN GLD"); worden vóór geocoding verwijderd
+PROVINCIE_AFKORTINGEN = frozenset([
+    "GLD", "GELD", "GE", "NB", "N-B", "NBR", "NH", "N-H", "ZH", "Z-H", "UT", "UTR", "OV", "OVL", "DR", "DRE",
+    "FR", "FRL", "GR", "GRO", "GRON", "LB", "LI", "LIM", "L", "ZL", "ZE", "ZLD", "FL", "FLD", "FLE",
+])
+
+def log(niveau, bericht):
+    """Print een melding per rij alleen als niveau minstens log_niveau is (binnen run(): RunReport.log)
+    Duizenden regels naar de (Windows) console schrijven kost zelf merkbaar tijd.
+    """
+    if LOG_NIVEAUS[niveau] >= LOG_NIVEAUS[log_niveau]:
+        print(bericht)
+
+class RunReport:
+    """Verzamelt per stap de wall time en tellers, en algemene tellers (thread-safe)
+    Stappen kunnen meerdere keren gemeten worden (bijv. per chunk); tijden en tellers worden opgeteld.
+    """
+
+    def __init__(self, log_niveau=log_niveau):
+        self.log_niveau = log_niveau  # Niveau voor meldingen per rij (--log-level), zie log()
+        self.gestart = datetime.now()
+        self.t0 = time.perf_counter()
+        self.stappen = {}
+        self.tellers = defaultdict(int)
+        self.lopend = {}
+        self.lock = threading.Lock()
+
+    def add(self, stap, seconden, **tellers):
+        """Tel tijd en tellers op bij een stap"""
+        with self.lock:
+            data = self.stappen.setdefault(stap, {"seconden": 0.0, "aanroepen": 0})
+            data["seconden"] += seconden
+            data["aanroepen"] += 1
+            for naam, aantal in tellers.items():
+                data[naam] = data.get(naam, 0) + aantal
+
+    def start(self, stap):
+        self.lopend[stap] = time.perf_counter()
+
+    def stop(self, stap, **tellers):
+        self.add(stap, time.perf_counter() - self.lopend.pop(stap), **tellers)
+
+    def meet_iterator(self, stap, iterable):
+        """Geef de elementen van iterable door en tel de tijd in next() bij stap op"""
+        iterator = iter(iterable)
+        while True:
+            start = time.perf_counter()
+            try:
+                element = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                self.add(stap, time.perf_counter() - start)
+            yield element
+
+    def log(self, niveau, bericht):
+        """Print een melding per rij alleen als niveau minstens het log niveau van deze run is"""
+        if LOG_NIVEAUS[niveau] >= LOG_NIVEAUS[self.log_niveau]:
+            print(bericht)
+
+    def tel(self, teller, aantal=1):
+        with self.lock:
+            self.tellers[teller] += aantal
+
+    def to_dict(self, **extra):
+        rapport = {
+            "gestart": self.gestart.isoformat(timespec='seconds'),
+            "duur_s": round(time.perf_counter() - self.t0, 3),
+            "stappen": {stap: dict(data, seconden=round(data["seconden"], 3)) for stap, data in self.stappen.items()},
+            "tellers": dict(sorted(self.tellers.items())),
+        }
+        rapport.update(extra)
+        return rapport
+
+    def write(self, path, **extra):
+        with atomic_open(path) as f:
+            json.dump(self.to_dict(**extra), f, indent=2, ensure_ascii=False, default=str)
+
+    def print_summary(self):
+        totaal = time.perf_counter() - self.t0
+        print(f"\n[INFO] Tijd per stap (totaal {totaal:.2f}s):")
+        for stap, data in self.stappen.items():
+            tellers = ", ".join(f"{naam}={waarde}" for naam, waarde in data.items() if naam not in ("seconden", "aanroepen"))
+            aandeel = data["seconden"] / totaal * 100 if totaal else 0
+            print(f"   {stap:<20} {data['seconden']:8.2f}s ({aandeel:5.1f}%)" + (f"  {tellers}" if tellers else ""))
+        if self.tellers:
+            print("[INFO] Tellers: " + ", ".join(f"{naam}={waarde}" for naam, waarde in sorted(self.tellers.items())))
+
+# Rapport voor aanroepen buiten run() (bijv. geocode_with_fallback vanuit nearest_employees); run() maakt een eigen
+run_report = RunReport()
 
 def similarity(a, b):
     """Bereken similarity ratio tussen twee strings (0.0 tot 1.0)"""
@@ -26,8 +144,8 @@ def normalize_naam(naam):
         return ""
     naam = str(naam).lower().strip()
     # Verwijder leestekens en extra spaties
-    naam = re.sub(r'[^\w\s]', '', naam)
-    naam = re.sub(r'\s+', ' ', naam)
+    naam = LEESTEKENS_RE.sub('', naam)
+    naam = SPATIES_RE.sub(' ', naam)
     return naam
 
 def find_best_match(target_naam, naam_list, min_similarity=0.6):
@@ -55,6 +173,7 @@ def find_best_match(target_naam, naam_list, min_similarity=0.6):
 def find_oe_naam(target_naam, oe_mapping, min_similarity=0.5):
     """Vind OE naam voor target_naam via fuzzy matching in oe_mapping
     Gebruikt alleen geformatteerde namen voor matching
+    Lineaire scan over alle namen; dient als referentie voor NameMatcher (--compare-matcher)
     """
     if not target_naam or pd.isna(target_naam) or not oe_mapping:
         return None, 0.0
@@ -74,18 +193,184 @@ def find_oe_naam(target_naam, oe_mapping, min_similarity=0.5):
         return best_oe_naam, best_score
     return None, best_score
 
-def load_afas_oe_mapping():
-    """Lees AFAS export en maak mapping van medewerker naar OE naam"""
-    print("\n[INFO] Lezen van AFAS export bestand voor OE namen...")
+class NameMatcher:
+    """Fuzzy matcher over een mapping van genormaliseerde naam -> waarde
+    Geeft hetzelfde resultaat als find_oe_naam (SequenceMatcher ratio, bij gelijke score de eerste naam
+    in de volgorde van de mapping), maar met een exacte match als snelle route en een bovengrens per
+    naam, zodat alleen namen die de beste score nog kunnen halen volledig gescoord worden.
+    De bovengrens komt uit een inverted index op losse tekens: per teken de namen waarin het voorkomt.
+    Langere n-grams (of tokens) geven geen geldige bovengrens, omdat SequenceMatcher ook losse tekens
+    als overeenkomst telt; een shortlist op trigrams kan de beste naam missen.
+    """
+
+    def __init__(self, mapping):
+        self.keys = list(mapping.keys())
+        self.values = list(mapping.values())
+        self.positie = {key: i for i, key in enumerate(self.keys)}
+        # Inverted index: teken -> (namen waarin het voorkomt, aantal keer in die naam), voor de bovengrens in match()
+        postings = defaultdict(lambda: ([], []))
+        for i, key in enumerate(self.keys):
+            for teken, aantal in Counter(key).items():
+                namen, aantallen = postings[teken]
+                namen.append(i)
+                aantallen.append(aantal)
+        self.index = {teken: (np.array(namen, dtype=np.intp), np.array(aantallen, dtype=np.int64))
+                      for teken, (namen, aantallen) in postings.items()}
+        self.lengtes = np.array([len(key) for key in self.keys], dtype=np.int64)
+        # SequenceMatcher per naam met die naam als seq2, zodat de analyse daarvan maar één keer gebeurt
+        self.matchers = {}
+
+    def _matcher(self, i):
+        matcher = self.matchers.get(i)
+        if matcher is None:
+            matcher = SequenceMatcher(None, "", self.keys[i])
+            self.matchers[i] = matcher
+        return matcher
+
+    def _score(self, i, target_normalized):
+        matcher = self._matcher(i)
+        matcher.set_seq1(target_normalized)
+        return matcher.ratio()
+
+    def bovengrenzen(self, target_normalized):
+        """Bovengrens van de ratio met elke naam: 2 * gedeelde tekens / totale lengte (quick_ratio van difflib)
+        Alleen de namen in de postings van de tekens van target_normalized worden bijgewerkt.
+        """
+        gedeeld = np.zeros(len(self.keys), dtype=np.int64)
+        for teken, aantal in Counter(target_normalized).items():
+            posting = self.index.get(teken)
+            if posting is not None:
+                namen, aantallen = posting
+                gedeeld[namen] += np.minimum(aantallen, aantal)
+        return 2.0 * gedeeld / (self.lengtes + len(target_normalized))
+
+    def match(self, target_naam, min_similarity=0.5):
+        """Vind de waarde voor target_naam; zelfde return als find_oe_naam: (waarde, score)"""
+        if not target_naam or pd.isna(target_naam) or not self.keys:
+            return None, 0.0
+        
+        target_normalized = normalize_naam(target_naam)
+        
+        # Snelle route: exacte match
+        i = self.positie.get(target_normalized)
+        if i is not None:
+            return self.values[i], 1.0
+        
+        # Begin bij de naam met de hoogste bovengrens; daarna hoeven alleen namen gescoord te worden
+        # waarvan de bovengrens minstens die score is, van hoog naar laag (gelijk: in originele volgorde)
+        grenzen = self.bovengrenzen(target_normalized)
+        best_i = int(np.argmax(grenzen))
+        best_score = self._score(best_i, target_normalized) if grenzen[best_i] > 0 else 0.0
+        if best_score > 0:
+            kandidaten = np.flatnonzero(grenzen >= best_score)
+            kandidaten = kandidaten[np.lexsort((kandidaten, -grenzen[kandidaten]))]
+            for i in kandidaten.tolist():
+                grens = grenzen[i]
+                if grens < best_score:
+                    break
+                if i == best_i or (grens == best_score and i > best_i):
+                    continue
+                score = self._score(i, target_normalized)
+                # Zoals de lineaire scan: bij gelijke score wint de eerste naam
+                if score > best_score or (score == best_score and i < best_i):
+                    best_score = score
+                    best_i = i
+        
+        if best_score > 0 and best_score >= min_similarity:
+            return self.values[best_i], best_score
+        return None, best_score
+
+def compare_matchers(namen, oe_mapping, matcher, min_similarity=0.5):
+    """Vergelijk NameMatcher met de lineaire find_oe_naam voor een lijst namen
+    Returns: aantal namen waarvoor een andere OE naam wordt gekozen
+    """
+    verschillen = 0
+    start = time.perf_counter()
+    referentie = [find_oe_naam(naam, oe_mapping, min_similarity) for naam in namen]
+    tijd_lineair = time.perf_counter() - start
+    start = time.perf_counter()
+    resultaten = [matcher.match(naam, min_similarity) for naam in namen]
+    tijd_index = time.perf_counter() - start
+    
+    for naam, (ref_oe, ref_score), (oe, score) in zip(namen, referentie, resultaten):
+        if ref_oe != oe:
+            verschillen += 1
+            print(f"   [VERSCHIL] '{naam}': lineair '{ref_oe}' ({ref_score:.2f}), index '{oe}' ({score:.2f})")
     
+    print(f"[INFO] Matcher vergelijking: {len(namen) - verschillen}/{len(namen)} namen gelijk "
+          f"(lineair {tijd_lineair:.3f}s, index {tijd_index:.3f}s)")
+    return verschillen
+
+def build_oe_mapping(paren):
+    """Maak mapping: geformatteerde medewerker naam -> OE naam (eerste voorkomen wint)
+    paren: iterable van (medewerker, oe_naam) strings (of None)
+    """
+    oe_mapping = {}
+    for medewerker_str, oe_str in paren:
+        if medewerker_str and oe_str:
+            # Formatteer de naam
+            geformatteerde_naam = format_naam(medewerker_str)
+            
+            # Sla alleen geformatteerde naam op als key
+            if geformatteerde_naam:
+                normalized_geformatteerd = normalize_naam(geformatteerde_naam)
+                if normalized_geformatteerd not in oe_mapping:
+                    oe_mapping[normalized_geformatteerd] = oe_str
+    return oe_mapping
+
+def load_afas_oe_mapping_stream(path=None):
+    """Streaming variant van load_afas_oe_mapping: leest alleen kolom B, C en L, rij voor rij"""
     try:
-        # Probeer verschillende engines
-        df_afas = None
-        try:
-            df_afas = pd.read_excel(afas_export_path, engine='openpyxl')
-        except:
+        kolomnamen, rijen = open_excel_stream(path or afas_export_path)
+    except Exception as e:
+        print(f"[WAARSCHUWING] Kon AFAS export niet lezen: {e}")
+        return {}
+    
+    if len(kolomnamen) < 12:
+        print(f"[WAARSCHUWING] AFAS export heeft niet genoeg kolommen (verwacht minstens 12, gevonden {len(kolomnamen)})")
+        return {}
+    
+    print(f"[INFO] Gebruik kolom '{kolomnamen[1]}' voor medewerker namen")
+    print(f"[INFO] Gebruik kolom '{kolomnamen[2]}' voor status dienstverband")
+    print(f"[INFO] Gebruik kolom '{kolomnamen[11]}' voor OE namen")
+    
+    def cel(waarden, positie):
+        return waarden[positie] if positie < len(waarden) else None
+    
+    def medewerkers_in_dienst(teller):
+        # Filter op regels waarbij status dienstverband "in dienst" bevat (case-insensitive)
+        for _, waarden in rijen:
+            teller["totaal"] += 1
+            status = cel(waarden, 2)
+            if status is None or 'in dienst' not in str(status).lower():
+                continue
+            teller["in_dienst"] += 1
+            medewerker = cel(waarden, 1)
+            oe_naam = cel(waarden, 11)
+            yield (str(medewerker).strip() if medewerker is not None else None,
+                   str(oe_naam).strip() if oe_naam is not None else None)
+    
+    teller = {"totaal": 0, "in_dienst": 0}
+    oe_mapping = build_oe_mapping(medewerkers_in_dienst(teller))
+    print(f"[INFO] AFAS export gestreamd: {teller['in_dienst']} rijen 'in dienst' (van {teller['totaal']} niet-lege rijen)")
+    print(f"[INFO] {len(oe_mapping)} medewerker->OE mappings gevonden (alleen geformatteerde namen)")
+    return oe_mapping
+
+def load_afas_oe_mapping(stream=False, path=None, df_afas=None, snapshot_dir=snapshot_cache_dir):
+    """Lees AFAS export en maak mapping van medewerker naar OE naam
+    path: standaard afas_export_path; df_afas: al ingelezen export (zie read_excel_parallel);
+    snapshot_dir: zie read_excel_cached
+    """
+    path = path or afas_export_path
+    print(f"\n[INFO] Lezen van AFAS export bestand voor OE namen ({path})...")
+    
+    if stream:
+        return load_afas_oe_mapping_stream(path)
+    
+    try:
+        if df_afas is None:
             try:
-                df_afas = pd.read_excel(afas_export_path)
+                df_afas = read_excel_cached(path, snapshot_dir=snapshot_dir)
             except Exception as e:
                 print(f"[WAARSCHUWING] Kon AFAS export niet lezen: {e}")
                 return {}
@@ -106,8 +391,7 @@ def load_afas_oe_mapping():
         print(f"[INFO] Gebruik kolom '{oe_col}' voor OE namen")
         
         # Filter op "in dienst" (case-insensitive)
-        # Maak een kopie van de dataframe met alleen regels waar status "in dienst" is
-        df_afas_filtered = df_afas.copy()
+        df_afas_filtered = df_afas
         if status_col in df_afas_filtered.columns:
             # Filter op regels waarbij status dienstverband "in dienst" bevat (case-insensitive)
             df_afas_filtered = df_afas_filtered[
@@ -117,24 +401,9 @@ def load_afas_oe_mapping():
         else:
             print(f"[WAARSCHUWING] Kolom '{status_col}' niet gevonden, gebruik alle rijen")
         
-        # Maak mapping: geformatteerde medewerker naam -> OE naam
-        oe_mapping = {}
-        for idx, row in df_afas_filtered.iterrows():
-            medewerker = row[medewerker_col]
-            oe_naam = row[oe_col]
-            
-            if pd.notna(medewerker) and pd.notna(oe_naam):
-                medewerker_str = str(medewerker).strip()
-                oe_str = str(oe_naam).strip()
-                if medewerker_str and oe_str:
-                    # Formatteer de naam
-                    geformatteerde_naam = format_naam(medewerker_str)
-                    
-                    # Sla alleen geformatteerde naam op als key
-                    if geformatteerde_naam:
-                        normalized_geformatteerd = normalize_naam(geformatteerde_naam)
-                        if normalized_geformatteerd not in oe_mapping:
-                            oe_mapping[normalized_geformatteerd] = oe_str
+        # Maak mapping: geformatteerde medewerker naam -> OE naam (kolomsgewijs, zonder iterrows)
+        oe_mapping = build_oe_mapping(zip(clean_text_column(df_afas_filtered[medewerker_col]),
+                                          clean_text_column(df_afas_filtered[oe_col])))
         
         print(f"[INFO] {len(oe_mapping)} medewerker->OE mappings gevonden (alleen geformatteerde namen)")
         return oe_mapping
@@ -143,6 +412,14 @@ def load_afas_oe_mapping():
         print(f"[WAARSCHUWING] Fout bij lezen AFAS export: {e}")
         return {}
 
+def merge_oe_mappings(mappings):
+    """Voeg de mappings van meerdere AFAS exports samen; net als binnen één export wint het eerste voorkomen"""
+    oe_mapping = {}
+    for mapping in mappings:
+        for naam, oe_naam in mapping.items():
+            oe_mapping.setdefault(naam, oe_naam)
+    return oe_mapping
+
 def parse_address_string(full_address):
     """Parse een volledig adres string naar componenten
     Formaat: "Straatnaam Huisnummer, Postcode Plaats"
@@ -153,7 +430,7 @@ def parse_address_string(full_address):
     full_address = str(full_address).strip()
     
     # Probeer postcode te vinden (NL formaat: 4 cijfers + spatie + 2 letters)
-    postcode_match = re.search(r'\b(\d{4}\s+[A-Z]{2})\b', full_address, re.IGNORECASE)
+    postcode_match = POSTCODE_RE.search(full_address)
     postcode = None
     plaats = None
     address_part = full_address
@@ -175,7 +452,7 @@ def parse_address_string(full_address):
     # Formaat: "Straatnaam Huisnummer" of "Straatnaam Huisnummer toevoeging"
     # Zoek het laatste nummer (met optionele letter/toevoeging) als huisnummer
     # Pattern: nummer gevolgd door optioneel spatie + letter/toevoeging, aan het einde
-    huisnummer_match = re.search(r'\s+(\d+[a-zA-Z]?)(?:\s+([a-z]+))?\s*$', address_part, re.IGNORECASE)
+    huisnummer_match = HUISNUMMER_RE.search(address_part)
     
     if huisnummer_match:
         huisnummer = huisnummer_match.group(1)
@@ -185,7 +462,7 @@ def parse_address_string(full_address):
         straat = address_part[:huisnummer_match.start()].strip()
     else:
         # Fallback: zoek alleen nummer aan het einde
-        huisnummer_match = re.search(r'\s+(\d+[a-zA-Z]?)\s*$', address_part)
+        huisnummer_match = HUISNUMMER_FALLBACK_RE.search(address_part)
         if huisnummer_match:
             huisnummer = huisnummer_match.group(1)
             straat = address_part[:huisnummer_match.start()].strip()
@@ -206,7 +483,7 @@ def format_naam(naam_string):
     naam = str(naam_string).strip()
     
     # Zoek naam tussen haakjes, bijvoorbeeld "(Tijn)" in "Rietschoten, T.A.J. van (Tijn)"
-    haakjes_match = re.search(r'\(([^)]+)\)', naam)
+    haakjes_match = HAAKJES_RE.search(naam)
     
     if haakjes_match:
         # Haal de voornaam tussen haakjes
@@ -235,12 +512,12 @@ def format_naam(naam_string):
             # Zoek alle tussenvoegsels (meestal aan het einde, voor de haakjes)
             for i, woord in enumerate(woorden):
                 # Verwijder leestekens voor vergelijking
-                woord_clean = re.sub(r'[^\w]', '', woord.lower())
+                woord_clean = NIET_WOORD_RE.sub('', woord.lower())
                 if woord_clean in tussenvoegsel_woorden:
                     # Check of het een combinatie is zoals "van der"
                     tussenvoegsel_deel = woord
                     if i + 1 < len(woorden):
-                        volgende_woord_clean = re.sub(r'[^\w]', '', woorden[i + 1].lower())
+                        volgende_woord_clean = NIET_WOORD_RE.sub('', woorden[i + 1].lower())
                         if woord_clean == 'van' and volgende_woord_clean in {'der', 'de', 'den'}:
                             tussenvoegsel_deel = f"{woord} {woorden[i + 1]}"
                             tussenvoegsels_lijst.append(tussenvoegsel_deel)
@@ -268,6 +545,56 @@ def format_naam(naam_string):
     # Als de naam niet tussen haakjes staat, blijft deze ongewijzigd
     return naam
 
+def column_values(series):
+    """Waarden van een kolom als lijst, met None voor lege cellen"""
+    return series.astype(object).where(series.notna(), None).tolist()
+
+def clean_text_column(series):
+    """Kolomsgewijze variant van str(waarde).strip(), met None voor lege cellen"""
+    return column_values(series.map(str, na_action='ignore').str.strip().where(series.notna()))
+
+def float_column(series):
+    """Kolomsgewijze variant van float(waarde), met None voor lege of ongeldige cellen"""
+    def to_float(waarde):
+        try:
+            return float(waarde)
+        except (TypeError, ValueError):
+            return None
+    return [to_float(waarde) if waarde is not None else None for waarde in column_values(series)]
+
+def format_naam_column(series):
+    """Formatteer een hele kolom namen; herhaalde namen worden maar één keer geformatteerd"""
+    waarden = column_values(series)
+    geformatteerd = {}
+    resultaat = []
+    for waarde in waarden:
+        if waarde is None:
+            resultaat.append(None)
+            continue
+        if waarde not in geformatteerd:
+            geformatteerd[waarde] = format_naam(waarde)
+        resultaat.append(geformatteerd[waarde])
+    return resultaat
+
+def parse_address_column(series):
+    """Parse een hele kolom adressen met parse_address_string; herhaalde adressen worden maar één keer geparsed
+    Returns: lijsten (straten, huisnummers, postcodes, plaatsen), met None waar parse_address_string
+    een lege waarde geeft.
+    """
+    geparsed = {}
+    resultaten = []
+    for waarde in column_values(series):
+        delen = geparsed.get(waarde)
+        if delen is None:
+            straat, huisnummer, postcode, plaats = parse_address_string(waarde)
+            # Lege strings gelden als niet gevonden
+            delen = geparsed[waarde] = (straat or None, huisnummer or None, postcode or None, plaats or None)
+        resultaten.append(delen)
+    if not resultaten:
+        return [], [], [], []
+    straten, huisnummers, postcodes, plaatsen = map(list, zip(*resultaten))
+    return straten, huisnummers, postcodes, plaatsen
+
 def find_column(df, keywords):
     """Zoek een kolom op basis van keywords (case-insensitive)"""
     for col in df.columns:
@@ -277,46 +604,1275 @@ def find_column(df, keywords):
                 return col
     return None
 
-def geocode_address(straat, huisnummer, postcode, plaats):
-    """Geocode een adres naar latitude/longitude met Nominatim (OpenStreetMap)
-    Werkt met volledig adres, of alleen postcode + plaatsnaam, of alleen plaatsnaam.
-    Returns: (latitude, longitude) of (None, None) bij fout
+def detect_columns(df):
+    """Zoek alle relevante kolommen in het medewerker bestand
+    Returns: dict met per veld de kolomnaam (of None)
     """
-    if not straat and not postcode and not plaats:
-        return None, None
+    return {
+        "naam": find_column(df, ['naam', 'name', 'label', 'medewerker', 'persoon']),
+        "straat": find_column(df, ['straat', 'street', 'adres', 'address']),
+        "huisnummer": find_column(df, ['huisnummer', 'huis', 'nummer', 'number', 'nr']),
+        "postcode": find_column(df, ['postcode', 'post', 'zip', 'pc']),
+        "plaats": find_column(df, ['plaats', 'stad', 'city', 'gemeente']),
+        "volledig_adres": find_column(df, ['volledig', 'adres', 'address', 'volledige']),
+        "bu": find_column(df, ['bu', 'business unit', 'businessunit']),
+        "lat": find_column(df, ['latitude', 'lat']),
+        "lng": find_column(df, ['longitude', 'lng', 'lon']),
+    }
+
+def read_excel_file(path, sheet_name=0):
+    """Lees een werkblad (standaard het eerste) volledig in met pandas
+    dtype=object zodat gehele getallen niet naar float worden omgezet (zelfde waarden als bij streaming)
+    """
+    return pd.read_excel(path, sheet_name=sheet_name, engine='openpyxl', dtype=object)
+
+def expand_paden(patronen):
+    """Bestandsnamen en glob patronen ("regio_*.xlsx") -> lijst met bestanden, in opgegeven volgorde
+    Een patroon zonder treffers geeft FileNotFoundError; Excel lock bestanden (~$...) worden overgeslagen.
+    """
+    paden = []
+    for patroon in patronen:
+        if any(teken in patroon for teken in '*?['):
+            gevonden = [pad for pad in sorted(glob.glob(patroon)) if not os.path.basename(pad).startswith('~$')]
+            if not gevonden:
+                raise FileNotFoundError(f"geen bestanden gevonden voor '{patroon}'")
+        else:
+            gevonden = [patroon]
+        paden.extend(pad for pad in gevonden if pad not in paden)
+    return paden
+
+def excel_sheet_names(path):
+    """Namen van de werkbladen in een Excel bestand (zonder de inhoud te lezen)"""
+    import openpyxl
+    wb = openpyxl.load_workbook(path, read_only=True, keep_links=False)
+    try:
+        return list(wb.sheetnames)
+    finally:
+        wb.close()
+
+def expand_bronnen(patronen, werkbladen=None):
+    """Werkbladen om in te lezen: lijst van (pad, werkblad)
+    werkbladen: None = het eerste werkblad van elk bestand, ['*'] = alle werkbladen, anders de
+    opgegeven namen (alleen de bestanden die een werkblad met die naam hebben).
+    """
+    paden = expand_paden(patronen)
+    if not werkbladen:
+        return [(pad, 0) for pad in paden]
+    bronnen = []
+    for pad in paden:
+        namen = excel_sheet_names(pad)
+        gekozen = namen if '*' in werkbladen else [naam for naam in werkbladen if naam in namen]
+        if not gekozen:
+            print(f"[WAARSCHUWING] {pad} heeft geen werkblad {', '.join(werkbladen)} (wel: {', '.join(namen)})")
+        bronnen.extend((pad, naam) for naam in gekozen)
+    if not bronnen:
+        raise FileNotFoundError(f"geen werkbladen gevonden ({', '.join(werkbladen)})")
+    return bronnen
+
+def bron_label(path, sheet_name=0):
+    """Naam van een bron in meldingen: het bestand, met het werkblad als dat gekozen is"""
+    return path if sheet_name == 0 else f"{path} [{sheet_name}]"
+
+@contextlib.contextmanager
+def atomic_open(path, mode='w', encoding='utf-8', **kwargs):
+    """Schrijf naar een tijdelijk bestand naast path en hernoem het pas na een geslaagde write
+    Lezers (of een webserver) zien zo altijd het oude of het nieuwe bestand, nooit een half geschreven
+    bestand; bij een fout of Ctrl-C blijft het oude bestand staan.
+    """
+    tijdelijk = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tijdelijk, mode, encoding=None if 'b' in mode else encoding, **kwargs) as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tijdelijk, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(tijdelijk)
+        raise
+
+# Encoders voor JsonArrayWriter (json.dumps maakt met opties bij elke aanroep een nieuwe encoder)
+JSON_COMPACT = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+JSON_PLAT_ELEMENT = json.JSONEncoder(ensure_ascii=False, separators=(',\n    ', ': '))
+JSON_INGESPRONGEN = json.JSONEncoder(ensure_ascii=False, indent=2)
+JSON_SCALAIRE_TYPES = frozenset([str, int, float, bool, type(None)])
+
+class JsonArrayWriter:
+    """Schrijf een JSON array element voor element naar een open tekstbestand
+    Geeft dezelfde tekst als json.dump(lijst, f, indent=2, ensure_ascii=False), of met compact als
+    json.dump(lijst, f, ensure_ascii=False, separators=(',', ':')), zonder de hele lijst als dicts of
+    als tekst in het geheugen te houden.
+    """
+
+    def __init__(self, f, compact=False):
+        self.f = f
+        self.compact = compact
+        self.aantal = 0
+
+    def element(self, data):
+        """Eén element als tekst, op de plek waar json.dump het in de lijst zet"""
+        if self.compact:
+            return JSON_COMPACT.encode(data)
+        if type(data) is dict and data and set(map(type, data.values())) <= JSON_SCALAIRE_TYPES:
+            # Platte dict (zoals een adres): de C encoder met de regelovergang in het scheidingsteken is
+            # veel sneller dan indent=2, dat in pure Python draait, en geeft dezelfde tekst
+            return '  {\n    ' + JSON_PLAT_ELEMENT.encode(data)[1:-1] + '\n  }'
+        return '  ' + JSON_INGESPRONGEN.encode(data).replace('\n', '\n  ')
+
+    def write(self, data):
+        if self.aantal:
+            self.f.write(',' if self.compact else ',\n')
+        else:
+            self.f.write('[' if self.compact else '[\n')
+        self.f.write(self.element(data))
+        self.aantal += 1
+
+    def close(self):
+        if not self.aantal:
+            self.f.write('[]')
+        else:
+            self.f.write(']' if self.compact else '\n]')
+
+def write_json_array(f, elementen, compact=False):
+    """Schrijf alle elementen (dicts) als één JSON array; geeft het aantal"""
+    writer = JsonArrayWriter(f, compact)
+    for data in elementen:
+        writer.write(data)
+    writer.close()
+    return writer.aantal
+
+def file_sha1(path, blok_grootte=1 << 20):
+    """SHA1 van de inhoud van een bestand (in blokken gelezen)"""
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for blok in iter(lambda: f.read(blok_grootte), b''):
+            h.update(blok)
+    return h.hexdigest()
+
+def snapshot_paden(path, sheet_name=0, snapshot_dir=snapshot_cache_dir):
+    """Paden van de snapshot (pickle) en bijbehorende metadata voor een werkblad van een Excel bestand"""
+    bron = os.path.abspath(path) if sheet_name == 0 else f"{os.path.abspath(path)}::{sheet_name}"
+    sleutel = hashlib.sha1(bron.encode('utf-8')).hexdigest()[:12]
+    basis = os.path.join(snapshot_dir, sleutel)
+    return basis + '.pkl', basis + '.json'
+
+def read_excel_cached(path, sheet_name=0, snapshot_dir=snapshot_cache_dir):
+    """Lees een werkblad via read_excel_file, met een snapshot cache in snapshot_dir (None: geen cache)
+    De snapshot is geldig zolang grootte en mtime (of bij gewijzigde mtime: de SHA1 van de inhoud)
+    en de pandas versie gelijk zijn. Pickle in plaats van Parquet/Feather omdat de kolommen
+    dtype=object met gemengde types zijn; die overleven een Arrow round-trip niet ongewijzigd.
+    """
+    if not snapshot_dir:
+        return read_excel_file(path, sheet_name)
     
-    # Bouw adres string voor geocoding
-    address_parts = []
-    if straat:
-        if huisnummer:
-            address_parts.append(f"{straat} {huisnummer}")
+    stat = os.stat(path)
+    pkl_path, meta_path = snapshot_paden(path, sheet_name, snapshot_dir)
+    sha1 = None
+    try:
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        if (meta.get('versie') == SNAPSHOT_VERSIE and meta.get('pandas_versie') == pd.__version__
+                and meta.get('size') == stat.st_size):
+            geldig = meta.get('mtime_ns') == stat.st_mtime_ns
+            if not geldig:
+                sha1 = file_sha1(path)
+                geldig = meta.get('sha1') == sha1
+            if geldig:
+                df = pd.read_pickle(pkl_path)
+                if meta.get('mtime_ns') != stat.st_mtime_ns:
+                    # Zelfde inhoud met nieuwe mtime: werk de metadata bij zodat de volgende run niet hasht
+                    meta['mtime_ns'] = stat.st_mtime_ns
+                    with atomic_open(meta_path) as f:
+                        json.dump(meta, f)
+                print(f"[INFO] Snapshot gebruikt voor {bron_label(path, sheet_name)} (bestand ongewijzigd)")
+                return df
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        print(f"[WAARSCHUWING] Snapshot van {path} onbruikbaar, bestand wordt opnieuw gelezen: {e}")
+    
+    df = read_excel_file(path, sheet_name)
+    
+    try:
+        os.makedirs(snapshot_dir, exist_ok=True)
+        with atomic_open(pkl_path, 'wb') as f:
+            df.to_pickle(f)
+        meta = {
+            'versie': SNAPSHOT_VERSIE,
+            'bron': os.path.abspath(path),
+            'werkblad': sheet_name,
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'sha1': sha1 or file_sha1(path),
+            'pandas_versie': pd.__version__,
+        }
+        with atomic_open(meta_path) as f:
+            json.dump(meta, f)
+    except Exception as e:
+        print(f"[WAARSCHUWING] Kon snapshot van {path} niet opslaan: {e}")
+    return df
+
+def _read_excel_in_worker(path, sheet_name, snapshot_dir):
+    start = time.perf_counter()
+    df = read_excel_cached(path, sheet_name, snapshot_dir)
+    return df, time.perf_counter() - start
+
+def read_excel_parallel(bronnen, workers, snapshot_dir=snapshot_cache_dir):
+    """Lees meerdere werkbladen tegelijk in, elk in een eigen proces (openpyxl parsen is CPU werk)
+    Met genoeg processen duurt het inlezen zo lang als het langzaamste bestand in plaats van de som.
+    Returns: per bron (pad, werkblad) een tuple (DataFrame, seconden), of de exceptie als lezen mislukte.
+    """
+    def resultaat(functie, *argumenten):
+        try:
+            return functie(*argumenten)
+        except Exception as e:
+            return e
+    
+    workers = max(1, min(workers, len(bronnen)))
+    if workers == 1:
+        return [resultaat(_read_excel_in_worker, path, sheet_name, snapshot_dir) for path, sheet_name in bronnen]
+    with ProcessPoolExecutor(workers) as pool:
+        taken = [pool.submit(_read_excel_in_worker, path, sheet_name, snapshot_dir) for path, sheet_name in bronnen]
+        return [resultaat(taak.result) for taak in taken]
+
+def write_naam_sidecar(df, naam_col, path, bron_col=None):
+    """Schrijf originele en geformatteerde namen naar een CSV naast het bronbestand"""
+    kolommen = ([bron_col] if bron_col else []) + [naam_col, 'Naam Geformatteerd']
+    with atomic_open(path, encoding='utf-8-sig', newline='') as f:
+        df[kolommen].to_csv(f, index=False)
+
+# Standaard NA waarden van pandas.read_excel en Excel foutwaarden; deze cellen gelden als leeg
+EXCEL_NA_WAARDEN = frozenset([
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+    '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null',
+    '#DIV/0!', '#VALUE!', '#REF!', '#NAME?', '#NUM!', '#NULL!',
+])
+
+def excel_cell_value(waarde):
+    """Zet een openpyxl celwaarde om zoals pandas.read_excel dat doet (None voor lege cellen)"""
+    if waarde is None:
+        return None
+    if isinstance(waarde, float):
+        if waarde != waarde:
+            return None
+        return int(waarde) if waarde.is_integer() else waarde
+    if isinstance(waarde, str) and waarde in EXCEL_NA_WAARDEN:
+        return None
+    return waarde
+
+def excel_header(rij):
+    """Maak kolomnamen van de eerste rij zoals pandas: lege namen worden "Unnamed: i",
+    dubbele namen krijgen een achtervoegsel ".1", ".2", ...
+    """
+    rij = list(rij)
+    while rij and rij[-1] is None:
+        rij.pop()
+    kolomnamen = []
+    gezien = {}
+    for i, naam in enumerate(rij):
+        naam = excel_cell_value(naam)
+        if naam is None:
+            naam = f"Unnamed: {i}"
+        basis = naam
+        if basis in gezien:
+            gezien[basis] += 1
+            naam = f"{basis}.{gezien[basis]}"
+            while naam in gezien:
+                gezien[basis] += 1
+                naam = f"{basis}.{gezien[basis]}"
+        gezien[naam] = 0
+        kolomnamen.append(naam)
+    return kolomnamen
+
+def open_excel_stream(path, sheet_name=0):
+    """Open een werkblad (standaard het eerste) in read_only modus, zonder het hele bestand in te lezen
+    Returns: (kolomnamen, rijen). rijen is een generator van (rij_index, waarden) voor alle
+    niet-lege rijen, met waarden omgezet zoals pandas.read_excel dat doet.
+    """
+    import openpyxl
+    wb = openpyxl.load_workbook(path, read_only=True, data_only=True, keep_links=False)
+    ws = wb.worksheets[0] if sheet_name == 0 else wb[sheet_name]
+    rij_iterator = ws.iter_rows(values_only=True)
+    header = next(rij_iterator, None)
+    if header is None:
+        wb.close()
+        return [], iter(())
+    
+    def rijen():
+        try:
+            for rij_index, rij in enumerate(rij_iterator):
+                waarden = tuple(excel_cell_value(waarde) for waarde in rij)
+                if all(waarde is None for waarde in waarden):
+                    continue
+                yield rij_index, waarden
+        finally:
+            wb.close()
+    
+    return excel_header(header), rijen()
+
+def fallback_naam(waarden, kolomnamen, speciale_kolommen):
+    """Naam voor een rij zonder (bruikbare) naam: de eerste gevulde kolom die geen adres kolom is,
+    anders de eerste gevulde kolom. De afgeleide kolom 'Naam Geformatteerd' telt niet mee
+    (die is leeg als de naam leeg is).
+    """
+    kandidaten = [(col, waarde) for col, waarde in zip(kolomnamen, waarden)
+                  if col != 'Naam Geformatteerd' and waarde is not None and pd.notna(waarde) and str(waarde).strip()]
+    naam = None
+    for col, waarde in kandidaten:
+        if col not in speciale_kolommen:
+            naam = format_naam(waarde)
+            break
+    if not naam and kandidaten:
+        naam = format_naam(kandidaten[0][1])
+    return naam
+
+def iter_excel_chunks(kolomnamen, rijen, kolommen, chunk_size=5000):
+    """Groepeer gestreamde rijen in kleine DataFrames met alleen de benodigde kolommen
+    Yields: (chunk, fallback_namen). De index van de chunk is het rijnummer in het werkblad,
+    fallback_namen bevat per rij zonder bruikbare naam de naam volgens fallback_naam().
+    """
+    nodig = []
+    for col in kolommen.values():
+        if col is not None and col not in nodig:
+            nodig.append(col)
+    posities = [kolomnamen.index(col) for col in nodig]
+    speciale_kolommen = [col for veld, col in kolommen.items() if veld != "naam"]
+    naam_positie = kolomnamen.index(kolommen["naam"]) if kolommen["naam"] else None
+    
+    def leeg_record():
+        return [], [], []
+    
+    indexen, records, fallback_namen = leeg_record()
+    for rij_index, waarden in rijen:
+        indexen.append(rij_index)
+        records.append([waarden[p] if p < len(waarden) else None for p in posities])
+        naam = waarden[naam_positie] if naam_positie is not None and naam_positie < len(waarden) else None
+        if naam is None or not format_naam(naam):
+            fallback_namen.append(fallback_naam(waarden, kolomnamen, speciale_kolommen))
         else:
-            address_parts.append(straat)
-    if postcode:
-        address_parts.append(postcode)
-    if plaats:
-        address_parts.append(plaats)
+            fallback_namen.append(None)
+        
+        if len(records) >= chunk_size:
+            yield pd.DataFrame(records, columns=nodig, index=indexen, dtype=object), fallback_namen
+            indexen, records, fallback_namen = leeg_record()
     
-    # Voeg "Nederland" toe voor betere resultaten
-    address_parts.append("Nederland")
+    if records:
+        yield pd.DataFrame(records, columns=nodig, index=indexen, dtype=object), fallback_namen
+
+def normalize_geocode_query(address_query):
+    """Normaliseer een geocoding query voor gebruik als cache key"""
+    return re.sub(r'\s+', ' ', str(address_query).strip().lower())
+
+def geocode_query_tekst(address_query):
+    """Tekst van een query voor cache en meldingen; gestructureerde velden als "street=...; city=..." """
+    if isinstance(address_query, dict):
+        return "; ".join(f"{veld}={waarde}" for veld, waarde in address_query.items())
+    return address_query
+
+class GeocodeCache:
+    """Persistente SQLite cache voor geocoding resultaten
+    Slaat zowel gevonden coördinaten (hits) als niet gevonden adressen (misses) op,
+    met timestamp voor TTL en LRU opschoning. Opschonen tot max_entries gebeurt bij openen en sluiten,
+    niet bij elke put; tijdens een run kan de cache dus tijdelijk groter zijn.
+    """
+
+    def __init__(self, path, ttl_hit=GEOCODE_CACHE_TTL_HIT, ttl_miss=GEOCODE_CACHE_TTL_MISS,
+                 max_entries=GEOCODE_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.ttl_hit = ttl_hit
+        self.ttl_miss = ttl_miss
+        self.max_entries = max_entries
+        self.hits = 0  # Cache hits (adres gevonden in cache)
+        self.negative_hits = 0  # Waarvan cache hits met "niet gevonden" resultaat
+        self.misses = 0  # Cache misses (netwerk request nodig)
+        # De cache wordt gedeeld door de geocoding workers; toegang loopt via self.lock
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS geocode ("
+            " query TEXT PRIMARY KEY,"
+            " lat REAL,"
+            " lon REAL,"
+            " cached_at REAL NOT NULL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_geocode_cached_at ON geocode (cached_at)")
+        # Ook hier, voor een vorige run die niet netjes gesloten is
+        self.cleanup()
+        self.conn.commit()
+
+    def get(self, address_query):
+        """Zoek een query op in de cache
+        Returns: (gevonden, lat, lon). Bij een gecachte miss is gevonden True en lat/lon None.
+        """
+        key = normalize_geocode_query(address_query)
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT lat, lon, cached_at FROM geocode WHERE query = ?", (key,)
+            ).fetchone()
+            
+            if row is not None:
+                lat, lon, cached_at = row
+                ttl = self.ttl_hit if lat is not None and lon is not None else self.ttl_miss
+                if time.time() - cached_at <= ttl:
+                    self.hits += 1
+                    if lat is None or lon is None:
+                        self.negative_hits += 1
+                    return True, lat, lon
+                # Verlopen entry, verwijder en behandel als miss
+                self.conn.execute("DELETE FROM geocode WHERE query = ?", (key,))
+                self.conn.commit()
+            
+            self.misses += 1
+            return False, None, None
+
+    def put(self, address_query, lat, lon):
+        """Sla een geocoding resultaat op (lat/lon None = adres niet gevonden)"""
+        key = normalize_geocode_query(address_query)
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO geocode (query, lat, lon, cached_at) VALUES (?, ?, ?, ?)",
+                (key, lat, lon, time.time())
+            )
+            self.conn.commit()
+
+    def cleanup(self):
+        """Verwijder de oudste entries als de cache groter is dan max_entries"""
+        count = self.conn.execute("SELECT COUNT(*) FROM geocode").fetchone()[0]
+        if count > self.max_entries:
+            self.conn.execute(
+                "DELETE FROM geocode WHERE query IN ("
+                " SELECT query FROM geocode ORDER BY cached_at ASC LIMIT ?)",
+                (count - self.max_entries,)
+            )
+
+    def close(self):
+        with self.lock:
+            self.cleanup()
+            self.conn.commit()
+            self.conn.close()
+
+    def print_stats(self):
+        totaal = self.hits + self.misses
+        print(f"[INFO] Geocode cache: {self.hits} hits ({self.negative_hits} als 'niet gevonden'), "
+              f"{self.misses} misses van {totaal} lookups ({self.path})")
+
+def stable_adres_id(sleutel, gebruikte_ids):
+    """Maak een stabiele ID op basis van inhoud (niet het rijnummer), zodat IDs niet
+    verschuiven als er rijen worden toegevoegd. Dubbele sleutels krijgen een volgnummer.
+    """
+    basis = "shared-" + hashlib.sha1(normalize_naam(sleutel).encode('utf-8')).hexdigest()[:10]
+    adres_id = basis
+    volgnummer = 2
+    while adres_id in gebruikte_ids:
+        adres_id = f"{basis}-{volgnummer}"
+        volgnummer += 1
+    gebruikte_ids.add(adres_id)
+    return adres_id
+
+def row_fingerprints(df, kolommen):
+    """Hash per rij van de relevante (ruwe) celwaarden, om gewijzigde rijen te herkennen"""
+    kolom_waarden = [clean_text_column(df[col]) for col in kolommen]
+    fingerprints = []
+    for waarden in zip(*kolom_waarden) if kolom_waarden else ([] for _ in range(len(df))):
+        tekst = "\x1f".join(waarde if waarde is not None else "" for waarde in waarden)
+        fingerprints.append(hashlib.sha1(tekst.encode('utf-8')).hexdigest())
+    return fingerprints
+
+def adres_sleutel(straat, huisnummer, postcode, plaats):
+    """Sleutel voor een adres (zelfde opbouw als getGeocodeCacheKey in index.html)"""
+    delen = [str(d).lower().strip() for d in (straat, huisnummer, postcode, plaats) if d]
+    return "|".join(delen)
+
+class AdresRecord:
+    """Eén adres in adressen.json, met __slots__ in plaats van een dict per medewerker
+    De velden heten zoals de JSON sleutels; optionele velden (bu, latitude, longitude, coordinatenBron)
+    zijn None als ze ontbreken. Sleutels uit een vorige adressen.json die deze tool niet kent blijven
+    bewaard in `extra` en komen achteraan terug in to_dict().
+    """
+    VELDEN = ("id", "naam", "straat", "huisnummer", "postcode", "plaats", "source", "toegevoegdOp",
+              "bu", "latitude", "longitude", "coordinatenBron")
+    __slots__ = VELDEN + ("extra",)
+
+    def __init__(self, id, naam, straat="", huisnummer="", postcode="", plaats="", source="shared",
+                 toegevoegdOp=None, bu=None, latitude=None, longitude=None, coordinatenBron=None):
+        self.id = id
+        self.naam = naam
+        self.straat = straat
+        self.huisnummer = huisnummer
+        self.postcode = postcode
+        # Plaats en BU komen bij veel medewerkers terug: één gedeeld string object per waarde
+        self.plaats = intern_tekst(plaats)
+        self.source = source
+        self.toegevoegdOp = toegevoegdOp
+        self.bu = intern_tekst(bu)
+        self.latitude = latitude
+        self.longitude = longitude
+        self.coordinatenBron = coordinatenBron
+        self.extra = None
+
+    @classmethod
+    def from_dict(cls, data):
+        """Record van een adres uit adressen.json (of het checkpoint)"""
+        record = cls(**{veld: data.get(veld) for veld in cls.VELDEN})
+        extra = {sleutel: waarde for sleutel, waarde in data.items() if sleutel not in cls.VELDEN}
+        record.extra = extra or None
+        return record
+
+    def to_dict(self):
+        """Het adres zoals in adressen.json: velden in vaste volgorde, ontbrekende (None) velden weggelaten"""
+        data = {}
+        for veld in self.VELDEN:
+            waarde = getattr(self, veld)
+            if waarde is not None:
+                data[veld] = waarde
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+    def heeft_coordinaten(self):
+        return self.latitude is not None and self.longitude is not None
+
+    def zet_coordinaten(self, latitude, longitude, bron):
+        self.latitude = latitude
+        self.longitude = longitude
+        self.coordinatenBron = bron
+
+def intern_tekst(waarde):
+    """sys.intern voor strings (andere waarden, zoals None, ongewijzigd)"""
+    return sys.intern(waarde) if type(waarde) is str else waarde
+
+def load_previous_output(path):
+    """Lees de vorige adressen.json (voor incrementele conversie)"""
+    if not os.path.exists(path):
+        print(f"[INFO] Geen vorige output gevonden ({path}), alle rijen worden verwerkt")
+        return []
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            vorige = json.load(f)
+        if not isinstance(vorige, list):
+            print(f"[WAARSCHUWING] {path} is geen JSON array, wordt genegeerd")
+            return []
+        print(f"[INFO] Vorige output gelezen: {len(vorige)} adressen uit {path}")
+        return vorige
+    except Exception as e:
+        print(f"[WAARSCHUWING] Kon vorige output niet lezen: {e}")
+        return []
+
+def load_incremental_state(path):
+    """Lees de fingerprints (id -> hash van de bronrij) van de vorige run"""
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+        return state.get("fingerprints", {})
+    except Exception as e:
+        print(f"[WAARSCHUWING] Kon incrementele state niet lezen: {e}")
+        return {}
+
+def save_incremental_state(path, fingerprints):
+    """Sla de fingerprints van deze run op voor een volgende incrementele run"""
+    try:
+        with atomic_open(path) as f:
+            json.dump({"versie": 1, "fingerprints": fingerprints}, f, ensure_ascii=False)
+    except Exception as e:
+        print(f"[WAARSCHUWING] Kon incrementele state niet opslaan: {e}")
+
+def afgeleid_pad(output, standaard):
+    """Pad naast output met hetzelfde achtervoegsel als standaard naast output_path heeft
+    Bijv. -o regio.json: adressen_state.json -> regio_state.json, adressen.index.json -> regio.index.json.
+    """
+    stam = os.path.splitext(output_path)[0]
+    if not standaard.startswith(stam):
+        return standaard
+    return os.path.splitext(output)[0] + standaard[len(stam):]
+
+class UitvoerPaden:
+    """Bestanden van één conversie: adressen.json (-o) en de bestanden die daarbij horen
+    State, checkpoint, index en clusters krijgen de basisnaam van de output, zodat runs met
+    verschillende outputs elkaars bestanden niet gebruiken of overschrijven.
+    """
+
+    def __init__(self, output=output_path):
+        self.output = output
+        self.incremental_state = afgeleid_pad(output, incremental_state_path)
+        self.checkpoint = afgeleid_pad(output, checkpoint_path)
+        self.spatial_index = afgeleid_pad(output, spatial_index_path)
+        self.clusters = afgeleid_pad(output, cluster_path)
+
+def checkpoint_invoer(args, bronnen, afas_paden, paden):
+    """Beschrijving van de invoer van een run (bestanden met grootte en mtime, geocoder)
+    Een checkpoint wordt alleen hervat als deze beschrijving gelijk is.
+    """
+    def bestand(pad):
+        try:
+            stat = os.stat(pad)
+            return [os.path.abspath(pad), stat.st_size, stat.st_mtime_ns]
+        except OSError:
+            return [os.path.abspath(pad), None, None]
     
-    address_query = ", ".join(address_parts)
+    invoer = {
+        "werkbladen": [bestand(pad) + [werkblad] for pad, werkblad in bronnen],
+        "afas": [bestand(pad) for pad in afas_paden],
+        "postcode_tabel": bestand(args.postcode_table) if args.postcode_table else None,
+        "incrementeel": [bestand(paden.output), bestand(paden.incremental_state)] if args.incremental else None,
+        "geocoder": [args.geocoder, args.geocode_url],
+    }
+    return json.loads(json.dumps(invoer))  # Zelfde vorm als na het teruglezen (tuples -> lijsten)
+
+class Checkpoint:
+    """Journal van een run (JSON lines), zodat een onderbroken run met --resume verder kan
+    De eerste regel beschrijft de invoer. Daarna volgen de stappen: één "records" regel met de
+    geconverteerde adressen (inclusief OE namen en postcode coördinaten), geschreven zodra de conversie
+    klaar is, en per gegeocodeerd adres een "geocoding" regel. Er wordt periodiek geflusht; een half
+    geschreven laatste regel wordt bij het hervatten weggegooid. Een run die tijdens het inlezen of de
+    conversie zelf onderbroken wordt, heeft nog geen "records" regel en converteert opnieuw.
+    """
+
+    def __init__(self, path, invoer, flush_interval=CHECKPOINT_FLUSH_SECONDEN):
+        self.path = path
+        self.invoer = invoer
+        self.flush_interval = flush_interval
+        self.records = None  # (adressen als AdresRecord, fingerprints) uit de vorige run
+        self.geocoding = {}  # Sleutel van een uniek adres -> (lat, lon) uit de vorige run
+        self.geldig_tot = 0  # Bytes van het journal die heel en bruikbaar zijn
+        self.f = None
+        self.lock = threading.Lock()
+        self.laatste_flush = time.monotonic()
+
+    def load(self):
+        """Lees het journal van de vorige run; geeft True als het bij deze invoer hoort"""
+        try:
+            f = open(self.path, 'rb')
+        except FileNotFoundError:
+            print(f"[INFO] Geen checkpoint gevonden ({self.path}), de run begint opnieuw")
+            return False
+        with f:
+            try:
+                kop = json.loads(f.readline())
+            except ValueError:
+                kop = {}
+            if kop.get("versie") != CHECKPOINT_VERSIE or kop.get("invoer") != self.invoer:
+                print(f"[WAARSCHUWING] Checkpoint {self.path} hoort bij andere invoer (bestanden gewijzigd?), "
+                      f"de run begint opnieuw")
+                return False
+            self.geldig_tot = f.tell()
+            for regel in f:
+                try:
+                    data = json.loads(regel)
+                except ValueError:
+                    break  # Half geschreven regel (de vorige run stopte tijdens het schrijven)
+                if data["stap"] == "records":
+                    self.records = [AdresRecord.from_dict(adres) for adres in data["adressen"]], data["fingerprints"]
+                elif data["stap"] == "geocoding":
+                    self.geocoding[data["sleutel"]] = data["lat"], data["lon"]
+                self.geldig_tot = f.tell()
+        print(f"[INFO] Checkpoint gevonden: {'adressen geconverteerd, ' if self.records else ''}"
+              f"{len(self.geocoding)} unieke adressen gegeocodeerd")
+        return True
+
+    def open(self, hervat=False):
+        """Begin een nieuw journal, of schrijf verder na het bruikbare deel van het vorige"""
+        if self.f is not None:
+            return
+        if hervat:
+            self.f = open(self.path, 'r+', encoding='utf-8')
+            self.f.truncate(self.geldig_tot)
+            self.f.seek(self.geldig_tot)
+        else:
+            self.f = open(self.path, 'w', encoding='utf-8')
+            self._schrijf({"versie": CHECKPOINT_VERSIE, "invoer": self.invoer})
+        self.flush()
+
+    def _schrijf(self, data):
+        self.f.write(json.dumps(data, ensure_ascii=False, separators=(',', ':')) + "\n")
+
+    def stap_records(self, adressen, fingerprints):
+        with self.lock:
+            # Eén regel, maar de adressen worden één voor één geschreven
+            self.f.write('{"stap":"records","fingerprints":'
+                         + json.dumps(fingerprints, ensure_ascii=False, separators=(',', ':')) + ',"adressen":')
+            write_json_array(self.f, (adres.to_dict() for adres in adressen), compact=True)
+            self.f.write('}\n')
+            self.flush()
+
+    def stap_geocoding(self, sleutel, lat, lon):
+        with self.lock:
+            self._schrijf({"stap": "geocoding", "sleutel": sleutel, "lat": lat, "lon": lon})
+            if time.monotonic() - self.laatste_flush >= self.flush_interval:
+                self.flush()
+
+    def flush(self):
+        self.f.flush()
+        os.fsync(self.f.fileno())
+        self.laatste_flush = time.monotonic()
+
+    def close(self):
+        if self.f is not None:
+            with self.lock:
+                self.flush()
+                self.f.close()
+                self.f = None
+
+    def remove(self):
+        """De run is klaar: het journal is niet meer nodig"""
+        self.close()
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(self.path)
+
+def prepare_rows(df, kolommen, bron_kolommen, speciale_kolommen, fallback_namen=None, oe_matcher=None):
+    """Bereid een blok rijen kolomsgewijs voor: opschonen, namen formatteren en adressen parsen
+    Hangt alleen af van de argumenten, zodat dit ook in een worker proces kan draaien. Met
+    oe_matcher worden de unieke geformatteerde namen ook alvast gematcht (oe_matches). Een ingelezen
+    werkblad met de kolom 'Naam Geformatteerd' (format_naam_column van de naam kolom) wordt niet
+    opnieuw geformatteerd; gestreamde blokken wel, want daar komt die kolom uit het bestand zelf.
+    Returns: dict met per veld een lijst (één waarde per rij) en de tijden per stap.
+    """
+    naam_col = kolommen["naam"]
+    straat_col = kolommen["straat"]
+    volledig_adres_col = kolommen["volledig_adres"]
+    
+    # Bereid alle kolommen kolomsgewijs voor (in plaats van per rij via df.iterrows())
+    aantal_rijen = len(df)
+    def kolom_of_leeg(col, functie=clean_text_column):
+        return functie(df[col]) if col else [None] * aantal_rijen
     
+    rijen = {"rij_indexen": df.index.tolist(), "tijden": {}}
+    if fallback_namen is None:
+        rijen["niet_leeg"] = (~df.isna().all(axis=1)).tolist()
+    else:
+        # Gestreamde chunks bevatten alleen niet-lege rijen (over alle kolommen, niet alleen de benodigde)
+        rijen["niet_leeg"] = [True] * aantal_rijen
+    rijen["fingerprints"] = row_fingerprints(df, bron_kolommen)
+    rijen["naam"] = kolom_of_leeg(naam_col)
+    if naam_col and fallback_namen is None and 'Naam Geformatteerd' in df.columns:
+        # Al geformatteerd (en gemeten) door converteer_bronnen voor het sidecar bestand
+        rijen["naam_geformatteerd"] = column_values(df['Naam Geformatteerd'])
+    else:
+        start = time.perf_counter()
+        rijen["naam_geformatteerd"] = kolom_of_leeg(naam_col, format_naam_column)
+        rijen["tijden"]["namen_formatteren"] = time.perf_counter() - start
+    rijen["straat"] = kolom_of_leeg(straat_col if straat_col != volledig_adres_col else None)
+    rijen["huisnummer"] = kolom_of_leeg(kolommen["huisnummer"])
+    rijen["postcode"] = kolom_of_leeg(kolommen["postcode"])
+    rijen["plaats"] = kolom_of_leeg(kolommen["plaats"])
+    rijen["bu"] = kolom_of_leeg(kolommen["bu"])
+    rijen["lat"] = kolom_of_leeg(kolommen["lat"], float_column)
+    rijen["lng"] = kolom_of_leeg(kolommen["lng"], float_column)
+    rijen["volledig_adres"] = kolom_of_leeg(volledig_adres_col, column_values)
+    if volledig_adres_col:
+        rijen["parsed"] = parse_address_column(df[volledig_adres_col])
+    
+    # Naam voor rijen zonder bruikbare naam: een andere gevulde kolom (zeldzaam, dus per rij)
+    if fallback_namen is None:
+        fallback_namen = [None] * aantal_rijen
+        for pos in range(aantal_rijen):
+            if rijen["niet_leeg"][pos] and not rijen["naam_geformatteerd"][pos]:
+                row = df.iloc[pos]
+                fallback_namen[pos] = fallback_naam([row[col] for col in df.columns], list(df.columns), speciale_kolommen)
+    rijen["fallback_naam"] = fallback_namen
+    
+    if oe_matcher is not None:
+        start = time.perf_counter()
+        oe_matches = {}
+        for naam in rijen["naam_geformatteerd"]:
+            geformatteerde_naam = str(naam).strip() if naam else ""
+            if geformatteerde_naam and geformatteerde_naam not in oe_matches:
+                oe_matches[geformatteerde_naam] = oe_matcher.match(geformatteerde_naam, min_similarity=0.5)
+        rijen["oe_matches"] = oe_matches
+        rijen["tijden"]["oe_matching"] = time.perf_counter() - start
+    return rijen
+
+# Argumenten van prepare_rows die per worker proces één keer worden doorgegeven (zie AdresConverter.convert_chunks)
+_worker_argumenten = None
+
+def _init_prepare_worker(kolommen, bron_kolommen, speciale_kolommen, oe_matcher):
+    global _worker_argumenten
+    _worker_argumenten = kolommen, bron_kolommen, speciale_kolommen, oe_matcher
+
+def _prepare_in_worker(df, fallback_namen):
+    kolommen, bron_kolommen, speciale_kolommen, oe_matcher = _worker_argumenten
+    return prepare_rows(df, kolommen, bron_kolommen, speciale_kolommen, fallback_namen, oe_matcher)
+
+def parallel_workers(workers, aantal_rijen):
+    """Aantal worker processen: het opgegeven aantal, of automatisch alle cores vanaf PARALLEL_MIN_RIJEN rijen"""
+    if workers is None:
+        workers = (os.cpu_count() or 1) if aantal_rijen >= PARALLEL_MIN_RIJEN else 1
+    return max(1, workers)
+
+class AdresConverter:
+    """Zet medewerker rijen (een heel DataFrame of chunks daarvan) om naar adres objecten
+    Houdt de state bij die over chunks (en bronnen) heen gedeeld wordt: gebruikte IDs, fingerprints,
+    OE matches en de adressen van een vorige run (incrementele modus).
+    Met ontdubbelen wordt een medewerker die al uit een eerdere bron (werkblad) kwam, met dezelfde
+    naam en hetzelfde adres, overgeslagen; dubbele rijen binnen één bron blijven zoals ze zijn.
+    Nieuwe adressen krijgen allemaal hetzelfde toegevoegdOp tijdstip: het begin van de run.
+    Tijden, tellers en meldingen gaan naar report (standaard het module rapport run_report).
+    """
+
+    def __init__(self, kolommen, oe_mapping, oe_matcher, vorige_adressen=None, vorige_fingerprints=None,
+                 ontdubbelen=False, report=None):
+        self.report = report if report is not None else run_report
+        self.oe_mapping = oe_mapping
+        self.oe_matcher = oe_matcher
+        self.vorige_fingerprints = vorige_fingerprints or {}
+        self.ontdubbelen = ontdubbelen
+        self.toegevoegd_op = datetime.now().isoformat() + "Z"
+        self.gebruik_bron(kolommen)
+        
+        self.vorige_per_id = {}
+        self.vorige_coordinaten = {}
+        for vorig in vorige_adressen or []:
+            if "id" in vorig:
+                self.vorige_per_id[vorig["id"]] = vorig
+            if "latitude" in vorig and "longitude" in vorig:
+                sleutel = adres_sleutel(vorig.get("straat"), vorig.get("huisnummer"), vorig.get("postcode"), vorig.get("plaats"))
+                if sleutel:
+                    self.vorige_coordinaten[sleutel] = (vorig["latitude"], vorig["longitude"], vorig.get("coordinatenBron"))
+        
+        self.adressen = []
+        self.fingerprints = {}
+        self.gebruikte_ids = set()
+        self.oe_matches = {}  # Geformatteerde naam -> (oe_naam, score), zodat dubbele namen maar één keer gematcht worden
+        self.hergebruikt = 0
+        self.coordinaten_hergebruikt = 0
+        self.gezien = {}  # (naam, adres) -> bron waar de medewerker het eerst in stond (alleen bij ontdubbelen)
+        self.dubbel = 0
+
+    def gebruik_bron(self, kolommen, bron=None):
+        """Stel de kolommen (zie detect_columns) in van de bron waarvan de volgende rijen komen"""
+        self.kolommen = kolommen
+        self.bron = bron
+        # Kolommen die de inhoud van een adres bepalen (voor stabiele IDs en wijzigingsdetectie)
+        self.bron_kolommen = []
+        for col in kolommen.values():
+            if col is not None and col not in self.bron_kolommen:
+                self.bron_kolommen.append(col)
+        # Alle kolommen behalve de naam; niet bruikbaar als fallback naam
+        self.speciale_kolommen = [col for veld, col in kolommen.items() if veld != "naam"]
+
+    def _al_toegevoegd(self, adres_id, adres):
+        """Stond deze medewerker (zelfde naam en adres) al in een eerdere bron? Zo ja: ID en fingerprint vrijgeven"""
+        sleutel = (normalize_naam(adres.naam), adres_sleutel(adres.straat, adres.huisnummer, adres.postcode, adres.plaats))
+        if self.gezien.setdefault(sleutel, self.bron) == self.bron:
+            return False
+        # De ID is als laatste uitgegeven; vrijgeven geeft de volgende rijen dezelfde IDs als zonder deze rij
+        self.gebruikte_ids.discard(adres_id)
+        del self.fingerprints[adres_id]
+        self.dubbel += 1
+        return True
+
+    def convert(self, df, fallback_namen=None):
+        """Converteer de rijen van df en voeg de adressen toe aan self.adressen
+        De index van df is het rijnummer in het werkblad. fallback_namen (optioneel, bij streaming)
+        bevat per rij de naam voor rijen zonder bruikbare naam; anders wordt die uit df bepaald.
+        """
+        self.convert_prepared(prepare_rows(df, self.kolommen, self.bron_kolommen, self.speciale_kolommen, fallback_namen))
+
+    def convert_chunks(self, chunks, workers=1):
+        """Converteer blokken (df, fallback_namen) in de gegeven volgorde; yields het aantal rijen per blok
+        Met workers > 1 draait prepare_rows in een process pool (de OE matcher wordt één keer per
+        worker doorgegeven). IDs, hergebruik en de volgorde van de adressen worden hier bepaald,
+        dus de output is gelijk aan die van de seriële verwerking.
+        """
+        if workers <= 1:
+            for chunk, fallback_namen in chunks:
+                start = time.perf_counter()
+                self.convert(chunk, fallback_namen)
+                self.report.add("conversie", time.perf_counter() - start, rijen=len(chunk))
+                yield len(chunk)
+            return
+        
+        oe_matcher = self.oe_matcher if self.oe_mapping else None
+        initargs = (self.kolommen, self.bron_kolommen, self.speciale_kolommen, oe_matcher)
+        with ProcessPoolExecutor(workers, initializer=_init_prepare_worker, initargs=initargs) as pool:
+            lopend = deque()
+            
+            def verwerk_oudste():
+                start = time.perf_counter()
+                rijen = lopend.popleft().result()
+                self.convert_prepared(rijen)
+                aantal = len(rijen["rij_indexen"])
+                self.report.add("conversie", time.perf_counter() - start, rijen=aantal)
+                return aantal
+            
+            for chunk, fallback_namen in chunks:
+                lopend.append(pool.submit(_prepare_in_worker, chunk, fallback_namen))
+                # Beperk het aantal blokken dat tegelijk in het geheugen staat (belangrijk bij streaming)
+                while len(lopend) > 2 * workers:
+                    yield verwerk_oudste()
+            while lopend:
+                yield verwerk_oudste()
+
+    def convert_prepared(self, rijen):
+        """Maak adressen van de voorbereide rijen (zie prepare_rows) en voeg ze toe aan self.adressen"""
+        aantal_rijen = len(rijen["rij_indexen"])
+        if "namen_formatteren" in rijen["tijden"]:
+            self.report.add("namen_formatteren", rijen["tijden"]["namen_formatteren"], rijen=aantal_rijen)
+        if "oe_matching" in rijen["tijden"]:
+            # Rekentijd in de worker; de tellers per soort match volgen hieronder
+            self.report.add("oe_matching", rijen["tijden"]["oe_matching"])
+        
+        rij_indexen = rijen["rij_indexen"]
+        niet_leeg = rijen["niet_leeg"]
+        rij_fingerprints = rijen["fingerprints"]
+        naam_waarden = rijen["naam"]
+        geformatteerde_namen = rijen["naam_geformatteerd"]
+        straat_waarden = rijen["straat"]
+        huisnummer_waarden = rijen["huisnummer"]
+        postcode_waarden = rijen["postcode"]
+        plaats_waarden = rijen["plaats"]
+        bu_waarden = rijen["bu"]
+        lat_waarden = rijen["lat"]
+        lng_waarden = rijen["lng"]
+        volledig_waarden = rijen["volledig_adres"]
+        fallback_namen = rijen["fallback_naam"]
+        voorbereide_matches = rijen.get("oe_matches", {})
+        if "parsed" in rijen:
+            parsed_straten, parsed_huisnummers, parsed_postcodes, parsed_plaatsen = rijen["parsed"]
+        
+        for pos in range(aantal_rijen):
+            # Skip lege rijen
+            if not niet_leeg[pos]:
+                continue
+            idx = rij_indexen[pos]
+            
+            # Maak een stabiele ID op basis van de (ruwe) naam, of de rij inhoud als er geen naam is
+            fingerprint = rij_fingerprints[pos]
+            if naam_waarden[pos]:
+                adres_id = stable_adres_id(naam_waarden[pos], self.gebruikte_ids)
+            else:
+                adres_id = stable_adres_id(fingerprint, self.gebruikte_ids)
+            self.fingerprints[adres_id] = fingerprint
+            
+            # Ongewijzigde rij: neem het vorige adres over zonder parsen, matchen of geocoden
+            vorig = self.vorige_per_id.get(adres_id)
+            if vorig is not None and self.vorige_fingerprints.get(adres_id) == fingerprint:
+                # Controleer of een exacte AFAS match inmiddels een andere OE naam geeft
+                oe_exact = self.oe_mapping.get(normalize_naam(vorig.get("naam"))) if self.oe_mapping else None
+                if not oe_exact or oe_exact == vorig.get("bu"):
+                    adres = AdresRecord.from_dict(vorig)
+                    if self.ontdubbelen and self._al_toegevoegd(adres_id, adres):
+                        continue
+                    self.adressen.append(adres)
+                    self.hergebruikt += 1
+                    continue
+            
+            # Haal de data uit de rij
+            straat = None
+            huisnummer = None
+            postcode = None
+            plaats = None
+            bu = None
+            
+            # Parse het volledige adres, tenzij er een aparte (gevulde) straat kolom is
+            if volledig_waarden[pos] is not None and straat_waarden[pos] is None:
+                straat = parsed_straten[pos]
+                huisnummer = parsed_huisnummers[pos]
+                postcode = parsed_postcodes[pos]
+                plaats = parsed_plaatsen[pos]
+            
+            # Gebruik de geformatteerde naam
+            naam = geformatteerde_namen[pos]
+            
+            # Aparte kolommen gaan voor op het geparste volledige adres
+            if straat_waarden[pos] is not None:
+                straat = straat_waarden[pos]
+            if huisnummer_waarden[pos] is not None:
+                huisnummer = huisnummer_waarden[pos]
+            if postcode_waarden[pos] is not None:
+                postcode = postcode_waarden[pos]
+            if plaats_waarden[pos] is not None:
+                plaats = plaats_waarden[pos]
+            if bu_waarden[pos] is not None:
+                bu = bu_waarden[pos]
+            
+            # Zoek OE naam via fuzzy matching met AFAS export
+            # Gebruik alleen geformatteerde naam voor matching
+            if self.oe_mapping and naam:
+                geformatteerde_naam = str(naam).strip()
+                
+                if geformatteerde_naam:
+                    if geformatteerde_naam not in self.oe_matches:
+                        start = time.perf_counter()
+                        if geformatteerde_naam in voorbereide_matches:
+                            gevonden, score = voorbereide_matches[geformatteerde_naam]
+                        else:
+                            gevonden, score = self.oe_matcher.match(geformatteerde_naam, min_similarity=0.5)
+                        self.oe_matches[geformatteerde_naam] = gevonden, score
+                        soort = "exact" if score == 1.0 else ("fuzzy" if gevonden else "geen_match")
+                        self.report.add("oe_matching", time.perf_counter() - start, **{soort: 1})
+                    oe_naam, match_score = self.oe_matches[geformatteerde_naam]
+                    
+                    if oe_naam:
+                        # Overschrijf BU alleen als deze leeg is of als de match zeer goed is
+                        if not bu or pd.isna(bu) or str(bu).strip() == "":
+                            bu = oe_naam
+                            if match_score < 0.9:
+                                self.report.log("debug", f"   [INFO] OE naam gekoppeld voor '{geformatteerde_naam[:50]}...' -> '{oe_naam}' (match score: {match_score:.2f})")
+                        elif match_score >= 0.95:
+                            # Zeer goede match, overschrijf bestaande BU
+                            bu = oe_naam
+            
+            latitude = lat_waarden[pos]
+            longitude = lng_waarden[pos]
+            
+            # Als naam niet gevonden, gebruik een andere gevulde kolom (zie prepare_rows)
+            if not naam:
+                naam = fallback_namen[pos]
+            
+            plaats = plaats or ""
+            
+            # Coördinaten uit de Excel zelf
+            coordinaten_bron = "excel" if latitude is not None and longitude is not None else None
+            
+            # Neem coördinaten over uit de vorige output als precies dit adres daar al in stond
+            if self.vorige_coordinaten and (latitude is None or longitude is None):
+                vorige_coord = self.vorige_coordinaten.get(adres_sleutel(straat, huisnummer, postcode, plaats))
+                if vorige_coord:
+                    latitude, longitude, coordinaten_bron = vorige_coord
+                    self.coordinaten_hergebruikt += 1
+            
+            # Maak adres object (BU, latitude/longitude en coordinatenBron alleen als ze bekend zijn)
+            adres = AdresRecord(
+                id=adres_id,
+                naam=naam or f"Adres {idx + 1}",
+                straat=straat or "",
+                huisnummer=str(huisnummer) if huisnummer else "",
+                postcode=str(postcode) if postcode else "",
+                plaats=plaats,
+                toegevoegdOp=vorig.get("toegevoegdOp") if vorig and vorig.get("toegevoegdOp") else self.toegevoegd_op,
+                bu=bu or None,
+                latitude=latitude,
+                longitude=longitude,
+                coordinatenBron=coordinaten_bron if latitude is not None and longitude is not None else None,
+            )
+            
+            if self.ontdubbelen and self._al_toegevoegd(adres_id, adres):
+                continue
+            self.adressen.append(adres)
+
+def normalize_postcode(postcode):
+    """Normaliseer een postcode naar "1234AB" (PC6) of "1234" (PC4), of None als ongeldig"""
+    if postcode is None or pd.isna(postcode):
+        return None
+    postcode = re.sub(r'\s+', '', str(postcode)).upper()
+    if re.fullmatch(r'\d{4}(?:[A-Z]{2})?', postcode):
+        return postcode
+    return None
+
+def load_postcode_table(path):
+    """Lees een postcode -> (lat, lon) tabel (CSV of Parquet) in een dict
+    Ondersteunt PC6 ("1234AB") en PC4 ("1234") postcodes.
+    """
+    print(f"\n[INFO] Lezen van postcode tabel: {path}")
     try:
-        # Nominatim API endpoint
-        url = "https://nominatim.openstreetmap.org/search"
+        if os.path.splitext(path)[1].lower() in ('.parquet', '.pq'):
+            df_pc = pd.read_parquet(path)
+        else:
+            # Detecteer scheidingsteken (Nederlandse CSV exports gebruiken vaak ';')
+            with open(path, 'r', encoding='utf-8-sig') as f:
+                header = f.readline()
+            sep = ';' if header.count(';') > header.count(',') else ','
+            df_pc = pd.read_csv(path, sep=sep, dtype=str, encoding='utf-8-sig')
+    except Exception as e:
+        print(f"[WAARSCHUWING] Kon postcode tabel niet lezen: {e}")
+        return {}
+    
+    pc_col = find_column(df_pc, ['postcode', 'pc6', 'pc4', 'zip', 'pc'])
+    lat_col = find_column(df_pc, ['latitude', 'lat'])
+    lon_col = find_column(df_pc, ['longitude', 'lng', 'lon'])
+    if not pc_col or not lat_col or not lon_col:
+        print(f"[WAARSCHUWING] Postcode tabel mist kolommen (postcode: {pc_col}, lat: {lat_col}, lon: {lon_col})")
+        return {}
+    
+    # Kolomsgewijs normaliseren; decimale komma's worden ook geaccepteerd
+    postcodes = df_pc[pc_col].astype(str).str.replace(r'\s+', '', regex=True).str.upper()
+    lats = pd.to_numeric(df_pc[lat_col].astype(str).str.replace(',', '.', regex=False), errors='coerce')
+    lons = pd.to_numeric(df_pc[lon_col].astype(str).str.replace(',', '.', regex=False), errors='coerce')
+    geldig = postcodes.str.fullmatch(r'\d{4}(?:[A-Z]{2})?') & lats.notna() & lons.notna()
+    
+    index = dict(zip(postcodes[geldig], zip(lats[geldig].tolist(), lons[geldig].tolist())))
+    print(f"[INFO] {len(index)} postcodes geladen ({len(df_pc) - int(geldig.sum())} ongeldige rijen overgeslagen)")
+    return index
+
+def lookup_postcode(postcode_index, postcode):
+    """Zoek de centroid van een postcode op; eerst PC6, dan PC4
+    Returns: (latitude, longitude, bron) of (None, None, None)
+    """
+    postcode = normalize_postcode(postcode)
+    if not postcode:
+        return None, None, None
+    if postcode in postcode_index:
+        lat, lon = postcode_index[postcode]
+        return lat, lon, "postcode6" if len(postcode) == 6 else "postcode4"
+    if postcode[:4] in postcode_index:
+        lat, lon = postcode_index[postcode[:4]]
+        return lat, lon, "postcode4"
+    return None, None, None
+
+class TokenBucket:
+    """Thread-safe token bucket rate limiter (rate = tokens per seconde)"""
+
+    def __init__(self, rate, capacity=1):
+        self.rate = float(rate)
+        self.capacity = max(1.0, float(capacity))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+        self.wachttijd = 0.0  # Kloktijd waarin minstens één thread op een token wachtte
+        self.wachtend = 0  # Aantal threads dat nu op een token wacht
+        self.wacht_start = 0.0
+
+    def acquire(self):
+        """Wacht tot er een token beschikbaar is en neem die"""
+        gewacht = False
+        try:
+            while True:
+                with self.lock:
+                    nu = time.monotonic()
+                    self.tokens = min(self.capacity, self.tokens + (nu - self.updated) * self.rate)
+                    self.updated = nu
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return
+                    wacht = (1 - self.tokens) / self.rate
+                    if not gewacht:
+                        # Wachttijd niet per thread optellen: telt vanaf de eerste tot de laatste wachtende thread
+                        gewacht = True
+                        if self.wachtend == 0:
+                            self.wacht_start = nu
+                        self.wachtend += 1
+                time.sleep(wacht)
+        finally:
+            if gewacht:
+                with self.lock:
+                    self.wachtend -= 1
+                    if self.wachtend == 0:
+                        self.wachttijd += time.monotonic() - self.wacht_start
+
+# HTTP statussen waarbij een geocode request later opnieuw geprobeerd wordt (te veel requests, server tijdelijk weg)
+HERHAAL_STATUS = frozenset([429, 500, 502, 503, 504])
+
+def retry_after(response, standaard):
+    """Wachttijd in seconden uit de Retry-After header (alleen de vorm in seconden), anders standaard"""
+    waarde = response.headers.get("Retry-After", "").strip()
+    if waarde.isdigit():
+        return min(float(waarde), GEOCODE_BACKOFF_MAX)
+    return standaard
+
+def is_public_nominatim(url):
+    """Controleer of een URL naar de publieke Nominatim server wijst"""
+    return "nominatim.openstreetmap.org" in str(url).lower()
+
+class GeocodeEngine:
+    """Geocoding via een Nominatim-compatibel /search endpoint
+    Hergebruikt verbindingen via een requests.Session, beperkt het aantal requests
+    per seconde met een token bucket en gebruikt optioneel een GeocodeCache.
+    Tijdelijke fouten (HERHAAL_STATUS, geen verbinding, timeout) worden tot retries keer
+    opnieuw geprobeerd, na backoff, 2x, 4x ... seconden of de Retry-After van de server.
+    """
+
+    def __init__(self, url=NOMINATIM_PUBLIC_URL, rate=1.0, burst=1, workers=1, cache=None,
+                 timeout=10, user_agent="AdresAfstandTool/1.0", structured=True,
+                 retries=GEOCODE_RETRIES, backoff=GEOCODE_BACKOFF):
+        if is_public_nominatim(url) and (not rate or rate > 1.0 or burst > 1):
+            print("[WAARSCHUWING] Publieke Nominatim server: rate limit begrensd op 1 request/seconde")
+            rate = 1.0
+            burst = 1
+        self.url = url
+        self.workers = max(1, int(workers))
+        self.structured = structured  # Ondersteunt het endpoint street/postalcode/city parameters?
+        self.cache = cache
+        self.timeout = timeout
+        self.retries = max(0, int(retries))
+        self.backoff = backoff
+        self.limiter = TokenBucket(rate, burst) if rate else None
+        self.requests = 0  # Aantal daadwerkelijke netwerk requests (inclusief herhalingen)
+        self.herhaald = 0  # Requests die na een tijdelijke fout opnieuw verstuurd zijn
+        self.fouten = 0
+        self.samengevoegd = 0  # Aanroepen die het resultaat van een eerdere gelijke query kregen
+        self.resultaten = {}  # Genormaliseerde query -> Future met (lat, lon), voor deze run
+        self.lock = threading.Lock()
+        
+        import requests  # Pas hier nodig, zodat een run zonder geocoding requests niet importeert
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=self.workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers["User-Agent"] = user_agent  # Vereist door Nominatim
+        self.verbindingsfouten = (requests.ConnectionError, requests.Timeout)
+
+    def search(self, address_query):
+        """Zoek coördinaten voor een vrije-tekst query, of een dict met gestructureerde velden
+        (street/postalcode/city, zie plan_geocode_queries). Zonder structured wordt een dict als
+        vrije tekst verstuurd. Dezelfde (genormaliseerde) query wordt binnen een run maar één keer
+        opgezocht: gelijktijdige aanroepen wachten op de eerste, latere krijgen het resultaat direct.
+        Returns: (latitude, longitude) of (None, None) als niets gevonden of bij fout
+        """
+        if isinstance(address_query, dict) and not self.structured:
+            address_query = ", ".join(list(address_query.values()) + ["Nederland"])
+        sleutel = normalize_geocode_query(geocode_query_tekst(address_query))
+        with self.lock:
+            resultaat = self.resultaten.get(sleutel)
+            eigenaar = resultaat is None
+            if eigenaar:
+                resultaat = self.resultaten[sleutel] = Future()
+            else:
+                self.samengevoegd += 1
+        if not eigenaar:
+            return resultaat.result()
+        
+        lat, lon = None, None
+        try:
+            lat, lon = self._search(address_query)
+        except Exception as e:
+            with self.lock:
+                self.fouten += 1
+                # Een mislukt request wordt niet onthouden, zodat een latere rij het opnieuw probeert
+                del self.resultaten[sleutel]
+            log("warning", f"   [WAARSCHUWING] Geocoding mislukt voor '{geocode_query_tekst(address_query)}': {e}")
+        finally:
+            resultaat.set_result((lat, lon))
+        return lat, lon
+
+    def _search(self, address_query):
+        """Zoek een query op in de cache of via één request (fouten worden doorgegeven)"""
+        cache_sleutel = geocode_query_tekst(address_query)
+        if self.cache is not None:
+            gevonden, lat, lon = self.cache.get(cache_sleutel)
+            if gevonden:
+                return lat, lon
+        
         params = {
-            "q": address_query,
             "format": "json",
             "limit": 1,
             "countrycodes": "nl"  # Beperk tot Nederland
         }
+        if isinstance(address_query, dict):
+            params.update(address_query)
+        else:
+            params["q"] = address_query
         
-        headers = {
-            "User-Agent": "AdresAfstandTool/1.0"  # Vereist door Nominatim
-        }
-        
-        response = requests.get(url, params=params, headers=headers, timeout=10)
+        for poging in range(self.retries + 1):
+            # Ook een herhaling wacht op een token, zodat de rate limit over alle requests geldt
+            if self.limiter is not None:
+                self.limiter.acquire()
+            with self.lock:
+                self.requests += 1
+            wacht = self.backoff * 2 ** poging
+            try:
+                response = self.session.get(self.url, params=params, timeout=self.timeout)
+            except self.verbindingsfouten:
+                if poging == self.retries:
+                    raise
+            else:
+                if response.status_code not in HERHAAL_STATUS or poging == self.retries:
+                    break
+                wacht = retry_after(response, wacht)
+            with self.lock:
+                self.herhaald += 1
+            time.sleep(wacht)
         response.raise_for_status()
         
         data = response.json()
@@ -325,317 +1881,1088 @@ def geocode_address(straat, huisnummer, postcode, plaats):
             result = data[0]
             lat = float(result.get("lat", 0))
             lon = float(result.get("lon", 0))
+            if self.cache is not None:
+                self.cache.put(cache_sleutel, lat, lon)
             return lat, lon
         
+        # Geen resultaat: sla ook de miss op zodat we dit adres niet steeds opnieuw proberen
+        if self.cache is not None:
+            self.cache.put(cache_sleutel, None, None)
         return None, None
-        
-    except Exception as e:
-        print(f"   [WAARSCHUWING] Geocoding mislukt voor '{address_query}': {e}")
+
+    def close(self):
+        self.session.close()
+        if self.cache is not None:
+            self.cache.close()
+
+    def print_stats(self):
+        if self.cache is not None:
+            self.cache.print_stats()
+        wachttijd = self.limiter.wachttijd if self.limiter is not None else 0.0
+        print(f"[INFO] Netwerk requests naar {self.url}: {self.requests} "
+              f"({self.herhaald} herhaald na een tijdelijke fout, {self.fouten} mislukt, "
+              f"{wachttijd:.1f}s gewacht door rate limiting, "
+              f"{self.samengevoegd} dubbele queries samengevoegd)")
+
+# Wordt in het hoofdscript ingesteld; anders wordt de publieke Nominatim server gebruikt
+geocoder = None
+
+def get_geocoder():
+    """Geef de actieve GeocodeEngine (maak een standaard engine als er nog geen is)"""
+    global geocoder
+    if geocoder is None:
+        geocoder = GeocodeEngine()
+    return geocoder
+
+def open_geocoder(provider_naam='nominatim', url=None, rate=None, workers=None):
+    """Maak een GeocodeEngine voor een provider (met persistente cache); url/rate/workers overschrijven de provider"""
+    try:
+        geocode_cache = GeocodeCache(geocode_cache_path)
+        print(f"[INFO] Geocode cache geopend: {geocode_cache_path}")
+    except sqlite3.Error as e:
+        print(f"[WAARSCHUWING] Kon geocode cache niet openen, geocoding zonder cache: {e}")
+        geocode_cache = None
+    
+    provider = GEOCODE_PROVIDERS[provider_naam]
+    engine = GeocodeEngine(
+        url=url or provider["url"],
+        rate=rate if rate is not None else provider["rate"],
+        burst=provider["burst"],
+        workers=workers or provider["workers"],
+        cache=geocode_cache,
+        structured=provider["structured"]
+    )
+    print(f"[INFO] Geocoding via {engine.url} met {engine.workers} worker(s)")
+    return engine
+
+def geocode_address(straat, huisnummer, postcode, plaats):
+    """Geocode een adres naar latitude/longitude met Nominatim (OpenStreetMap)
+    Werkt met volledig adres, of alleen postcode + plaatsnaam, of alleen plaatsnaam.
+    Returns: (latitude, longitude) of (None, None) bij fout
+    """
+    if not straat and not postcode and not plaats:
         return None, None
+    
+    # Bouw adres string voor geocoding
+    address_parts = []
+    if straat:
+        if huisnummer:
+            address_parts.append(f"{straat} {huisnummer}")
+        else:
+            address_parts.append(straat)
+    if postcode:
+        address_parts.append(postcode)
+    if plaats:
+        address_parts.append(plaats)
+    
+    # Voeg "Nederland" toe voor betere resultaten
+    address_parts.append("Nederland")
+    
+    address_query = ", ".join(address_parts)
+    
+    return get_geocoder().search(address_query)
 
-print("=" * 60)
-print("Excel naar JSON Converter")
-print("=" * 60)
+def clean_plaats(plaats):
+    """Maak een plaatsnaam klaar voor geocoding, zonder request: provincie-afkortingen achteraan
+    eraf ("AFFERDEN GLD" -> "Afferden") en namen in hoofdletters netjes ("DREUMEL" -> "Dreumel")
+    """
+    if not plaats:
+        return ""
+    woorden = SPATIES_RE.sub(" ", str(plaats)).strip().split(" ")
+    while len(woorden) > 1 and woorden[-1].strip("().,").upper() in PROVINCIE_AFKORTINGEN:
+        woorden.pop()
+    plaats = " ".join(woorden).strip(" ,")
+    if plaats.isupper():
+        plaats = plaats.title().replace("'S-", "'s-")
+    return plaats
 
-# Lees AFAS export voor OE namen mapping
-oe_mapping = load_afas_oe_mapping()
+def plan_geocode_queries(straat, huisnummer, postcode, plaats):
+    """Zoekopdrachten voor een adres, de meest precieze en meest kansrijke eerst
+    Gebruikt de gestructureerde Nominatim velden (street/postalcode/city) met een lokaal opgeschoonde
+    plaatsnaam en postcode, zodat de meeste adressen met de eerste zoekopdracht gevonden worden.
+    Returns: lijst van (soort, query dict); soort wordt gebruikt voor de tellers in het run rapport.
+    """
+    plaats = clean_plaats(plaats)
+    postcode_schoon = normalize_postcode(postcode) if postcode else None
+    if postcode_schoon and len(postcode_schoon) == 6:
+        postcode = f"{postcode_schoon[:4]} {postcode_schoon[4:]}"
+    elif postcode:
+        postcode = postcode_schoon or SPATIES_RE.sub(" ", str(postcode)).strip()
+    straat = " ".join(str(deel).strip() for deel in (straat, huisnummer) if deel) if straat else ""
+    
+    plan = []
+    def voeg_toe(soort, **velden):
+        query = {veld: waarde for veld, waarde in velden.items() if waarde}
+        if query and query not in [q for _, q in plan]:
+            plan.append((soort, query))
+    
+    if straat:
+        voeg_toe("volledig", street=straat, postalcode=postcode, city=plaats)
+        # Postcodes ontbreken of kloppen niet altijd in OpenStreetMap: daarna straat + plaats
+        if postcode and plaats:
+            voeg_toe("zonder_postcode", street=straat, city=plaats)
+        # Als laatste de postcode (+ plaats): minder precies, maar beter dan geen coördinaten
+        if postcode:
+            voeg_toe("postcode_plaats", postalcode=postcode, city=plaats)
+    else:
+        voeg_toe("postcode_plaats", postalcode=postcode, city=plaats)
+    return plan
+
+def geocode_with_fallback(straat, huisnummer, postcode, plaats, engine=None, report=None):
+    """Geocode een adres met de zoekopdrachten uit plan_geocode_queries(); de eerste die iets vindt wint
+    engine/report: standaard get_geocoder() en het module rapport run_report.
+    Returns: (latitude, longitude) of (None, None)
+    """
+    engine = engine if engine is not None else get_geocoder()
+    report = report if report is not None else run_report
+    for soort, query in plan_geocode_queries(straat, huisnummer, postcode, plaats):
+        report.tel("geocoding_zoekopdrachten")
+        report.tel(f"geocoding_poging_{soort}")
+        lat, lon = engine.search(query)
+        if lat and lon:
+            report.tel(f"geocoding_gevonden_{soort}")
+            return lat, lon
+        report.log("debug", f"      [INFO] Niet gevonden met {geocode_query_tekst(query)}")
+    return None, None
 
-# Lees het Excel bestand
-try:
-    print(f"\n[INFO] Lezen van: {excel_path}")
+def write_spatial_index(adressen, manifest_path, cel_grootte=SPATIAL_INDEX_CEL_GROOTTE, output=output_path):
+    """Schrijf een compacte, ruimtelijk gesorteerde index naast adressen.json
+    Bestanden (basisnaam van manifest_path):
+      .json          manifest met grid parameters en de positie van elke array in het binaire bestand
+      .bin           little-endian arrays: lat/lon (float32, per record), celId en celStart (uint32)
+      .records.json  de adressen met coördinaten, geminificeerd, in dezelfde (gesorteerde) volgorde
+    Records zijn gesorteerd op grid cel (rij * kolommen + kolom); celStart[i]..celStart[i+1] zijn de
+    record offsets van cel celId[i]. Zo hoeft een zoekopdracht alleen de cellen rond het zoekpunt te scannen.
+    """
+    basis = os.path.splitext(manifest_path)[0]
+    bin_path = basis + '.bin'
+    records_path = basis + '.records.json'
     
-    # Probeer verschillende engines
-    df = None
-    try:
-        df = pd.read_excel(excel_path, engine='openpyxl')
-        print("[OK] Bestand gelezen met openpyxl engine")
-    except Exception as e1:
-        try:
-            df = pd.read_excel(excel_path)
-            print("[OK] Bestand gelezen met standaard engine")
-        except Exception as e2:
-            print(f"[FOUT] Fout bij lezen: {e2}")
-            print("\n[WAARSCHUWING] Let op: Sluit het Excel bestand in Excel voordat je dit script opnieuw uitvoert!")
-            raise
-    
-    print(f"\n[INFO] Gevonden kolommen: {df.columns.tolist()}")
-    print(f"[INFO] Aantal rijen: {len(df)}")
-    print("\n[INFO] Eerste paar rijen:")
-    print(df.head().to_string())
-    
-    # Zoek relevante kolommen
-    naam_col = find_column(df, ['naam', 'name', 'label', 'medewerker', 'persoon'])
-    straat_col = find_column(df, ['straat', 'street', 'adres', 'address'])
-    huisnummer_col = find_column(df, ['huisnummer', 'huis', 'nummer', 'number', 'nr'])
-    postcode_col = find_column(df, ['postcode', 'post', 'zip', 'pc'])
-    plaats_col = find_column(df, ['plaats', 'stad', 'city', 'gemeente'])
-    volledig_adres_col = find_column(df, ['volledig', 'adres', 'address', 'volledige'])
-    bu_col = find_column(df, ['bu', 'business unit', 'businessunit'])
-    lat_col = find_column(df, ['latitude', 'lat'])
-    lng_col = find_column(df, ['longitude', 'lng', 'lon'])
-    
-    print(f"\n[INFO] Gevonden kolommen mapping:")
-    print(f"   Naam: {naam_col}")
-    print(f"   Straat: {straat_col}")
-    print(f"   Huisnummer: {huisnummer_col}")
-    print(f"   Postcode: {postcode_col}")
-    print(f"   Plaats: {plaats_col}")
-    print(f"   Volledig adres: {volledig_adres_col}")
-    print(f"   BU: {bu_col}")
-    print(f"   Latitude: {lat_col}")
-    print(f"   Longitude: {lng_col}")
-    
-    # Voeg een kolom toe met geformatteerde namen
-    if naam_col:
-        print(f"\n[INFO] Formatteren van namen en toevoegen aan nieuwe kolom 'Naam Geformatteerd'...")
-        df['Naam Geformatteerd'] = df[naam_col].apply(lambda x: format_naam(x) if pd.notna(x) else None)
-        print(f"[OK] Geformatteerde namen toegevoegd")
-        
-        # Sla het Excel bestand op met de nieuwe kolom
-        try:
-            print(f"[INFO] Opslaan van Excel bestand met geformatteerde namen...")
-            df.to_excel(excel_path, index=False, engine='openpyxl')
-            print(f"[OK] Excel bestand opgeslagen met nieuwe kolom 'Naam Geformatteerd'")
-        except Exception as e:
-            print(f"[WAARSCHUWING] Kon Excel bestand niet opslaan: {e}")
-            print(f"   De geformatteerde namen worden wel gebruikt voor de JSON output")
+    met_coordinaten = [a for a in adressen if a.heeft_coordinaten()]
+    lat = np.array([a.latitude for a in met_coordinaten], dtype=np.float64)
+    lon = np.array([a.longitude for a in met_coordinaten], dtype=np.float64)
+    
+    if len(met_coordinaten):
+        lat0 = float(np.floor(lat.min() / cel_grootte) * cel_grootte)
+        lon0 = float(np.floor(lon.min() / cel_grootte) * cel_grootte)
+        # Een punt op de oorsprong kan door afronding net in rij/kolom -1 vallen (bijv. 3.3 / 0.02 * 0.02 > 3.3)
+        rij = np.maximum(np.floor((lat - lat0) / cel_grootte).astype(np.int64), 0)
+        kolom = np.maximum(np.floor((lon - lon0) / cel_grootte).astype(np.int64), 0)
+        rijen = int(rij.max()) + 1
+        kolommen = int(kolom.max()) + 1
     else:
-        print(f"\n[WAARSCHUWING] Geen naam kolom gevonden, kan geen geformatteerde namen toevoegen")
+        lat0 = lon0 = 0.0
+        rij = kolom = np.zeros(0, dtype=np.int64)
+        rijen = kolommen = 0
     
-    # Converteer naar JSON formaat volgens GEDEELDE_ADRESSEN.md
-    adressen = []
+    # Stabiele sortering op cel: binnen een cel blijft de volgorde van adressen.json behouden
+    cel = rij * kolommen + kolom
+    volgorde = np.argsort(cel, kind='stable')
+    cel = cel[volgorde]
+    cel_ids, cel_start = np.unique(cel, return_index=True)
+    cel_start = np.append(cel_start, len(cel))
+    
+    arrays = [
+        ('lat', lat[volgorde].astype('<f4')),
+        ('lon', lon[volgorde].astype('<f4')),
+        ('celId', cel_ids.astype('<u4')),
+        ('celStart', cel_start.astype('<u4')),
+    ]
+    secties = {}
+    offset = 0
+    # De manifest als laatste: die verwijst naar de binaire arrays en records
+    with atomic_open(bin_path, 'wb') as f:
+        for naam, array in arrays:
+            data = array.tobytes()
+            f.write(data)
+            secties[naam] = {"offset": offset, "lengte": len(array), "type": str(array.dtype.name)}
+            offset += len(data)
     
-    for idx, row in df.iterrows():
-        # Skip lege rijen
-        if row.isna().all():
+    with atomic_open(records_path) as f:
+        write_json_array(f, (met_coordinaten[i].to_dict() for i in volgorde), compact=True)
+    
+    manifest = {
+        "versie": SPATIAL_INDEX_VERSIE,
+        "bron": os.path.basename(output),
+        "aantal": len(met_coordinaten),
+        "zonderCoordinaten": len(adressen) - len(met_coordinaten),
+        "grid": {
+            "celGrootte": cel_grootte,
+            "oorsprong": {"lat": lat0, "lon": lon0},
+            "rijen": rijen,
+            "kolommen": kolommen,
+            "cellen": len(cel_ids),
+        },
+        "binair": os.path.basename(bin_path),
+        "records": os.path.basename(records_path),
+        "secties": secties,
+    }
+    with atomic_open(manifest_path) as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    return manifest
+
+def mercator_cellen(lat, lon, zoom, cel_pixels=CLUSTER_CEL_PIXELS):
+    """Kolom en rij (int64 arrays) van de Web Mercator grid cel van elk punt op een Leaflet zoomniveau
+    Op zoomniveau z is de wereld 256 * 2^z pixels breed; een cel is cel_pixels x cel_pixels pixels.
+    """
+    schaal = 256 * 2 ** zoom / cel_pixels
+    # Web Mercator loopt tot ~85.05 graden; daarbuiten (of op de rand) klemmen op de buitenste cel
+    lat = np.radians(np.clip(lat, -85.05112878, 85.05112878))
+    x = (np.asarray(lon, dtype=np.float64) + 180.0) / 360.0
+    y = (1.0 - np.arcsinh(np.tan(lat)) / np.pi) / 2.0
+    laatste = int(np.ceil(schaal)) - 1
+    kolom = np.clip(np.floor(x * schaal), 0, laatste).astype(np.int64)
+    rij = np.clip(np.floor(y * schaal), 0, laatste).astype(np.int64)
+    return kolom, rij
+
+def marker_clusters(lat, lon, groep, zoom_min=CLUSTER_ZOOM_MIN, zoom_max=CLUSTER_ZOOM_MAX,
+                    cel_pixels=CLUSTER_CEL_PIXELS):
+    """Grid clusters per zoomniveau, per groep (bijv. BU index), in één gevectoriseerde pass
+    De cellen van een lager zoomniveau zijn die van zoom_max met een bit shift, dus elke cel valt precies
+    in één cel van het niveau erboven. De punten worden gesorteerd op groep en daarna op cel van grof naar
+    fijn; zo zijn de leden van een cluster op elk zoomniveau een aaneengesloten stuk van `volgorde`.
+    Geeft (volgorde, {zoom: (start, aantal, lat, lon, groep)}) met start als positie in `volgorde`.
+    """
+    n = len(lat)
+    kolom, rij = mercator_cellen(lat, lon, zoom_max, cel_pixels)
+    cellen = {z: (kolom >> (zoom_max - z), rij >> (zoom_max - z)) for z in range(zoom_min, zoom_max + 1)}
+    # np.lexsort sorteert op de laatste sleutel eerst: groep, dan de grofste cel, ..., dan de fijnste cel
+    sleutels = []
+    for z in range(zoom_max, zoom_min - 1, -1):
+        sleutels.extend(cellen[z])
+    sleutels.append(groep)
+    volgorde = np.lexsort(sleutels)
+
+    lat_gesorteerd = np.asarray(lat, dtype=np.float64)[volgorde]
+    lon_gesorteerd = np.asarray(lon, dtype=np.float64)[volgorde]
+    groep_gesorteerd = np.asarray(groep)[volgorde]
+    nieuwe_groep = groep_gesorteerd[1:] != groep_gesorteerd[:-1]
+    per_zoom = {}
+    for z, (kolom_z, rij_z) in cellen.items():
+        kolom_z, rij_z = kolom_z[volgorde], rij_z[volgorde]
+        nieuw = np.ones(n, dtype=bool)
+        nieuw[1:] = nieuwe_groep | (kolom_z[1:] != kolom_z[:-1]) | (rij_z[1:] != rij_z[:-1])
+        start = np.flatnonzero(nieuw)
+        aantal = np.diff(np.append(start, n))
+        if n:
+            centroid_lat = np.add.reduceat(lat_gesorteerd, start) / aantal
+            centroid_lon = np.add.reduceat(lon_gesorteerd, start) / aantal
+        else:
+            centroid_lat = centroid_lon = np.zeros(0)
+        per_zoom[z] = (start, aantal, centroid_lat, centroid_lon, groep_gesorteerd[start])
+    return volgorde, per_zoom
+
+def write_marker_clusters(adressen, manifest_path, zoom_min=CLUSTER_ZOOM_MIN, zoom_max=CLUSTER_ZOOM_MAX,
+                          cel_pixels=CLUSTER_CEL_PIXELS, output=output_path):
+    """Schrijf voorberekende marker clusters per zoomniveau, voor alle adressen en per BU
+    Bestanden (basisnaam van manifest_path):
+      .json  manifest (zonder opmaak) met de adres IDs en per laag en zoomniveau de positie van de arrays
+      .bin   little-endian arrays per laag: leden (uint32, index in de IDs) en per zoomniveau lat/lon
+             (float32, centroid), aantal en start (uint32; de leden van een cluster zijn leden[start:start+aantal])
+    Laag "bu": null bevat alle adressen, daarna één laag per BU. Clusters zijn gesorteerd op grid cel,
+    dus de kaart kan per zoomniveau alleen de clusters binnen de zichtbare kaart tekenen.
+    """
+    basis = os.path.splitext(manifest_path)[0]
+    bin_path = basis + '.bin'
+
+    met_coordinaten = [a for a in adressen if a.heeft_coordinaten()]
+    lat = np.array([a.latitude for a in met_coordinaten], dtype=np.float64)
+    lon = np.array([a.longitude for a in met_coordinaten], dtype=np.float64)
+    bu_namen = sorted({a.bu or '' for a in met_coordinaten})
+    bu_index = {bu: i for i, bu in enumerate(bu_namen)}
+    bu_groep = np.array([bu_index[a.bu or ''] for a in met_coordinaten], dtype=np.int64)
+
+    offset = 0
+
+    def schrijf(f, array):
+        nonlocal offset
+        data = array.tobytes()
+        f.write(data)
+        sectie = {"offset": offset, "lengte": len(array), "type": str(array.dtype.name)}
+        offset += len(data)
+        return sectie
+
+    def schrijf_laag(f, bu, volgorde, per_zoom, groep, begin, eind):
+        zooms = {}
+        for z, (start, aantal, centroid_lat, centroid_lon, cluster_groep) in per_zoom.items():
+            # Clusters van deze groep: aaneengesloten, want er is eerst op groep gesorteerd
+            links, rechts = np.searchsorted(cluster_groep, [groep, groep + 1])
+            zooms[str(z)] = {
+                "clusters": int(rechts - links),
+                "lat": schrijf(f, centroid_lat[links:rechts].astype('<f4')),
+                "lon": schrijf(f, centroid_lon[links:rechts].astype('<f4')),
+                "aantal": schrijf(f, aantal[links:rechts].astype('<u4')),
+                "start": schrijf(f, (start[links:rechts] - begin).astype('<u4')),
+            }
+        return {"bu": bu, "aantal": int(eind - begin), "leden": schrijf(f, volgorde[begin:eind].astype('<u4')),
+                "zooms": zooms}
+
+    lagen = []
+    with atomic_open(bin_path, 'wb') as f:
+        volgorde, per_zoom = marker_clusters(lat, lon, np.zeros(len(lat), dtype=np.int64), zoom_min, zoom_max,
+                                             cel_pixels)
+        lagen.append(schrijf_laag(f, None, volgorde, per_zoom, 0, 0, len(lat)))
+        volgorde, per_zoom = marker_clusters(lat, lon, bu_groep, zoom_min, zoom_max, cel_pixels)
+        grenzen = np.searchsorted(bu_groep[volgorde], np.arange(len(bu_namen) + 1))
+        for i, bu in enumerate(bu_namen):
+            lagen.append(schrijf_laag(f, bu, volgorde, per_zoom, i, grenzen[i], grenzen[i + 1]))
+
+    manifest = {
+        "versie": CLUSTER_VERSIE,
+        "bron": os.path.basename(output),
+        "aantal": len(met_coordinaten),
+        "zonderCoordinaten": len(adressen) - len(met_coordinaten),
+        "celPixels": cel_pixels,
+        "zooms": {"min": zoom_min, "max": zoom_max},
+        "binair": os.path.basename(bin_path),
+        "ids": [a.id for a in met_coordinaten],
+        "lagen": lagen,
+    }
+    with atomic_open(manifest_path) as f:
+        json.dump(manifest, f, ensure_ascii=False, separators=(',', ':'))
+    return manifest
+
+def lees_manifest(directory, naam, sleutel):
+    """Lees het manifest naam uit directory, of anders het oude manifest.json als dat sleutel bevat
+    Returns: (manifest of None, pad van het oude manifest als dat gelezen is, anders None).
+    """
+    for bestand in (naam, OUD_MANIFEST):
+        pad = os.path.join(directory, bestand)
+        try:
+            with open(pad, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
             continue
-        
-        # Maak een unieke ID
-        adres_id = f"shared-{idx + 1}"
-        
-        # Haal de data uit de rij
-        naam = None
-        straat = None
-        huisnummer = None
-        postcode = None
-        plaats = None
-        bu = None
-        latitude = None
-        longitude = None
-        
-        # Als er een volledig adres kolom is, parse die eerst
-        # Maar alleen als er geen aparte kolommen zijn voor straat/huisnummer/postcode/plaats
-        has_separate_columns = (straat_col and straat_col != volledig_adres_col) or huisnummer_col or postcode_col or plaats_col
-        
-        if volledig_adres_col and pd.notna(row[volledig_adres_col]) and not has_separate_columns:
-            parsed_straat, parsed_huisnummer, parsed_postcode, parsed_plaats = parse_address_string(row[volledig_adres_col])
-            if parsed_straat:
-                straat = parsed_straat
-            if parsed_huisnummer:
-                huisnummer = parsed_huisnummer
-            if parsed_postcode:
-                postcode = parsed_postcode
-            if parsed_plaats:
-                plaats = parsed_plaats
-        
-        # Gebruik geformatteerde naam als beschikbaar, anders formatteer zelf
-        if 'Naam Geformatteerd' in df.columns and pd.notna(row['Naam Geformatteerd']):
-            naam = row['Naam Geformatteerd']
-        elif naam_col and pd.notna(row[naam_col]):
-            naam = format_naam(row[naam_col])
-        
-        # Gebruik alleen straat kolom als het niet hetzelfde is als volledig_adres_col
-        if straat_col and pd.notna(row[straat_col]) and straat_col != volledig_adres_col:
-            straat = str(row[straat_col]).strip()
-        elif volledig_adres_col and pd.notna(row[volledig_adres_col]) and not straat:
-            # Als er geen aparte straat kolom is, parse het volledige adres
-            parsed_straat, parsed_huisnummer, parsed_postcode, parsed_plaats = parse_address_string(row[volledig_adres_col])
-            if parsed_straat:
-                straat = parsed_straat
-            if parsed_huisnummer:
-                huisnummer = parsed_huisnummer
-            if parsed_postcode:
-                postcode = parsed_postcode
-            if parsed_plaats:
-                plaats = parsed_plaats
-        
-        if huisnummer_col and pd.notna(row[huisnummer_col]):
-            huisnummer = str(row[huisnummer_col]).strip()
-        if postcode_col and pd.notna(row[postcode_col]):
-            postcode = str(row[postcode_col]).strip()
-        if plaats_col and pd.notna(row[plaats_col]):
-            plaats = str(row[plaats_col]).strip()
-        if bu_col and pd.notna(row[bu_col]):
-            bu = str(row[bu_col]).strip()
-        
-        # Zoek OE naam via fuzzy matching met AFAS export
-        # Gebruik alleen geformatteerde naam voor matching
-        if oe_mapping and naam:
-            geformatteerde_naam = str(naam).strip()
-            
-            if geformatteerde_naam:
-                oe_naam, match_score = find_oe_naam(geformatteerde_naam, oe_mapping, min_similarity=0.5)
-                
-                if oe_naam:
-                    # Overschrijf BU alleen als deze leeg is of als de match zeer goed is
-                    if not bu or pd.isna(bu) or str(bu).strip() == "":
-                        bu = oe_naam
-                        if match_score < 0.9:
-                            print(f"   [INFO] OE naam gekoppeld voor '{geformatteerde_naam[:50]}...' -> '{oe_naam}' (match score: {match_score:.2f})")
-                    elif match_score >= 0.95:
-                        # Zeer goede match, overschrijf bestaande BU
-                        bu = oe_naam
-        
-        if lat_col and pd.notna(row[lat_col]):
+        if isinstance(manifest, dict) and sleutel in manifest:
+            return manifest, pad if bestand == OUD_MANIFEST else None
+    return None, None
+
+# Bestandsnamen van shards en deltas; bij het opruimen worden alleen deze namen verwijderd
+SHARD_BESTAND_RE = re.compile(r'^adressen\.[a-z0-9-]+\.[0-9a-f]{12}\.json(\.gz|\.br)?$')
+DELTA_BESTAND_RE = re.compile(r'^adressen\.delta\.\d+-\d+\.json$')
+
+def shard_slug(bu):
+    """Bestandsnaam-veilige naam voor een BU (lege BU wordt 'zonder-bu')"""
+    slug = re.sub(r'[^a-z0-9]+', '-', str(bu or '').lower()).strip('-')
+    return slug or 'zonder-bu'
+
+def write_sharded_output(adressen, directory, output=output_path):
+    """Schrijf adressen geminificeerd per BU, met gzip (en brotli als die module beschikbaar is) kopieën
+    Elke shard heet adressen.<bu>.<hash>.json, met de eerste 12 tekens van de SHA256 van de inhoud;
+    een gewijzigde shard krijgt zo een nieuwe naam en ongewijzigde shards kunnen onbeperkt gecached worden.
+    Het manifest (zonder hash in de naam) beschrijft per BU het bestand, aantal, hash en grootte.
+    Shards van vorige runs (SHARD_BESTAND_RE of in het vorige manifest) die niet meer in het manifest
+    staan worden verwijderd; andere bestanden in directory blijven staan.
+    """
+    try:
+        import brotli
+    except ImportError:
+        brotli = None
+    
+    per_bu = {}
+    for adres in adressen:
+        per_bu.setdefault(adres.bu or "", []).append(adres)
+    
+    os.makedirs(directory, exist_ok=True)
+    manifest_path = os.path.join(directory, SHARD_MANIFEST)
+    vorig_manifest, oud_pad = lees_manifest(directory, SHARD_MANIFEST, "shards")
+    vorige_bestanden = set()
+    for shard in vorig_manifest["shards"] if vorig_manifest else []:
+        if isinstance(shard, dict) and isinstance(shard.get("bestand"), str):
+            vorige_bestanden.update(shard["bestand"] + extensie for extensie in ("", ".gz", ".br"))
+    shards = []
+    bestanden = set()
+    for bu in sorted(per_bu):
+        tekst = io.StringIO()
+        write_json_array(tekst, (adres.to_dict() for adres in per_bu[bu]), compact=True)
+        data = tekst.getvalue().encode('utf-8')
+        sha256 = hashlib.sha256(data).hexdigest()
+        naam = f"adressen.{shard_slug(bu)}.{sha256[:12]}.json"
+        varianten = {"": data, ".gz": gzip.compress(data, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            varianten[".br"] = brotli.compress(data, quality=11)
+        for extensie, inhoud in varianten.items():
+            pad = os.path.join(directory, naam + extensie)
+            # Zelfde naam betekent zelfde inhoud: niet opnieuw schrijven (behoudt mtime voor caches/uploads)
+            if not os.path.exists(pad):
+                with atomic_open(pad, 'wb') as f:
+                    f.write(inhoud)
+            bestanden.add(naam + extensie)
+        shards.append({
+            "bu": bu,
+            "bestand": naam,
+            "aantal": len(per_bu[bu]),
+            "sha256": sha256,
+            "bytes": len(data),
+            "gecomprimeerd": {extensie.lstrip('.'): len(inhoud) for extensie, inhoud in varianten.items() if extensie},
+        })
+    
+    manifest = {
+        "versie": SHARD_VERSIE,
+        "bron": os.path.basename(output),
+        "totaal": len(adressen),
+        "shards": shards,
+    }
+    with atomic_open(manifest_path) as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    if oud_pad:
+        os.remove(oud_pad)
+    
+    for bestand in os.listdir(directory):
+        if bestand not in bestanden and (SHARD_BESTAND_RE.match(bestand) or bestand in vorige_bestanden):
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(os.path.join(directory, bestand))
+    return manifest
+
+def export_map_fout(shard_map, delta_map, output):
+    """Controleer de map van --shard-by-bu: niet de map van de output en niet de --delta map
+    Returns: de foutmelding, of None als de map bruikbaar is.
+    """
+    if not shard_map:
+        return None
+    shards = os.path.realpath(shard_map)
+    if shards == os.path.realpath(os.path.dirname(output) or '.'):
+        return f"--shard-by-bu map '{shard_map}' is de map van {output}; kies een eigen map voor de shards"
+    if delta_map and shards == os.path.realpath(delta_map):
+        return f"--shard-by-bu en --delta gebruiken dezelfde map '{shard_map}'; kies voor elk een eigen map"
+    return None
+
+def adressen_sha256(teksten):
+    """SHA256 van de adressen als JSON zonder opmaak (zoals --compact en JSON.stringify() in de browser)
+    teksten: per adres de JSON tekst zonder opmaak, in de volgorde van adressen.json.
+    """
+    sha256 = hashlib.sha256(b'[')
+    for i, tekst in enumerate(teksten):
+        if i:
+            sha256.update(b',')
+        sha256.update(tekst.encode('utf-8'))
+    sha256.update(b']')
+    return sha256.hexdigest()
+
+def maak_delta(vorige, nieuwe):
+    """Verschil tussen twee versies van adressen.json (lijsten met dicts), per ID
+    Geeft {"toegevoegd": [[positie, adres], ...], "verwijderd": [id, ...], "gewijzigd": [adres, ...]}, met de
+    positie in de nieuwe lijst. Staan de overgebleven adressen in een andere volgorde, dan komt ook
+    "volgorde" (alle IDs van de nieuwe lijst) in de delta. None als de IDs niet uniek zijn.
+    """
+    vorige_teksten = {a.get("id"): JSON_COMPACT.encode(a) for a in vorige}
+    nieuwe_ids = [a.get("id") for a in nieuwe]
+    if None in vorige_teksten or None in nieuwe_ids or len(vorige_teksten) < len(vorige) \
+            or len(set(nieuwe_ids)) < len(nieuwe_ids):
+        return None
+    nieuwe_set = set(nieuwe_ids)
+    delta = {
+        "toegevoegd": [[positie, a] for positie, a in enumerate(nieuwe) if a["id"] not in vorige_teksten],
+        "verwijderd": [a["id"] for a in vorige if a["id"] not in nieuwe_set],
+        "gewijzigd": [a for a in nieuwe if a["id"] in vorige_teksten and JSON_COMPACT.encode(a) != vorige_teksten[a["id"]]],
+    }
+    if [i for i in nieuwe_ids if i in vorige_teksten] != [a["id"] for a in vorige if a["id"] in nieuwe_set]:
+        delta["volgorde"] = nieuwe_ids
+    return delta
+
+def apply_delta(vorige, delta):
+    """Pas een delta (zie maak_delta) toe op de vorige versie (lijst met dicts); geeft de nieuwe lijst
+    Zo verwerkt ook een client de delta: verwijderde IDs eruit, gewijzigde adressen vervangen en
+    toegevoegde adressen op hun positie invoegen (of alles in de "volgorde" van de delta zetten).
+    """
+    verwijderd = set(delta["verwijderd"])
+    gewijzigd = {a["id"]: a for a in delta["gewijzigd"]}
+    adressen = [gewijzigd.get(a["id"], a) for a in vorige if a["id"] not in verwijderd]
+    if "volgorde" in delta:
+        per_id = {a["id"]: a for a in adressen}
+        per_id.update((a["id"], a) for _, a in delta["toegevoegd"])
+        return [per_id[i] for i in delta["volgorde"]]
+    resultaat = []
+    overgebleven = iter(adressen)
+    for positie, adres in delta["toegevoegd"]:
+        resultaat.extend(itertools.islice(overgebleven, positie - len(resultaat)))
+        resultaat.append(adres)
+    resultaat.extend(overgebleven)
+    return resultaat
+
+def write_delta_export(adressen, vorige, directory, output=output_path):
+    """Schrijf een delta ten opzichte van de vorige adressen.json en werk het versie manifest bij
+    adressen: de nieuwe AdresRecords; vorige: de vorige adressen.json (lijst met dicts, leeg als die er niet was).
+    Het manifest noemt de huidige versie (oplopend nummer), de SHA256 van adressen.json zonder opmaak en de
+    deltas waarmee een client van een oudere versie bij kan werken (adressen.delta.<van>-<naar>.json).
+    Een delta wordt alleen gepubliceerd als die toegepast op de vorige versie precies de nieuwe oplevert
+    en kleiner is dan het hele bestand; anders halen clients het hele bestand opnieuw op.
+    """
+    manifest_path = os.path.join(directory, DELTA_MANIFEST)
+    vorig_manifest, oud_pad = lees_manifest(directory, DELTA_MANIFEST, "dataVersie")
+    if vorig_manifest and vorig_manifest.get("versie") != DELTA_VERSIE:
+        vorig_manifest = None
+
+    nieuwe = [adres.to_dict() for adres in adressen]
+    nieuwe_teksten = [JSON_COMPACT.encode(a) for a in nieuwe]
+    sha256 = adressen_sha256(nieuwe_teksten)
+    snapshot_bytes = sum(len(tekst.encode('utf-8')) + 1 for tekst in nieuwe_teksten) + 1
+    if vorig_manifest and vorig_manifest.get("sha256") == sha256:
+        print(f"[INFO] Geen wijzigingen ten opzichte van versie {vorig_manifest['dataVersie']}, geen nieuwe delta")
+        if oud_pad:
+            with atomic_open(manifest_path) as f:
+                json.dump(vorig_manifest, f, ensure_ascii=False, indent=2)
+            os.remove(oud_pad)
+        return vorig_manifest
+
+    data_versie = vorig_manifest["dataVersie"] + 1 if vorig_manifest else 1
+    deltas = []
+    delta_bestand = None
+    # Alleen een delta als de vorige adressen.json de versie is die clients volgens het manifest hebben
+    if vorig_manifest and adressen_sha256(JSON_COMPACT.encode(a) for a in vorige) == vorig_manifest.get("sha256"):
+        delta = maak_delta(vorige, nieuwe)
+        if delta is None:
+            print("[WAARSCHUWING] IDs in adressen.json zijn niet uniek, geen delta (clients laden het hele bestand)")
+        elif adressen_sha256(JSON_COMPACT.encode(a) for a in apply_delta(vorige, delta)) != sha256:
+            print("[WAARSCHUWING] Delta geeft toegepast niet de nieuwe versie, geen delta (clients laden het hele bestand)")
+        else:
+            inhoud = {
+                "versie": DELTA_VERSIE,
+                "van": vorig_manifest["dataVersie"],
+                "naar": data_versie,
+                "vanSha256": vorig_manifest["sha256"],
+                "naarSha256": sha256,
+                **delta,
+            }
+            data = JSON_COMPACT.encode(inhoud).encode('utf-8')
+            if len(data) >= snapshot_bytes:
+                print("[INFO] Delta is niet kleiner dan het hele bestand, geen delta (gebruik --incremental, "
+                      "anders krijgen alle adressen een nieuw toegevoegdOp)")
+            else:
+                delta_bestand = f"adressen.delta.{inhoud['van']}-{data_versie}.json"
+                os.makedirs(directory, exist_ok=True)
+                with atomic_open(os.path.join(directory, delta_bestand), 'wb') as f:
+                    f.write(data)
+                deltas = list(vorig_manifest.get("deltas", []))[-(DELTA_BEWAAR - 1):] if DELTA_BEWAAR > 1 else []
+                deltas.append({
+                    "van": inhoud["van"],
+                    "naar": data_versie,
+                    "bestand": delta_bestand,
+                    "sha256": hashlib.sha256(data).hexdigest(),
+                    "bytes": len(data),
+                    "toegevoegd": len(delta["toegevoegd"]),
+                    "verwijderd": len(delta["verwijderd"]),
+                    "gewijzigd": len(delta["gewijzigd"]),
+                })
+    elif vorig_manifest:
+        print(f"[INFO] Vorige {os.path.basename(output)} is niet versie {vorig_manifest['dataVersie']} uit het "
+              f"manifest, geen delta (clients laden het hele bestand)")
+
+    manifest = {
+        "versie": DELTA_VERSIE,
+        "dataVersie": data_versie,
+        "sha256": sha256,
+        "aantal": len(nieuwe),
+        "bytes": snapshot_bytes,
+        "snapshot": os.path.basename(output),
+        "bijgewerkt": datetime.now().isoformat(timespec='seconds'),
+        "deltas": deltas,
+    }
+    os.makedirs(directory, exist_ok=True)
+    with atomic_open(manifest_path) as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    if oud_pad:
+        os.remove(oud_pad)
+
+    # Deltas die niet meer in het manifest staan (te oud, of de keten is onderbroken) verwijderen
+    bestanden = {delta["bestand"] for delta in deltas}
+    for bestand in os.listdir(directory):
+        if DELTA_BESTAND_RE.match(bestand) and bestand not in bestanden:
+            os.remove(os.path.join(directory, bestand))
+    return manifest
+
+def main(argv=None):
+    """Converteer het medewerker Excel bestand naar adressen.json (command line, zelfde opties als adrestool.py convert)"""
+    from adrestool import add_convert_arguments
+    parser = argparse.ArgumentParser(description="Converteer medewerker adressen (Excel) naar adressen.json")
+    add_convert_arguments(parser)
+    return run(parser.parse_args(argv))
+
+def converteer_bronnen(args, bronnen, afas_paden, paden, report):
+    """Lees de AFAS export(s) en werkbladen en zet de medewerkers om naar adres objecten
+    paden: UitvoerPaden van deze run; report: het RunReport van deze run.
+    Returns: (adressen als AdresRecord, fingerprints), of met --compare-matcher de exit code van de vergelijking.
+    """
+    snapshot_dir = None if args.no_snapshot_cache else snapshot_cache_dir
+    meerdere_bronnen = len(bronnen) > 1
+    # Meerdere bestanden: alles (AFAS exports en werkbladen) tegelijk inlezen, elk in een eigen proces
+    ingelezen = {}
+    if not args.stream and (meerdere_bronnen or len(afas_paden) > 1):
+        taken = [(pad, 0) for pad in afas_paden] + bronnen
+        lees_workers = min(len(taken), args.workers or os.cpu_count() or 1)
+        print(f"\n[INFO] {len(bronnen)} werkblad(en) en {len(afas_paden)} AFAS export(s) inlezen met "
+              f"{lees_workers} processen...")
+        report.start("werkboek_lezen")
+        resultaten = read_excel_parallel(taken, lees_workers, snapshot_dir)
+        for (pad, werkblad), resultaat in zip(taken, resultaten):
+            if isinstance(resultaat, Exception):
+                print(f"[WAARSCHUWING] {bron_label(pad, werkblad)}: {resultaat}")
+            else:
+                print(f"[INFO] {bron_label(pad, werkblad)}: {len(resultaat[0])} rijen in {resultaat[1]:.2f}s")
+            ingelezen[(pad, werkblad)] = resultaat
+        tijden = [resultaat[1] for resultaat in resultaten if not isinstance(resultaat, Exception)]
+        report.stop("werkboek_lezen", bestanden=len(taken), werkbladen=len(bronnen),
+                    langzaamste_s=round(max(tijden, default=0.0), 3), som_s=round(sum(tijden), 3))
+        for pad, werkblad in bronnen:
+            if isinstance(ingelezen[(pad, werkblad)], Exception):
+                print(f"[FOUT] Fout bij lezen van {bron_label(pad, werkblad)}")
+                print("\n[WAARSCHUWING] Let op: Sluit het Excel bestand in Excel voordat je dit script opnieuw uitvoert!")
+                raise ingelezen[(pad, werkblad)]
+
+    # Lees AFAS export(s) voor OE namen mapping
+    report.start("afas_laden")
+    mappings = []
+    for pad in afas_paden:
+        resultaat = ingelezen.get((pad, 0))
+        if isinstance(resultaat, Exception):
+            mappings.append({})
+        else:
+            mappings.append(load_afas_oe_mapping(stream=args.stream, path=pad,
+                                                 df_afas=resultaat[0] if resultaat else None,
+                                                 snapshot_dir=snapshot_dir))
+    oe_mapping = merge_oe_mappings(mappings)
+    if len(mappings) > 1:
+        print(f"[INFO] {len(oe_mapping)} medewerker->OE mappings uit {len(mappings)} AFAS exports")
+    report.stop("afas_laden", medewerkers=len(oe_mapping))
+    report.start("oe_index")
+    oe_matcher = NameMatcher(oe_mapping)
+    report.stop("oe_index")
+
+    # Lees de werkbladen en zoek per werkblad de kolommen (de kolomnamen mogen per regio verschillen)
+    invoer = []
+    for pad, werkblad in bronnen:
+        label = bron_label(pad, werkblad)
+        df = None
+        if (pad, werkblad) in ingelezen:
+            df = ingelezen[(pad, werkblad)][0]
+            kolomnamen = df.columns.tolist()
+            report.add("werkboek_lezen", 0.0, rijen=len(df))
+        else:
+            print(f"\n[INFO] Lezen van: {label}")
+            report.start("werkboek_lezen")
             try:
-                latitude = float(row[lat_col])
-            except:
-                pass
-        if lng_col and pd.notna(row[lng_col]):
+                if args.stream and not args.compare_matcher:
+                    kolomnamen, rijen = open_excel_stream(pad, werkblad)
+                    print("[OK] Bestand geopend in streaming modus (openpyxl read_only)")
+                else:
+                    df = read_excel_cached(pad, werkblad, snapshot_dir)
+                    kolomnamen = df.columns.tolist()
+                    print("[OK] Bestand gelezen met openpyxl engine")
+            except Exception as e:
+                print(f"[FOUT] Fout bij lezen: {e}")
+                print("\n[WAARSCHUWING] Let op: Sluit het Excel bestand in Excel voordat je dit script opnieuw uitvoert!")
+                raise
+            report.stop("werkboek_lezen", **({"rijen": len(df)} if df is not None else {}))
+
+        print(f"\n[INFO] Gevonden kolommen{f' in {label}' if meerdere_bronnen else ''}: {kolomnamen}")
+        if df is not None:
+            print(f"[INFO] Aantal rijen: {len(df)}")
+            print("\n[INFO] Eerste paar rijen:")
+            print(df.head().to_string())
+
+        # Zoek relevante kolommen
+        kolommen = detect_columns(df if df is not None else pd.DataFrame(columns=kolomnamen))
+        naam_col = kolommen["naam"]
+
+        print(f"\n[INFO] Gevonden kolommen mapping:")
+        print(f"   Naam: {naam_col}")
+        print(f"   Straat: {kolommen['straat']}")
+        print(f"   Huisnummer: {kolommen['huisnummer']}")
+        print(f"   Postcode: {kolommen['postcode']}")
+        print(f"   Plaats: {kolommen['plaats']}")
+        print(f"   Volledig adres: {kolommen['volledig_adres']}")
+        print(f"   BU: {kolommen['bu']}")
+        print(f"   Latitude: {kolommen['lat']}")
+        print(f"   Longitude: {kolommen['lng']}")
+
+        # Voeg een kolom toe met geformatteerde namen
+        if naam_col and df is None:
+            print(f"\n[INFO] Streaming modus: kolom 'Naam Geformatteerd' wordt niet naar het Excel bestand geschreven")
+        elif naam_col:
+            print(f"\n[INFO] Formatteren van namen en toevoegen aan nieuwe kolom 'Naam Geformatteerd'...")
+            report.start("namen_formatteren")
+            df['Naam Geformatteerd'] = format_naam_column(df[naam_col])
+            report.stop("namen_formatteren", rijen=len(df))
+            print(f"[OK] Geformatteerde namen toegevoegd")
+        else:
+            print(f"\n[WAARSCHUWING] Geen naam kolom gevonden, kan geen geformatteerde namen toevoegen")
+        invoer.append({"label": label, "kolommen": kolommen, "df": df,
+                       "kolomnamen": kolomnamen, "rijen": rijen if df is None else None})
+    
+    met_namen = [bron for bron in invoer if bron["df"] is not None and bron["kolommen"]["naam"]]
+    if args.compare_matcher:
+        if not met_namen:
+            print(f"\n[FOUT] Geen namen om de OE matchers mee te vergelijken")
+            return 1
+        print(f"\n[INFO] Vergelijken van geïndexeerde OE matcher met lineaire scan...")
+        namen = [str(n).strip() for bron in met_namen for n in bron["df"]['Naam Geformatteerd']
+                 if n and pd.notna(n) and str(n).strip()]
+        verschillen = compare_matchers(namen, oe_mapping, oe_matcher)
+        return 1 if verschillen else 0
+    
+    # Bewaar de geformatteerde namen in een sidecar bestand; het bron Excel bestand blijft ongewijzigd
+    if met_namen:
+        try:
+            if meerdere_bronnen:
+                namen = pd.concat([pd.DataFrame({
+                    "Bron": bron["label"],
+                    "Naam": bron["df"][bron["kolommen"]["naam"]].to_numpy(),
+                    "Naam Geformatteerd": bron["df"]['Naam Geformatteerd'].to_numpy(),
+                }) for bron in met_namen], ignore_index=True)
+                write_naam_sidecar(namen, "Naam", naam_sidecar_path, bron_col="Bron")
+            else:
+                write_naam_sidecar(met_namen[0]["df"], met_namen[0]["kolommen"]["naam"], naam_sidecar_path)
+            print(f"[OK] Geformatteerde namen opgeslagen in {naam_sidecar_path}")
+        except Exception as e:
+            print(f"[WAARSCHUWING] Kon {naam_sidecar_path} niet opslaan: {e}")
+    
+    if args.write_excel_names and met_namen:
+        if meerdere_bronnen or bronnen[0][1] != 0:
+            # Terugschrijven vervangt het hele werkboek door één werkblad
+            print(f"[WAARSCHUWING] --write-excel-names kan alleen bij één bestand zonder --sheet; "
+                  f"de namen staan in {naam_sidecar_path}")
+        else:
             try:
-                longitude = float(row[lng_col])
-            except:
-                pass
-        
-        # Als naam niet gevonden, gebruik eerste niet-numerieke kolom
-        if not naam:
-            for col in df.columns:
-                if col not in [straat_col, huisnummer_col, postcode_col, plaats_col, volledig_adres_col, bu_col, lat_col, lng_col]:
-                    if pd.notna(row[col]) and str(row[col]).strip():
-                        naam = format_naam(row[col])
+                print(f"[INFO] Opslaan van Excel bestand met geformatteerde namen...")
+                met_namen[0]["df"].to_excel(bronnen[0][0], index=False, engine='openpyxl')
+                print(f"[OK] Excel bestand opgeslagen met nieuwe kolom 'Naam Geformatteerd'")
+            except Exception as e:
+                print(f"[WAARSCHUWING] Kon Excel bestand niet opslaan: {e}")
+                print(f"   De geformatteerde namen worden wel gebruikt voor de JSON output")
+
+    # Incrementele modus: hergebruik ongewijzigde adressen uit de vorige output
+    vorige_adressen = []
+    vorige_fingerprints = {}
+    if args.incremental:
+        print(f"\n[INFO] Incrementele modus: vorige output wordt hergebruikt voor ongewijzigde rijen")
+        vorige_adressen = load_previous_output(paden.output)
+        vorige_fingerprints = load_incremental_state(paden.incremental_state)
+
+    # Converteer naar JSON formaat volgens GEDEELDE_ADRESSEN.md
+    # De tijd van conversie is inclusief namen formatteren en OE matching (die ook apart gemeten worden)
+    converter = AdresConverter(invoer[0]["kolommen"], oe_mapping, oe_matcher, vorige_adressen, vorige_fingerprints,
+                               ontdubbelen=meerdere_bronnen, report=report)
+    aantal_rijen = 0
+    for bron in invoer:
+        converter.gebruik_bron(bron["kolommen"], bron["label"])
+        df = bron["df"]
+        if df is not None:
+            workers = parallel_workers(args.workers, len(df))
+            if workers > 1:
+                chunks = [(df.iloc[start:start + PARALLEL_CHUNK_RIJEN], None) for start in range(0, len(df), PARALLEL_CHUNK_RIJEN)]
+            else:
+                chunks = [(df, None)]
+        else:
+            chunks = report.meet_iterator("werkboek_lezen", iter_excel_chunks(bron["kolomnamen"], bron["rijen"],
+                                                                               bron["kolommen"], args.chunk_size))
+            if args.workers is None:
+                # Het aantal rijen is bij streaming vooraf onbekend: lees vooruit tot de drempel of het einde
+                vooruit, gelezen = [], 0
+                for chunk in chunks:
+                    vooruit.append(chunk)
+                    gelezen += len(chunk[0])
+                    if gelezen >= PARALLEL_MIN_RIJEN:
                         break
-        
-        # Als nog steeds geen naam, gebruik eerste kolom
-        if not naam:
-            for col in df.columns:
-                if pd.notna(row[col]) and str(row[col]).strip():
-                    naam = format_naam(row[col])
-                    break
-        
-        # Bewaar originele plaats voor geocoding
-        plaats_origineel = plaats or ""
-        
-        # Maak adres object
-        adres = {
-            "id": adres_id,
-            "naam": naam or f"Adres {idx + 1}",
-            "straat": straat or "",
-            "huisnummer": str(huisnummer) if huisnummer else "",
-            "postcode": str(postcode) if postcode else "",
-            "plaats": plaats_origineel,
-            "plaats_origineel": plaats_origineel,  # Bewaar originele plaats voor geocoding
-            "source": "shared",
-            "toegevoegdOp": datetime.now().isoformat() + "Z"
-        }
-        
-        # Voeg BU toe als beschikbaar
-        if bu:
-            adres["bu"] = bu
-        
-        # Voeg latitude/longitude toe als beschikbaar
-        if latitude is not None:
-            adres["latitude"] = latitude
-        if longitude is not None:
-            adres["longitude"] = longitude
-        
-        adressen.append(adres)
+                chunks = itertools.chain(vooruit, chunks)
+            else:
+                gelezen = 0
+            workers = parallel_workers(args.workers, gelezen)
+        if workers > 1:
+            print(f"\n[INFO] Rijen voorbereiden met {workers} processen")
+        for aantal in converter.convert_chunks(chunks, workers):
+            aantal_rijen += aantal
+            if df is None:
+                print(f"[INFO] {aantal_rijen} rijen verwerkt...")
+    adressen = converter.adressen
+    fingerprints = converter.fingerprints
+    hergebruikt = converter.hergebruikt
+    coordinaten_hergebruikt = converter.coordinaten_hergebruikt
+    if meerdere_bronnen:
+        print(f"\n[INFO] {len(adressen)} adressen uit {len(invoer)} werkbladen; "
+              f"{converter.dubbel} medewerkers overgeslagen die al in een eerder werkblad stonden")
+        report.add("samenvoegen", 0.0, werkbladen=len(invoer), dubbel=converter.dubbel)
+
+    if args.incremental:
+        print(f"\n[INFO] Incrementeel: {hergebruikt} ongewijzigde adressen hergebruikt, "
+              f"{len(adressen) - hergebruikt} nieuw/gewijzigd verwerkt "
+              f"({coordinaten_hergebruikt} met coördinaten uit vorige output)")
+    return adressen, fingerprints
+
+
+def apply_postcode_table(adressen_zonder_coordinaten, path, report):
+    """Geef adressen zonder coördinaten de centroid van hun postcode; returns: de adressen die over blijven"""
+    report.start("postcode_tabel")
+    postcode_index = load_postcode_table(path)
+    if postcode_index:
+        nog_zonder_coordinaten = []
+        for adres in adressen_zonder_coordinaten:
+            lat, lon, bron = lookup_postcode(postcode_index, adres.postcode)
+            if lat is not None and lon is not None:
+                adres.zet_coordinaten(lat, lon, bron)
+            else:
+                nog_zonder_coordinaten.append(adres)
+        print(f"[OK] {len(adressen_zonder_coordinaten) - len(nog_zonder_coordinaten)} adressen offline "
+              f"opgelost via postcode centroid, {len(nog_zonder_coordinaten)} over voor geocoding")
+        adressen_zonder_coordinaten = nog_zonder_coordinaten
+    report.stop("postcode_tabel")
+    return adressen_zonder_coordinaten
+
+
+def run(args):
+    """Voer de conversie uit met de opties uit add_convert_arguments(); geeft de exit code terug"""
+    # Alles van deze run (paden, rapport, geocoder) blijft lokaal: een volgende aanroep begint weer met de standaarden
+    paden = UitvoerPaden(args.output)
+    report = RunReport(args.log_level)
+
+    print("=" * 60)
+    print("Excel naar JSON Converter")
+    print("=" * 60)
+
+    fout = export_map_fout(args.shard_by_bu, args.delta, paden.output)
+    if fout:
+        print(f"[FOUT] {fout}")
+        return 1
+
+    try:
+        afas_paden = expand_paden(args.afas)
+    except FileNotFoundError as e:
+        print(f"[WAARSCHUWING] Geen AFAS export: {e}")
+        afas_paden = []
+
+    checkpoint = None
+    try:
+        bronnen = expand_bronnen(args.excel, args.sheet)
+        meerdere_bronnen = len(bronnen) > 1
+        if meerdere_bronnen:
+            print(f"\n[INFO] {len(bronnen)} werkbladen worden samengevoegd:")
+            for pad, werkblad in bronnen:
+                print(f"   {bron_label(pad, werkblad)}")
+    
+        # Journal van de vorige run: met --resume wordt het werk dat al gedaan is overgeslagen
+        checkpoint = Checkpoint(paden.checkpoint, checkpoint_invoer(args, bronnen, afas_paden, paden))
+        hervat = args.resume and not args.compare_matcher and checkpoint.load()
+        if not args.resume and os.path.exists(paden.checkpoint):
+            print(f"[INFO] Checkpoint van een onderbroken run gevonden; gebruik --resume om daar verder te gaan "
+                  f"(deze run begint opnieuw)")
+        hervat_records = checkpoint.records is not None
+        if hervat_records:
+            adressen, fingerprints = checkpoint.records
+            print(f"\n[INFO] Hervat: {len(adressen)} adressen uit het checkpoint; inlezen, conversie, OE matching "
+                  f"en postcode tabel overgeslagen")
+        else:
+            resultaat = converteer_bronnen(args, bronnen, afas_paden, paden, report)
+            if args.compare_matcher:
+                return resultaat  # Alleen de vergelijking, geen output
+            adressen, fingerprints = resultaat
+    
+        # Voeg coördinaten toe via geocoding voor adressen die die nog niet hebben
+        print(f"\n[INFO] Controleren en toevoegen van coördinaten via geocoding...")
+        adressen_zonder_coordinaten = [a for a in adressen if not a.heeft_coordinaten()]
     
-    # Voeg coördinaten toe via geocoding voor adressen die die nog niet hebben
-    print(f"\n[INFO] Controleren en toevoegen van coördinaten via geocoding...")
-    adressen_zonder_coordinaten = [a for a in adressen if "latitude" not in a or "longitude" not in a]
+        # Eerste laag: offline postcode centroids (geen netwerk nodig); bij hervatten al gedaan
+        if adressen_zonder_coordinaten and args.postcode_table and not hervat_records:
+            adressen_zonder_coordinaten = apply_postcode_table(adressen_zonder_coordinaten, args.postcode_table, report)
     
-    if adressen_zonder_coordinaten:
-        print(f"[INFO] {len(adressen_zonder_coordinaten)} adressen zonder coördinaten gevonden. Geocoding wordt uitgevoerd...")
-        print("[INFO] Let op: Dit kan even duren vanwege rate limiting (1 request/seconde)")
+        # Journal: eerst de geconverteerde adressen, direct na de conversie (ook zonder geocoding, zodat een
+        # onderbreking tijdens het schrijven van de output niet opnieuw converteert), daarna elk gevonden adres
+        checkpoint.open(hervat)
+        if not hervat_records:
+            checkpoint.stap_records(adressen, fingerprints)
+    
+        if adressen_zonder_coordinaten and args.no_geocode:
+            print(f"[INFO] {len(adressen_zonder_coordinaten)} adressen zonder coördinaten; geocoding overgeslagen (--no-geocode)")
+        elif adressen_zonder_coordinaten:
+            print(f"[INFO] {len(adressen_zonder_coordinaten)} adressen zonder coördinaten gevonden. Geocoding wordt uitgevoerd...")
+            print("[INFO] Let op: Dit kan even duren vanwege rate limiting (1 request/seconde)")
         
-        for idx, adres in enumerate(adressen_zonder_coordinaten, 1):
-            straat = adres.get("straat", "")
-            huisnummer = adres.get("huisnummer", "")
-            postcode = adres.get("postcode", "")
-            plaats = adres.get("plaats_origineel", "")  # Gebruik originele plaats voor geocoding
-            
-            if straat or postcode or plaats:
-                # Bouw een leesbare adres string voor de output
-                adres_delen = []
-                if straat:
-                    if huisnummer:
-                        adres_delen.append(f"{straat} {huisnummer}")
+            report.start("geocoding")
+            geocoder = open_geocoder(args.geocoder, args.geocode_url, args.geocode_rate, args.geocode_workers)
+        
+            # Groepeer adressen met hetzelfde (genormaliseerde) adres, bijv. collega's op één adres:
+            # elk uniek adres wordt één keer gegeocodeerd en het resultaat gaat naar de hele groep.
+            # Gelijke fallback queries van verschillende adressen voegt de GeocodeEngine samen.
+            groepen = {}
+            for adres in adressen_zonder_coordinaten:
+                velden = (adres.straat or "", adres.huisnummer or "", adres.postcode or "", adres.plaats or "")
+                groepen.setdefault("\x1f".join(normalize_geocode_query(veld) for veld in velden), []).append(adres)
+            groepen = list(groepen.items())
+            if checkpoint.geocoding:
+                # Adressen die de vorige run al gevonden heeft: coördinaten uit het checkpoint, geen zoekopdrachten
+                te_doen = []
+                for sleutel, groep in groepen:
+                    if sleutel in checkpoint.geocoding:
+                        lat, lon = checkpoint.geocoding[sleutel]
+                        for lid in groep:
+                            lid.zet_coordinaten(lat, lon, "geocoding")
+                        report.tel("geocoding_hervat", len(groep))
                     else:
-                        adres_delen.append(straat)
-                if postcode:
-                    adres_delen.append(postcode)
-                if plaats:
-                    adres_delen.append(plaats)
-                adres_string = ", ".join(adres_delen) if adres_delen else "onbekend"
-                
-                print(f"   [{idx}/{len(adressen_zonder_coordinaten)}] Geocoding: {adres_string}")
+                        te_doen.append((sleutel, groep))
+                print(f"[INFO] {len(groepen) - len(te_doen)} unieke adressen overgenomen uit het checkpoint")
+                groepen = te_doen
+            print(f"[INFO] {len(groepen)} unieke adressen te geocoden")
+        
+            def geocode_adres(taak):
+                idx, (sleutel, groep) = taak
+                adres = groep[0]
+                straat = adres.straat or ""
+                huisnummer = adres.huisnummer or ""
+                postcode = adres.postcode or ""
+                plaats = adres.plaats or ""
+            
+                if straat or postcode or plaats:
+                    # Bouw een leesbare adres string voor de output
+                    adres_delen = []
+                    if straat:
+                        if huisnummer:
+                            adres_delen.append(f"{straat} {huisnummer}")
+                        else:
+                            adres_delen.append(straat)
+                    if postcode:
+                        adres_delen.append(postcode)
+                    if plaats:
+                        adres_delen.append(plaats)
+                    adres_string = ", ".join(adres_delen) if adres_delen else "onbekend"
+                    if len(groep) > 1:
+                        adres_string += f" ({len(groep)} adressen)"
                 
-                # Probeer eerst met volledig adres (als beschikbaar)
-                lat, lon = geocode_address(straat, huisnummer, postcode, plaats)
+                    report.log("debug", f"   [{idx}/{len(groepen)}] Geocoding: {adres_string}")
                 
-                # Als dat faalt en plaatsnaam heeft meerdere woorden, probeer zonder laatste woord
-                # (om provincie-afkortingen zoals "GLD" te verwijderen)
-                if not lat and not lon and plaats:
-                    plaats_woorden = plaats.strip().split()
-                    if len(plaats_woorden) > 1:
-                        plaats_zonder_laatste = " ".join(plaats_woorden[:-1])
-                        print(f"      [INFO] Probeer opnieuw zonder laatste woord van plaatsnaam ('{plaats_woorden[-1]}')...")
-                        lat, lon = geocode_address(straat, huisnummer, postcode, plaats_zonder_laatste)
-                        time.sleep(1)  # Extra wachttijd tussen retry
+                    # Rate limiting (1 request/seconde voor de publieke server) zit in de GeocodeEngine
+                    lat, lon = geocode_with_fallback(straat, huisnummer, postcode, plaats, geocoder, report)
                 
-                # Als dat nog steeds faalt en we hebben een straat maar ook postcode + plaats, 
-                # probeer dan alleen met postcode + plaats (zonder laatste woord als dat mogelijk is)
-                if not lat and not lon and straat and postcode and plaats:
-                    plaats_woorden = plaats.strip().split()
-                    if len(plaats_woorden) > 1:
-                        plaats_zonder_laatste = " ".join(plaats_woorden[:-1])
-                        print(f"      [INFO] Probeer met alleen postcode + plaats (zonder '{plaats_woorden[-1]}')...")
-                        lat, lon = geocode_address(None, None, postcode, plaats_zonder_laatste)
-                        time.sleep(1)  # Extra wachttijd tussen retry
+                    if lat and lon:
+                        for lid in groep:
+                            lid.zet_coordinaten(lat, lon, "geocoding")
+                        # Alleen gevonden adressen: niet gevonden (of mislukte) adressen probeert --resume opnieuw,
+                        # via de geocode cache zonder nieuwe requests als Nominatim ze echt niet kent
+                        checkpoint.stap_geocoding(sleutel, lat, lon)
+                        report.tel("geocoding_gevonden", len(groep))
+                        report.tel("geocoding_opgelost")
+                        report.log("debug", f"      [OK] Coördinaten toegevoegd: {lat}, {lon}")
                     else:
-                        print(f"      [INFO] Probeer opnieuw met alleen postcode + plaats...")
-                        lat, lon = geocode_address(None, None, postcode, plaats)
-                        time.sleep(1)  # Extra wachttijd tussen retry
-                
-                if lat and lon:
-                    adres["latitude"] = lat
-                    adres["longitude"] = lon
-                    print(f"      [OK] Coördinaten toegevoegd: {lat}, {lon}")
+                        report.tel("geocoding_niet_gevonden", len(groep))
+                        report.log("warning", f"   [FOUT] Geen coördinaten gevonden voor: {adres_string}")
                 else:
-                    print(f"      [FOUT] Geen coördinaten gevonden")
-                
-                # Rate limiting: wacht 1 seconde tussen requests (Nominatim policy)
-                if idx < len(adressen_zonder_coordinaten):
-                    time.sleep(1)
-            else:
-                print(f"   [{idx}/{len(adressen_zonder_coordinaten)}] Adres onvolledig, overgeslagen")
-    else:
-        print("[OK] Alle adressen hebben al coördinaten!")
+                    report.tel("geocoding_onvolledig", len(groep))
+                    report.log("warning", f"   [{idx}/{len(groepen)}] Adres onvolledig, overgeslagen")
+                if idx % 100 == 0:
+                    report.log("info", f"[INFO] Geocoding: {idx}/{len(groepen)} unieke adressen verwerkt...")
+        
+            # Geocode met een beperkt aantal gelijktijdige requests; elke taak vult de adressen van zijn eigen groep
+            executor = ThreadPoolExecutor(max_workers=geocoder.workers)
+            try:
+                list(executor.map(geocode_adres, enumerate(groepen, 1)))
+            finally:
+                # Bij Ctrl-C geen nieuwe adressen meer starten; lopende taken komen nog in het checkpoint
+                executor.shutdown(wait=True, cancel_futures=True)
+                checkpoint.flush()
+        
+            geocoder.print_stats()
+            # Effectiviteit van de zoekopdrachten: hoeveel zoekopdrachten en netwerk requests per gevonden adres
+            opgelost = report.tellers["geocoding_opgelost"]
+            zoekopdrachten_per_adres = report.tellers["geocoding_zoekopdrachten"] / opgelost if opgelost else 0.0
+            requests_per_adres = geocoder.requests / opgelost if opgelost else 0.0
+            print(f"[INFO] {opgelost} van {len(groepen)} unieke adressen gevonden; gemiddeld "
+                  f"{zoekopdrachten_per_adres:.2f} zoekopdrachten en {requests_per_adres:.2f} requests per gevonden adres")
+            cache = geocoder.cache
+            report.stop(
+                "geocoding",
+                adressen=len(adressen_zonder_coordinaten),
+                unieke_adressen=len(groepen),
+                requests=geocoder.requests,
+                samengevoegd=geocoder.samengevoegd,
+                zoekopdrachten_per_gevonden=round(zoekopdrachten_per_adres, 3),
+                requests_per_gevonden=round(requests_per_adres, 3),
+                herhaald=geocoder.herhaald,
+                fouten=geocoder.fouten,
+                wachttijd_s=round(geocoder.limiter.wachttijd, 3) if geocoder.limiter is not None else 0.0,
+                cache_hits=cache.hits if cache is not None else 0,
+                cache_misses=cache.misses if cache is not None else 0,
+            )
+            geocoder.close()
+        else:
+            print("[OK] Alle adressen hebben al coördinaten!")
     
-    # Verwijder plaats_origineel uit alle adres objecten (alleen gebruikt voor geocoding)
-    for adres in adressen:
-        if "plaats_origineel" in adres:
-            del adres["plaats_origineel"]
-    
-    # Schrijf naar JSON bestand
-    output_path = 'adressen.json'
-    with open(output_path, 'w', encoding='utf-8') as f:
-        json.dump(adressen, f, indent=2, ensure_ascii=False)
-    
-    print(f"\n[OK] JSON bestand aangemaakt: {output_path}")
-    print(f"[INFO] Totaal aantal adressen: {len(adressen)}")
-    print(f"\n[TIP] Upload dit bestand naar GitHub volgens de instructies in GEDEELDE_ADRESSEN.md")
-    
-except PermissionError as e:
-    print(f"\n[FOUT] Het Excel bestand is waarschijnlijk open in Excel!")
-    print("   Sluit het Excel bestand en probeer het opnieuw.")
-    print(f"   Details: {e}")
-except FileNotFoundError as e:
-    print(f"\n[FOUT] Bestand niet gevonden!")
-    print(f"   Zorg dat '{excel_path}' in dezelfde map staat als dit script.")
-    print(f"   Details: {e}")
-except Exception as e:
-    print(f"\n[FOUT] {e}")
-    import traceback
-    traceback.print_exc()
+        # Vorige versie voor de delta, voordat adressen.json overschreven wordt
+        vorige_output = load_previous_output(paden.output) if args.delta else None
+    
+        # Schrijf naar JSON bestand, adres voor adres
+        report.start("json_schrijven")
+        with atomic_open(paden.output) as f:
+            write_json_array(f, (adres.to_dict() for adres in adressen), compact=args.compact)
+        report.stop("json_schrijven", adressen=len(adressen))
+    
+        # Bewaar fingerprints zodat een volgende run met --incremental ongewijzigde rijen kan overslaan
+        save_incremental_state(paden.incremental_state, fingerprints)
+    
+        print(f"\n[OK] JSON bestand aangemaakt: {paden.output}")
+        print(f"[INFO] Totaal aantal adressen: {len(adressen)}")
+    
+        if args.index:
+            report.start("ruimtelijke_index")
+            manifest = write_spatial_index(adressen, paden.spatial_index, cel_grootte=args.grid_cell_size,
+                                           output=paden.output)
+            report.stop("ruimtelijke_index")
+            print(f"[OK] Ruimtelijke index aangemaakt: {paden.spatial_index} "
+                  f"({manifest['aantal']} adressen in {manifest['grid']['cellen']} cellen)")
+        if args.clusters:
+            report.start("marker_clusters")
+            zoom_min, zoom_max = args.cluster_zooms
+            manifest = write_marker_clusters(adressen, paden.clusters, zoom_min=zoom_min, zoom_max=zoom_max,
+                                             output=paden.output)
+            report.stop("marker_clusters")
+            print(f"[OK] Marker clusters aangemaakt: {paden.clusters} (zoom {zoom_min}-{zoom_max}, "
+                  f"{len(manifest['lagen']) - 1} BU's)")
+        if args.shard_by_bu:
+            report.start("shards")
+            manifest = write_sharded_output(adressen, args.shard_by_bu, output=paden.output)
+            report.stop("shards")
+            print(f"[OK] {len(manifest['shards'])} BU shards aangemaakt in {args.shard_by_bu}/ "
+                  f"(manifest: {SHARD_MANIFEST})")
+        
+        if args.delta:
+            report.start("delta")
+            manifest = write_delta_export(adressen, vorige_output, args.delta, output=paden.output)
+            laatste = manifest["deltas"][-1] if manifest["deltas"] else None
+            report.stop("delta", bytes=laatste["bytes"] if laatste else 0)
+            if laatste and laatste["naar"] == manifest["dataVersie"]:
+                print(f"[OK] Delta versie {laatste['van']} -> {laatste['naar']} in {args.delta}/: "
+                      f"{laatste['toegevoegd']} toegevoegd, {laatste['verwijderd']} verwijderd, "
+                      f"{laatste['gewijzigd']} gewijzigd ({laatste['bytes']} bytes)")
+            print(f"[OK] Versie manifest: {os.path.join(args.delta, DELTA_MANIFEST)} (versie {manifest['dataVersie']})")
+        
+        # Alle output staat er: het journal van deze (of een eerdere onderbroken) run is niet meer nodig
+        checkpoint.remove()
+        report.print_summary()
+        try:
+            report.write(args.report, argumenten=vars(args), adressen=len(adressen))
+            print(f"[OK] Run rapport opgeslagen in {args.report}")
+        except OSError as e:
+            print(f"[WAARSCHUWING] Kon run rapport niet opslaan: {e}")
+        print(f"\n[TIP] Upload dit bestand naar GitHub volgens de instructies in GEDEELDE_ADRESSEN.md")
+        return 0
+    
+    except PermissionError as e:
+        print(f"\n[FOUT] Het Excel bestand is waarschijnlijk open in Excel!")
+        print("   Sluit het Excel bestand en probeer het opnieuw.")
+        print(f"   Details: {e}")
+    except FileNotFoundError as e:
+        print(f"\n[FOUT] Bestand niet gevonden!")
+        print(f"   Zorg dat '{args.excel[0]}' in dezelfde map staat als dit script.")
+        print(f"   Details: {e}")
+    except KeyboardInterrupt:
+        print(f"\n[INFO] Onderbroken")
+        if checkpoint is not None and checkpoint.f is not None:
+            print(f"   Het werk tot nu toe staat in {paden.checkpoint}; start opnieuw met --resume om verder te gaan")
+        return 130
+    except Exception as e:
+        print(f"\n[FOUT] {e}")
+        import traceback
+        traceback.print_exc()
+    finally:
+        if checkpoint is not None:
+            checkpoint.close()
+    return 1
 
+if __name__ == '__main__':
+    sys.exit(main())
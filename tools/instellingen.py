@@ -0,0 +1,110 @@
+# Standaard bestanden en instellingen van de command line tools (excel_to_json, nearest_employees, routing)
+# Bevat alleen waarden en geen zware imports, zodat adrestool.py --help en het controleren van
+# argumenten direct klaar zijn; de modules nemen deze waarden over als hun module globals.
+
+# Pad naar de Excel bestanden
+excel_path = r'alle medewerker adressen.xlsx'
+afas_export_path = r'afas export.xlsx'
+
+# Output bestand en bijbehorende state voor incrementele conversie
+output_path = 'adressen.json'
+incremental_state_path = 'adressen_state.json'
+
+# Checkpoint (journal) van een lopende run, zodat een onderbroken run met --resume verder kan
+checkpoint_path = 'adressen_checkpoint.jsonl'
+CHECKPOINT_VERSIE = 2
+CHECKPOINT_FLUSH_SECONDEN = 5.0  # Gegeocodeerde adressen worden minstens zo vaak naar schijf geschreven
+
+# Persistente geocode cache (SQLite), zodat herhaalde runs Nominatim niet opnieuw bevragen
+geocode_cache_path = r'geocode_cache.sqlite'
+GEOCODE_CACHE_TTL_HIT = 365 * 24 * 3600  # Gevonden coördinaten: 1 jaar geldig
+GEOCODE_CACHE_TTL_MISS = 30 * 24 * 3600  # Niet gevonden adressen: na 30 dagen opnieuw proberen
+GEOCODE_CACHE_MAX_ENTRIES = 50000  # Maximum aantal cache entries (oudste worden eerst verwijderd)
+
+# Snapshots van ingelezen werkbladen (pickle), zodat ongewijzigde Excel bestanden niet opnieuw geparsed worden
+snapshot_cache_dir = '.excel_snapshots'
+SNAPSHOT_VERSIE = 1
+
+# Geformatteerde namen worden naast het bronbestand bewaard in plaats van het Excel bestand te herschrijven
+naam_sidecar_path = 'namen_geformatteerd.csv'
+
+# Compacte ruimtelijke index naast adressen.json (voor snelle k-dichtstbijzijnde zoekopdrachten in de browser)
+spatial_index_path = 'adressen.index.json'
+SPATIAL_INDEX_VERSIE = 1
+SPATIAL_INDEX_CEL_GROOTTE = 0.1  # Celgrootte van het grid in graden (~11 km noord-zuid, ~7 km oost-west in NL)
+
+# Voorberekende marker clusters per zoomniveau en per BU (Web Mercator grid), zodat de kaart bij duizenden
+# medewerkers alleen de clusters in beeld tekent in plaats van één marker per adres
+cluster_path = 'adressen.clusters.json'
+CLUSTER_VERSIE = 1
+CLUSTER_ZOOM_MIN = 5  # Leaflet zoomniveaus; boven CLUSTER_ZOOM_MAX tekent de kaart losse markers
+CLUSTER_ZOOM_MAX = 13
+CLUSTER_CEL_PIXELS = 64  # Celgrootte in schermpixels (64 = 4 x 4 cellen per kaarttegel van 256 pixels)
+
+# Optionele output per BU: geminificeerde shards met content hash in de bestandsnaam, plus gzip/brotli kopieën
+shard_dir = 'adressen_shards'
+SHARD_MANIFEST = 'shards.manifest.json'
+SHARD_VERSIE = 1
+
+# Optionele wijzigingsfeed: per nieuwe versie van adressen.json een delta (toegevoegd/verwijderd/gewijzigd per ID)
+# en een manifest met het huidige versienummer, zodat browsers niet steeds het hele bestand hoeven op te halen
+delta_dir = 'adressen_delta'
+DELTA_MANIFEST = 'delta.manifest.json'
+OUD_MANIFEST = 'manifest.json'  # Vroegere naam van beide manifesten; wordt nog gelezen en daarna verwijderd
+DELTA_VERSIE = 1
+DELTA_BEWAAR = 20  # Aantal deltas in het manifest; een client die verder achterloopt haalt het hele bestand op
+
+# Run rapport (tijden en tellers per stap) en het niveau voor meldingen per rij
+run_report_path = 'adressen_run.json'
+LOG_NIVEAUS = {"debug": 10, "info": 20, "warning": 30}
+log_niveau = "info"
+
+# Namen formatteren, adressen parsen en OE matching kunnen over meerdere processen verdeeld worden
+PARALLEL_MIN_RIJEN = 20000  # Automatisch parallel vanaf dit aantal rijen; daaronder kost het opstarten meer dan het oplevert
+PARALLEL_CHUNK_RIJEN = 2000  # Rijen per taak voor een worker proces
+
+# Geocoding providers: endpoint, rate limit (requests/seconde), burst, aantal gelijktijdige workers en
+# of het endpoint gestructureerde zoekopdrachten (street/postalcode/city) ondersteunt
+# De publieke Nominatim server staat maximaal 1 request per seconde toe (usage policy)
+NOMINATIM_PUBLIC_URL = "https://nominatim.openstreetmap.org/search"
+GEOCODE_PROVIDERS = {
+    "nominatim": {"url": NOMINATIM_PUBLIC_URL, "rate": 1.0, "burst": 1, "workers": 1, "structured": True},
+    "lokaal": {"url": "http://localhost:8080/search", "rate": 20.0, "burst": 5, "workers": 8, "structured": True},
+}
+# Tijdelijke fouten (HTTP 429/5xx, geen verbinding, timeout) worden opnieuw geprobeerd na GEOCODE_BACKOFF,
+# 2x, 4x ... seconden, of na de Retry-After van de server (hoogstens GEOCODE_BACKOFF_MAX seconden)
+GEOCODE_RETRIES = 2
+GEOCODE_BACKOFF = 1.0
+GEOCODE_BACKOFF_MAX = 60.0
+
+# nearest_employees: medewerkers uit adressen.json, resultaten naar CSV (of JSON)
+adressen_path = 'adressen.json'
+nearest_output_path = 'dichtstbijzijnde_medewerkers.csv'
+MAX_MATRIX_MB = 64  # Maximaal geheugen voor één blok afstanden (queries x medewerkers), incl. tijdelijke matrices
+ROUTING_KANDIDATEN = 20  # Aantal hemelsbreed dichtstbijzijnde medewerkers dat via routing wordt vergeleken
+
+# adrestool.py pc4: per PC4 gebied de k dichtstbijzijnde medewerkers (totaal en per BU) uit een PC4 centroid tabel
+pc4_lookup_path = 'pc4_dichtstbijzijnde.json'
+PC4_LOOKUP_VERSIE = 1
+PC4_K = 5
+
+# adrestool.py geocode: de adressen met gevonden coördinaten
+geocode_output_path = 'gegeocodeerde_adressen.csv'
+
+# Routing backends: OSRM-compatibel /table endpoint (bijv. een lokale osrm-backend container)
+# max_coordinates is het maximum aantal coördinaten per request (osrm-routed --max-table-size, standaard 100)
+ROUTING_BACKENDS = {
+    "osrm": {"url": "http://localhost:5000", "profile": "driving", "max_coordinates": 100, "rate": 0},
+}
+
+# Persistente cache voor reistijden en -afstanden, per backend, profiel en paar afgeronde coördinaten
+route_cache_path = 'route_cache.sqlite'
+ROUTE_CACHE_TTL = 90 * 24 * 3600  # Wegennet verandert weinig: 90 dagen geldig
+ROUTE_AFRONDING = 5  # Decimalen voor coördinaten in cache sleutel en requests (~1 meter)
+
+# nearest_server: HTTP service met de medewerkers in het geheugen (alleen lokaal bereikbaar als standaard)
+SERVER_HOST = '127.0.0.1'
+SERVER_PORT = 8081
+SERVER_RELOAD_INTERVAL = 2.0  # Seconden tussen controles of adressen.json of de geocode cache gewijzigd is
+SERVER_MAX_K = 100  # Maximaal aantal medewerkers per zoekopdracht
+SERVER_MAX_BODY = 1024 * 1024  # Maximale grootte van een POST body in bytes
@@ -0,0 +1,448 @@
+import pandas as pd
+import numpy as np
+import json
+import os
+import sys
+import time
+import argparse
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from excel_to_json import (
+    detect_columns, clean_text_column, float_column, parse_address_column,
+    read_excel_file, open_geocoder, geocode_with_fallback, load_postcode_table, atomic_open, RunReport,
+)
+from routing import open_routing, round_coord
+from instellingen import MAX_MATRIX_MB, ROUTING_KANDIDATEN, PC4_LOOKUP_VERSIE
+
+# Stel encoding in voor Windows console
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+
+AARDSTRAAL_KM = 6371  # Zelfde straal als calculateDistance() in index.html
+
+
+def haversine_matrix(lat1, lon1, lat2, lon2):
+    """Afstand in km tussen elk punt in (lat1, lon1) en elk punt in (lat2, lon2)
+    Zelfde formule als calculateDistance() in index.html, zodat de afstanden overeenkomen.
+    Geeft een matrix van vorm (len(lat1), len(lat2)). Rekent in place met twee matrices (het resultaat
+    en één hulpmatrix) in dezelfde volgorde als haversine(), dus met exact dezelfde afstanden.
+    """
+    lat1 = np.radians(np.asarray(lat1, dtype=np.float64))[:, None]
+    lon1 = np.radians(np.asarray(lon1, dtype=np.float64))[:, None]
+    lat2 = np.radians(np.asarray(lat2, dtype=np.float64))[None, :]
+    lon2 = np.radians(np.asarray(lon2, dtype=np.float64))[None, :]
+    hulp = np.multiply(np.cos(lat1), np.cos(lat2))
+    a = np.subtract(lon2, lon1)
+    a /= 2
+    np.sin(a, out=a)
+    np.square(a, out=a)
+    hulp *= a
+    np.subtract(lat2, lat1, out=a)
+    a /= 2
+    np.sin(a, out=a)
+    np.square(a, out=a)
+    a += hulp
+    np.subtract(1, a, out=hulp)
+    np.sqrt(hulp, out=hulp)
+    np.sqrt(a, out=a)
+    np.arctan2(a, hulp, out=a)
+    a *= 2
+    a *= AARDSTRAAL_KM
+    return a
+
+
+def haversine(lat1, lon1, lat2, lon2):
+    """Afstand in km tussen (lat1, lon1) en (lat2, lon2), elementsgewijs (numpy broadcasting)"""
+    lat1, lon1, lat2, lon2 = np.radians(lat1), np.radians(lon1), np.radians(lat2), np.radians(lon2)
+    d_lat = lat2 - lat1
+    d_lon = lon2 - lon1
+    a = np.sin(d_lat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(d_lon / 2) ** 2
+    c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+    return AARDSTRAAL_KM * c
+
+
+def top_k_nearest(query_lat, query_lon, lat, lon, k, max_matrix_mb=MAX_MATRIX_MB):
+    """Geef per query de indices en afstanden van de k dichtstbijzijnde punten
+    De queries worden in blokken verwerkt zodat de afstandsmatrix samen met de tijdelijke matrix
+    (de hulpmatrix van haversine_matrix of de kopie van np.partition) binnen max_matrix_mb blijft.
+    Bij gelijke afstand wint het punt dat eerder in de lijst staat (deterministische volgorde).
+    Resultaat: lijst met per query een lijst van (index, afstand) paren.
+    """
+    aantal = len(lat)
+    k = min(k, aantal)
+    if k == 0:
+        return [[] for _ in range(len(query_lat))]
+
+    # Twee float64 matrices tegelijk; het blok is in top_k_rijen afgehandeld voordat het volgende begint
+    rijen_per_blok = max(1, int(max_matrix_mb * 1024 * 1024 // (2 * 8 * aantal)))
+    resultaten = []
+    for start in range(0, len(query_lat), rijen_per_blok):
+        resultaten.extend(top_k_rijen(haversine_matrix(query_lat[start:start + rijen_per_blok],
+                                                       query_lon[start:start + rijen_per_blok], lat, lon), k))
+    return resultaten
+
+
+def top_k_rijen(afstanden, k):
+    """Per rij van een afstandsmatrix de k kleinste als (index, afstand) paren, zie top_k_nearest"""
+    if k < afstanden.shape[1]:
+        # argpartition kiest bij gelijke afstanden willekeurig; neem daarom alle kandidaten t/m de k-de afstand
+        grens = np.partition(afstanden, k - 1, axis=1)[:, k - 1]
+    else:
+        grens = afstanden.max(axis=1)
+    resultaten = []
+    for rij, maximum in zip(afstanden, grens):
+        kandidaten = np.flatnonzero(rij <= maximum)
+        volgorde = np.lexsort((kandidaten, rij[kandidaten]))[:k]
+        resultaten.append([(int(kandidaten[i]), float(rij[kandidaten[i]])) for i in volgorde])
+    return resultaten
+
+
+def eenheidsvectoren(lat, lon):
+    """Punten op de bol als (n, 3) array van eenheidsvectoren"""
+    lat = np.radians(np.asarray(lat, dtype=np.float64))
+    lon = np.radians(np.asarray(lon, dtype=np.float64))
+    return np.column_stack((np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)))
+
+
+def top_k_batch(query_lat, query_lon, lat, lon, k, max_matrix_mb=MAX_MATRIX_MB):
+    """Zelfde resultaat als top_k_nearest, maar als arrays en zonder lus over de queries
+    De hemelsbrede afstand neemt af naarmate het inproduct van de eenheidsvectoren groter is, dus één
+    matrixvermenigvuldiging per blok geeft per query 2k kandidaten; alleen daarvoor wordt de haversine
+    afstand berekend. Queries waarbij een punt buiten de kandidaten even ver kan zijn als de k-de
+    (bijv. veel collega's op één adres) worden alsnog met top_k_nearest bepaald.
+    Geeft (indices, afstanden), beide van vorm (len(query_lat), min(k, len(lat))).
+    """
+    query_lat = np.asarray(query_lat, dtype=np.float64)
+    query_lon = np.asarray(query_lon, dtype=np.float64)
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    aantal = len(lat)
+    k = min(k, aantal)
+    indices = np.zeros((len(query_lat), k), dtype=np.int64)
+    afstanden = np.zeros((len(query_lat), k), dtype=np.float64)
+    if k == 0:
+        return indices, afstanden
+
+    m = min(2 * k, aantal)
+    punten = eenheidsvectoren(lat, lon).T
+    queries = eenheidsvectoren(query_lat, query_lon)
+    # Inproduct (float64) en de indices van argpartition (int64) samen binnen max_matrix_mb
+    rijen_per_blok = max(1, int(max_matrix_mb * 1024 * 1024 // (16 * aantal)))
+    twijfel = []
+    for start in range(0, len(query_lat), rijen_per_blok):
+        blok = slice(start, start + rijen_per_blok)
+        inproduct = queries[blok] @ punten
+        if m < aantal:
+            kandidaten = np.argpartition(inproduct, aantal - m, axis=1)[:, aantal - m:]
+        else:
+            kandidaten = np.broadcast_to(np.arange(aantal), inproduct.shape)
+        afstand = haversine(query_lat[blok, None], query_lon[blok, None], lat[kandidaten], lon[kandidaten])
+        # Op afstand en bij gelijke afstand op index, zoals top_k_nearest
+        volgorde = np.lexsort((kandidaten, afstand), axis=1)
+        kandidaten = np.take_along_axis(kandidaten, volgorde, axis=1)
+        afstand = np.take_along_axis(afstand, volgorde, axis=1)
+        indices[blok] = kandidaten[:, :k]
+        afstanden[blok] = afstand[:, :k]
+        if m < aantal:
+            # Punten buiten de kandidaten zijn minstens zo ver als de verste kandidaat (op afrondingen na)
+            twijfel.extend(start + np.flatnonzero(afstand[:, m - 1] - afstand[:, k - 1] < 1e-6))
+
+    if twijfel:
+        twijfel = np.array(twijfel)
+        for i, paren in zip(twijfel, top_k_nearest(query_lat[twijfel], query_lon[twijfel], lat, lon, k,
+                                                   max_matrix_mb)):
+            indices[i] = [j for j, _ in paren]
+            afstanden[i] = [afstand for _, afstand in paren]
+    return indices, afstanden
+
+
+def load_medewerkers(path):
+    """Lees adressen.json en geef de medewerkers met coördinaten terug"""
+    with open(path, 'r', encoding='utf-8') as f:
+        adressen = json.load(f)
+    return [a for a in adressen if a.get('latitude') is not None and a.get('longitude') is not None]
+
+
+def read_queries(path):
+    """Lees de zoekadressen (CSV of Excel) en geef een DataFrame met naam/straat/huisnummer/postcode/plaats/lat/lon"""
+    if path.lower().endswith('.csv'):
+        df = pd.read_csv(path, dtype=object, sep=None, engine='python')
+    else:
+        df = read_excel_file(path)
+
+    kolommen = detect_columns(df)
+    leeg = [None] * len(df)
+
+    def tekst(kolom):
+        return clean_text_column(df[kolom]) if kolom else leeg
+
+    # Zelfde regels als AdresConverter: het volledige adres wordt geparsed, aparte kolommen gaan voor
+    volledig_col = kolommen["volledig_adres"]
+    straat_col = kolommen["straat"] if kolommen["straat"] != volledig_col else None
+    geparsed = parse_address_column(df[volledig_col]) if volledig_col else (leeg, leeg, leeg, leeg)
+    aparte = (tekst(straat_col), tekst(kolommen["huisnummer"]), tekst(kolommen["postcode"]), tekst(kolommen["plaats"]))
+
+    queries = pd.DataFrame(index=df.index)
+    queries["naam"] = [w or "" for w in tekst(kolommen["naam"])]
+    for veld, apart, uit_adres in zip(("straat", "huisnummer", "postcode", "plaats"), aparte, geparsed):
+        queries[veld] = [a if a is not None else (g or "") for a, g in zip(apart, uit_adres)]
+
+    queries["lat"] = float_column(df[kolommen["lat"]]) if kolommen["lat"] else np.nan
+    queries["lon"] = float_column(df[kolommen["lng"]]) if kolommen["lng"] else np.nan
+    return queries
+
+
+def geocode_queries(queries, engine):
+    """Vul ontbrekende coördinaten via geocode_with_fallback() met engine (een GeocodeEngine, zie open_geocoder)
+    Zelfde zoekopdrachten en fallbacks als excel_to_json.py; engine.workers adressen tegelijk.
+    """
+    te_geocoden = [idx for idx in queries.index
+                   if pd.isna(queries.at[idx, "lat"]) or pd.isna(queries.at[idx, "lon"])]
+    if not te_geocoden:
+        return
+    print(f"\n[INFO] Geocoding van {len(te_geocoden)} zoekadressen...")
+
+    adressen = queries.loc[te_geocoden, ["straat", "huisnummer", "postcode", "plaats"]].to_dict('index')
+
+    def geocode_rij(idx):
+        rij = adressen[idx]
+        if not (rij["straat"] or rij["postcode"] or rij["plaats"]):
+            return idx, None, None
+        return (idx,) + tuple(geocode_with_fallback(rij["straat"], rij["huisnummer"], rij["postcode"], rij["plaats"],
+                                                    engine))
+
+    with ThreadPoolExecutor(max_workers=engine.workers) as executor:
+        for idx, lat, lon in executor.map(geocode_rij, te_geocoden):
+            if lat and lon:
+                queries.at[idx, "lat"] = lat
+                queries.at[idx, "lon"] = lon
+            else:
+                print(f"   [FOUT] Geen coördinaten gevonden voor rij {idx + 2}")
+
+
+def nearest_employees(queries, medewerkers, k, per_bu=False, max_matrix_mb=MAX_MATRIX_MB, routing=None,
+                      kandidaten=ROUTING_KANDIDATEN):
+    """Bepaal per zoekadres de k dichtstbijzijnde medewerkers (optioneel per BU)
+    Met een RoutingEngine worden de `kandidaten` dichtstbijzijnde medewerkers (hemelsbreed) opnieuw
+    gerangschikt op reistijd, en komen reistijd en rijafstand in de output.
+    Geeft een lijst met één dict per (zoekadres, medewerker) combinatie.
+    """
+    if per_bu:
+        groepen = {}
+        for i, m in enumerate(medewerkers):
+            groepen.setdefault(m.get('bu') or "", []).append(i)
+        groepen = sorted(groepen.items())
+    else:
+        groepen = [(None, list(range(len(medewerkers))))]
+
+    met_coordinaten = queries.dropna(subset=["lat", "lon"])
+    query_lat = met_coordinaten["lat"].to_numpy(dtype=np.float64)
+    query_lon = met_coordinaten["lon"].to_numpy(dtype=np.float64)
+
+    # Per zoekadres: lijst van (bu, [(medewerker index, afstand), ...]) in volgorde van afstand
+    resultaten = {idx: [] for idx in met_coordinaten.index}
+    aantal = max(k, kandidaten) if routing is not None else k
+    for bu, indices in groepen:
+        lat = np.array([medewerkers[i]['latitude'] for i in indices], dtype=np.float64)
+        lon = np.array([medewerkers[i]['longitude'] for i in indices], dtype=np.float64)
+        top = top_k_nearest(query_lat, query_lon, lat, lon, aantal, max_matrix_mb)
+        for idx, paren in zip(met_coordinaten.index, top):
+            resultaten[idx].append((bu, [(indices[j], afstand) for j, afstand in paren]))
+
+    routes = {}
+    if routing is not None:
+        # Eén set paren voor alle zoekadressen, zodat de RoutingEngine ze in zo min mogelijk requests opvraagt
+        bronnen = {idx: round_coord(lat, lon) for idx, lat, lon in zip(met_coordinaten.index, query_lat, query_lon)}
+        doelen = [round_coord(m['latitude'], m['longitude']) for m in medewerkers]
+        routes = routing.route_pairs({(bronnen[idx], doelen[i])
+                                      for idx, groep in resultaten.items() for _, paren in groep for i, _ in paren})
+        for idx, groep in resultaten.items():
+            for pos, (bu, paren) in enumerate(groep):
+                # Onbereikbare medewerkers achteraan; bij gelijke reistijd blijft de hemelsbrede volgorde
+                duur = [routes[(bronnen[idx], doelen[i])][0] for i, _ in paren]
+                volgorde = sorted(range(len(paren)), key=lambda n: (duur[n] is None, duur[n] or 0, n))
+                groep[pos] = (bu, [paren[n] + routes[(bronnen[idx], doelen[paren[n][0]])] for n in volgorde[:k]])
+
+    rijen = []
+    for idx, rij in queries.iterrows():
+        basis = {
+            "query": rij["naam"] or f"rij {idx + 2}",
+            "query_adres": " ".join(str(rij[v]) for v in ("straat", "huisnummer", "postcode", "plaats") if rij[v]),
+            "query_lat": None if pd.isna(rij["lat"]) else float(rij["lat"]),
+            "query_lon": None if pd.isna(rij["lon"]) else float(rij["lon"]),
+        }
+        for bu, paren in resultaten.get(idx, []):
+            for rang, paar in enumerate(paren, 1):
+                m = medewerkers[paar[0]]
+                regel = dict(basis)
+                if per_bu:
+                    regel["groep_bu"] = bu
+                regel.update({
+                    "rang": rang,
+                    "id": m.get('id'),
+                    "naam": m.get('naam'),
+                    "bu": m.get('bu', ''),
+                    "plaats": m.get('plaats', ''),
+                    "afstand_km": round(paar[1], 2),  # Zelfde afronding als de tabel in index.html
+                })
+                if routing is not None:
+                    duur, rijafstand = paar[2], paar[3]
+                    regel["reistijd_min"] = round(duur / 60, 1) if duur is not None else None
+                    regel["rijafstand_km"] = round(rijafstand / 1000, 2) if rijafstand is not None else None
+                rijen.append(regel)
+        if idx not in resultaten:
+            rijen.append(dict(basis, rang=None))
+    return rijen
+
+
+def pc4_centroiden(postcode_index):
+    """PC4 codes (gesorteerd) met lat/lon arrays uit een postcode tabel (zie load_postcode_table)
+    PC4 gebieden die alleen als PC6 postcodes in de tabel staan krijgen het gemiddelde daarvan.
+    """
+    som = defaultdict(lambda: [0.0, 0.0, 0])
+    for pc, (lat, lon) in postcode_index.items():
+        if len(pc) == 6:
+            totaal = som[pc[:4]]
+            totaal[0] += lat
+            totaal[1] += lon
+            totaal[2] += 1
+    pc4 = {pc: (lat / n, lon / n) for pc, (lat, lon, n) in som.items()}
+    pc4.update((pc, coord) for pc, coord in postcode_index.items() if len(pc) == 4)
+    codes = sorted(pc4)
+    lat = np.array([pc4[pc][0] for pc in codes], dtype=np.float64)
+    lon = np.array([pc4[pc][1] for pc in codes], dtype=np.float64)
+    return codes, lat, lon
+
+
+def pc4_lookup(codes, pc4_lat, pc4_lon, medewerkers, k, max_matrix_mb=MAX_MATRIX_MB):
+    """Per PC4 gebied de k dichtstbijzijnde medewerkers, voor alle medewerkers en per BU
+    Geeft {"medewerkers": [...], "alle": {pc4: [[index, afstand km], ...]}, "perBu": {bu: {pc4: [...]}}},
+    met de index in de (ingekorte) lijst medewerkers en de afstand afgerond zoals de tabel in index.html.
+    """
+    groepen = {}
+    for i, m in enumerate(medewerkers):
+        groepen.setdefault(m.get('bu') or "", []).append(i)
+    lat = np.array([m['latitude'] for m in medewerkers], dtype=np.float64)
+    lon = np.array([m['longitude'] for m in medewerkers], dtype=np.float64)
+
+    def per_pc4(indices):
+        top, afstanden = top_k_batch(pc4_lat, pc4_lon, lat[indices], lon[indices], k, max_matrix_mb)
+        return np.asarray(indices)[top], np.round(afstanden, 2)
+
+    lagen = {None: per_pc4(np.arange(len(medewerkers)))}
+    lagen.update((bu, per_pc4(indices)) for bu, indices in sorted(groepen.items()))
+
+    # Alleen medewerkers die ergens in de top k staan komen in de tabel; index opnieuw nummeren
+    gebruikt = np.unique(np.concatenate([top.ravel() for top, _ in lagen.values()]))
+    nieuwe_index = np.zeros(len(medewerkers), dtype=np.int64)
+    nieuwe_index[gebruikt] = np.arange(len(gebruikt))
+
+    def als_dict(top, afstanden):
+        paren = np.stack((nieuwe_index[top], afstanden), axis=2).tolist()
+        return {pc: [[int(i), afstand] for i, afstand in rij] for pc, rij in zip(codes, paren)}
+
+    return {
+        "medewerkers": [medewerkers[i] for i in gebruikt.tolist()],
+        "alle": als_dict(*lagen.pop(None)),
+        "perBu": {bu: als_dict(*laag) for bu, laag in lagen.items()},
+    }
+
+
+def run_pc4(args):
+    """Bouw de PC4 -> dichtstbijzijnde medewerkers tabel met de opties uit add_pc4_arguments()"""
+    print("=" * 60)
+    print("PC4 -> dichtstbijzijnde medewerkers")
+    print("=" * 60)
+    rapport = RunReport()
+
+    rapport.start("pc4_tabel")
+    codes, pc4_lat, pc4_lon = pc4_centroiden(load_postcode_table(args.postcode_table))
+    rapport.stop("pc4_tabel", gebieden=len(codes))
+    if not codes:
+        print(f"[FOUT] Geen postcodes gevonden in {args.postcode_table}")
+        return 1
+
+    rapport.start("medewerkers")
+    medewerkers = load_medewerkers(args.adressen)
+    rapport.stop("medewerkers", medewerkers=len(medewerkers))
+    print(f"[INFO] {len(codes)} PC4 gebieden, {len(medewerkers)} medewerkers met coördinaten in {args.adressen}")
+
+    rapport.start("top_k")
+    tabel = pc4_lookup(codes, pc4_lat, pc4_lon, medewerkers, args.k, args.max_matrix_mb)
+    rapport.stop("top_k", bu_s=len(tabel["perBu"]))
+
+    rapport.start("schrijven")
+    uitvoer = {
+        "versie": PC4_LOOKUP_VERSIE,
+        "bron": os.path.basename(args.adressen),
+        "postcodeTabel": os.path.basename(args.postcode_table),
+        "k": args.k,
+        "medewerkers": [{veld: m.get(veld) for veld in ("id", "naam", "bu", "plaats")} for m in tabel["medewerkers"]],
+        "alle": tabel["alle"],
+        "perBu": tabel["perBu"],
+    }
+    with atomic_open(args.output) as f:
+        f.write(json.dumps(uitvoer, ensure_ascii=False, separators=(',', ':')))
+    grootte = os.path.getsize(args.output)
+    rapport.stop("schrijven", bytes=grootte)
+
+    rapport.print_summary()
+    print(f"\n[OK] {args.output} aangemaakt: {len(codes)} PC4 gebieden x {len(tabel['perBu']) + 1} lagen, "
+          f"{grootte / 1024:.0f} KB in {time.perf_counter() - rapport.t0:.2f}s")
+
+
+def main(argv=None):
+    """Zoek voor een lijst met adressen de dichtstbijzijnde medewerkers (command line, zelfde opties als adrestool.py match)"""
+    from adrestool import add_match_arguments
+    parser = argparse.ArgumentParser(description="Bepaal de k dichtstbijzijnde medewerkers voor een lijst met adressen")
+    add_match_arguments(parser)
+    return run(parser.parse_args(argv))
+
+
+def run(args):
+    """Voer de zoekopdracht uit met de opties uit add_match_arguments()"""
+    print("=" * 60)
+    print("Dichtstbijzijnde medewerkers")
+    print("=" * 60)
+
+    medewerkers = load_medewerkers(args.adressen)
+    print(f"[INFO] {len(medewerkers)} medewerkers met coördinaten in {args.adressen}")
+
+    queries = read_queries(args.queries)
+    print(f"[INFO] {len(queries)} zoekadressen gelezen uit {args.queries}")
+
+    if queries["lat"].isna().any() or queries["lon"].isna().any():
+        geocoder = open_geocoder(args.geocoder, args.geocode_url, args.geocode_rate, args.geocode_workers)
+        geocode_queries(queries, geocoder)
+        geocoder.print_stats()
+        geocoder.close()
+
+    routing = None
+    if args.routing or args.routing_url:
+        routing = open_routing(args.routing or 'osrm', args.routing_url, args.routing_profile, args.routing_rate)
+
+    rijen = nearest_employees(queries, medewerkers, args.k, per_bu=args.per_bu, max_matrix_mb=args.max_matrix_mb,
+                              routing=routing, kandidaten=args.routing_candidates)
+
+    if routing is not None:
+        routing.print_stats()
+        routing.close()
+
+    if os.path.splitext(args.output)[1].lower() == '.json':
+        with atomic_open(args.output) as f:
+            json.dump(rijen, f, indent=2, ensure_ascii=False)
+    else:
+        uitvoer = pd.DataFrame(rijen)
+        uitvoer["rang"] = uitvoer["rang"].astype("Int64")  # Geen 1.0 door lege rang bij adressen zonder coördinaten
+        with atomic_open(args.output, encoding='utf-8-sig', newline='') as f:
+            uitvoer.to_csv(f, index=False)
+
+    zonder = int(queries[["lat", "lon"]].isna().any(axis=1).sum())
+    print(f"\n[OK] Resultaten opgeslagen in {args.output} ({len(rijen)} regels)")
+    if zonder:
+        print(f"[WAARSCHUWING] {zonder} zoekadres(sen) zonder coördinaten, geen afstanden berekend")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
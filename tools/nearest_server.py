@@ -0,0 +1,385 @@
+import numpy as np
+import asyncio
+import json
+import math
+import os
+import sqlite3
+import sys
+import argparse
+from datetime import datetime
+from urllib.parse import urlsplit, parse_qs
+
+from excel_to_json import normalize_geocode_query, geocode_query_tekst, plan_geocode_queries
+from nearest_employees import AARDSTRAAL_KM, haversine_matrix, load_medewerkers
+from instellingen import SERVER_MAX_K, SERVER_MAX_BODY
+
+GRID_MIN_PUNTEN = 2000  # Bij minder punten (bijv. een kleine BU) is alle afstanden berekenen sneller dan het grid
+GRID_MAX_RINGEN = 12  # Na zoveel ringen zonder resultaat alle punten bekijken
+
+# Stel encoding in voor Windows console
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+
+
+class GridIndex:
+    """Grid over een set punten (zelfde celindeling als write_spatial_index) voor k-dichtstbijzijnde zoekopdrachten
+    Bekijkt de cellen in ringen rond het zoekpunt tot de k-de afstand kleiner is dan de kleinst mogelijke
+    afstand tot een nog niet bekeken cel. Geeft dezelfde afstanden en volgorde als top_k_nearest
+    (bij gelijke afstand wint de laagste positie).
+    """
+
+    def __init__(self, lat, lon, posities, cel_grootte):
+        self.lat = np.asarray(lat, dtype=np.float64)
+        self.lon = np.asarray(lon, dtype=np.float64)
+        self.posities = np.asarray(posities, dtype=np.int64)  # Positie in de medewerker lijst (voor gelijke afstanden)
+        self.cel_grootte = cel_grootte
+        self.cellen = {}
+        if len(self.lat) == 0:
+            self.rijen = self.kolommen = 0
+            return
+        self.lat0 = float(np.floor(self.lat.min() / cel_grootte) * cel_grootte)
+        self.lon0 = float(np.floor(self.lon.min() / cel_grootte) * cel_grootte)
+        # Door afronding kan een punt op de rand van de oorsprong in rij/kolom -1 vallen: begin de telling bij het minimum
+        rij = np.floor((self.lat - self.lat0) / cel_grootte).astype(np.int64)
+        kolom = np.floor((self.lon - self.lon0) / cel_grootte).astype(np.int64)
+        self.rij0, self.kolom0 = int(rij.min()), int(kolom.min())
+        rij -= self.rij0
+        kolom -= self.kolom0
+        self.rijen = int(rij.max()) + 1
+        self.kolommen = int(kolom.max()) + 1
+        for i, cel in enumerate(zip(rij.tolist(), kolom.tolist())):
+            self.cellen.setdefault(cel, []).append(i)
+        self.cellen = {cel: np.array(punten, dtype=np.int64) for cel, punten in self.cellen.items()}
+
+    def __len__(self):
+        return len(self.lat)
+
+    def _ring(self, rij, kolom, r):
+        """Punten in de cellen op precies r cellen afstand (Chebyshev) van cel (rij, kolom)"""
+        punten = []
+        for rr in range(max(rij - r, 0), min(rij + r, self.rijen - 1) + 1):
+            if abs(rr - rij) == r:
+                kolommen = range(max(kolom - r, 0), min(kolom + r, self.kolommen - 1) + 1)
+            else:
+                kolommen = [k for k in (kolom - r, kolom + r) if 0 <= k < self.kolommen]
+            for kk in kolommen:
+                cel = self.cellen.get((rr, kk))
+                if cel is not None:
+                    punten.append(cel)
+        return punten
+
+    def _ondergrens(self, lat, r):
+        """Kleinst mogelijke afstand (km) tot een punt buiten de ringen 0..r rond het zoekpunt"""
+        stap = math.radians(r * self.cel_grootte)
+        # Buiten de bekeken rijen: minstens r cellen breedtegraad verschil
+        via_breedte = AARDSTRAAL_KM * stap
+        # Binnen de bekeken rijen maar buiten de kolommen: minstens r cellen lengtegraad verschil,
+        # bij een breedtegraad van hoogstens |lat| + (r + 1) cellen
+        hoogste = math.radians(min(90.0, abs(lat) + (r + 1) * self.cel_grootte))
+        via_lengte = 2 * AARDSTRAAL_KM * math.asin(min(1.0, math.cos(hoogste) * math.sin(min(stap, math.pi) / 2)))
+        return min(via_breedte, via_lengte)
+
+    def nearest(self, lat, lon, k):
+        """Geef de k dichtstbijzijnde punten als lijst van (positie, afstand in km)"""
+        k = min(k, len(self))
+        if k <= 0:
+            return []
+        if len(self) <= GRID_MIN_PUNTEN:
+            return self._alle(lat, lon, k)
+        rij = math.floor((lat - self.lat0) / self.cel_grootte) - self.rij0
+        kolom = math.floor((lon - self.lon0) / self.cel_grootte) - self.kolom0
+        # Ringen die helemaal buiten het grid vallen overslaan; na r_max zijn alle cellen bekeken
+        r = max(0, -rij, rij - (self.rijen - 1), -kolom, kolom - (self.kolommen - 1))
+        r_max = max(abs(rij), abs(rij - (self.rijen - 1)), abs(kolom), abs(kolom - (self.kolommen - 1)))
+
+        r_start = r
+        kandidaten = np.zeros(0, dtype=np.int64)
+        afstanden = np.zeros(0, dtype=np.float64)
+        while True:
+            if r - r_start >= GRID_MAX_RINGEN:
+                # Zoekpunt ver van de medewerkers (of k groot): alle punten bekijken is dan sneller
+                return self._alle(lat, lon, k)
+            nieuw = self._ring(rij, kolom, r)
+            if nieuw:
+                nieuw = np.concatenate(nieuw)
+                kandidaten = np.concatenate([kandidaten, nieuw])
+                afstanden = np.concatenate([afstanden, haversine_matrix([lat], [lon], self.lat[nieuw], self.lon[nieuw])[0]])
+            if r >= r_max:
+                break
+            if len(kandidaten) >= k and np.partition(afstanden, k - 1)[k - 1] < self._ondergrens(lat, r):
+                break
+            r += 1
+
+        return self._sorteer(kandidaten, afstanden, k)
+
+    def _alle(self, lat, lon, k):
+        """Zonder grid: afstand tot alle punten"""
+        return self._sorteer(np.arange(len(self)), haversine_matrix([lat], [lon], self.lat, self.lon)[0], k)
+
+    def _sorteer(self, kandidaten, afstanden, k):
+        posities = self.posities[kandidaten]
+        volgorde = np.lexsort((posities, afstanden))[:k]
+        return [(int(posities[i]), float(afstanden[i])) for i in volgorde]
+
+
+def load_geocode_cache(path):
+    """Lees de gevonden coördinaten uit de geocode cache (SQLite) in een dict: query -> (lat, lon)"""
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        rijen = conn.execute("SELECT query, lat, lon FROM geocode WHERE lat IS NOT NULL AND lon IS NOT NULL").fetchall()
+    finally:
+        conn.close()
+    return {query: (lat, lon) for query, lat, lon in rijen}
+
+
+class IndexSnapshot:
+    """De medewerkers en grid indexes (totaal en per BU) van één versie van adressen.json"""
+
+    def __init__(self, medewerkers, cel_grootte, versie, geocode_cache=None):
+        self.medewerkers = medewerkers
+        self.versie = versie
+        self.geladen = datetime.now().isoformat(timespec='seconds')
+        self.geocode_cache = geocode_cache or {}
+        lat = [m['latitude'] for m in medewerkers]
+        lon = [m['longitude'] for m in medewerkers]
+        self.totaal = GridIndex(lat, lon, range(len(medewerkers)), cel_grootte)
+        per_bu = {}
+        for i, m in enumerate(medewerkers):
+            per_bu.setdefault(m.get('bu') or "", []).append(i)
+        self.per_bu = {bu: GridIndex([lat[i] for i in posities], [lon[i] for i in posities], posities, cel_grootte)
+                       for bu, posities in sorted(per_bu.items())}
+
+
+def json_body(data):
+    """JSON body van een antwoord; NaN/Infinity zijn geen geldige JSON en geven een ValueError"""
+    return json.dumps(data, ensure_ascii=False, allow_nan=False).encode('utf-8')
+
+
+class NearestService:
+    """Beantwoordt k-dichtstbijzijnde zoekopdrachten over HTTP met een index in het geheugen
+    De index wordt opnieuw opgebouwd (in een thread) als adressen.json of de geocode cache wijzigt;
+    lopende zoekopdrachten gebruiken tot dan de vorige versie.
+    """
+
+    def __init__(self, adressen_path, cel_grootte, geocode_cache_path=None, reload_interval=2.0):
+        self.adressen_path = adressen_path
+        self.cel_grootte = cel_grootte
+        self.geocode_cache_path = geocode_cache_path
+        self.reload_interval = reload_interval
+        self.verzoeken = 0
+        self.index = self.laad()
+
+    def versie(self):
+        """mtime en grootte van de bronbestanden; een wijziging hierin betekent opnieuw laden"""
+        paden = [self.adressen_path] + ([self.geocode_cache_path] if self.geocode_cache_path else [])
+        versie = []
+        for pad in paden:
+            try:
+                stat = os.stat(pad)
+                versie.append((stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                versie.append(None)
+        return tuple(versie)
+
+    def laad(self):
+        versie = self.versie()
+        medewerkers = load_medewerkers(self.adressen_path)
+        geocode_cache = None
+        if self.geocode_cache_path and os.path.exists(self.geocode_cache_path):
+            try:
+                geocode_cache = load_geocode_cache(self.geocode_cache_path)
+            except sqlite3.Error as e:
+                print(f"[WAARSCHUWING] Kon geocode cache niet lezen, zoeken op adres niet mogelijk: {e}")
+        index = IndexSnapshot(medewerkers, self.cel_grootte, versie, geocode_cache)
+        print(f"[OK] {len(medewerkers)} medewerkers met coördinaten geladen uit {self.adressen_path} "
+              f"({len(index.per_bu)} BU's, {len(index.geocode_cache)} adressen in geocode cache)")
+        return index
+
+    async def bewaak_bestanden(self):
+        """Laad de index opnieuw zodra adressen.json of de geocode cache verandert"""
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.reload_interval)
+            if self.versie() == self.index.versie:
+                continue
+            try:
+                self.index = await loop.run_in_executor(None, self.laad)
+            except (OSError, ValueError) as e:
+                # Bijv. een half geschreven bestand: houd de vorige index en probeer het bij de volgende wijziging opnieuw
+                print(f"[WAARSCHUWING] Opnieuw laden mislukt, vorige versie blijft actief: {e}")
+                self.index.versie = self.versie()
+
+    def coordinaten(self, index, query):
+        """Coördinaten van een zoekopdracht: lat/lon, of een adres dat in de geocode cache staat"""
+        if query.get("lat") not in (None, "") and query.get("lon") not in (None, ""):
+            try:
+                lat, lon = float(query["lat"]), float(query["lon"])
+            except (TypeError, ValueError):
+                raise ValueError("lat en lon moeten getallen zijn")
+            # Ook inf/nan weigeren: die geven geen geldige afstanden (en geen geldige JSON)
+            if not (math.isfinite(lat) and math.isfinite(lon) and -90 <= lat <= 90 and -180 <= lon <= 180):
+                raise ValueError("lat moet tussen -90 en 90 liggen en lon tussen -180 en 180")
+            return lat, lon
+        velden = [query.get(veld) or "" for veld in ("straat", "huisnummer", "postcode", "plaats")]
+        if not any(velden):
+            raise ValueError("geef lat en lon, of een adres (straat, huisnummer, postcode, plaats)")
+        for _, stap in plan_geocode_queries(*velden):
+            # Zelfde sleutels als GeocodeEngine: gestructureerd, of als vrije tekst bij een endpoint zonder
+            for tekst in (geocode_query_tekst(stap), ", ".join(list(stap.values()) + ["Nederland"])):
+                gevonden = index.geocode_cache.get(normalize_geocode_query(tekst))
+                if gevonden:
+                    return gevonden
+        raise LookupError("adres niet gevonden in de geocode cache")
+
+    def zoek(self, query, k=5, per_bu=False):
+        """Beantwoord één zoekopdracht (dict met lat/lon of adresvelden, optioneel bu)"""
+        index = self.index
+        k = int(query.get("k", k))
+        if not 1 <= k <= SERVER_MAX_K:
+            raise ValueError(f"k moet tussen 1 en {SERVER_MAX_K} liggen")
+        lat, lon = self.coordinaten(index, query)
+
+        def regels(paren):
+            return [{
+                "rang": rang,
+                "id": index.medewerkers[positie].get('id'),
+                "naam": index.medewerkers[positie].get('naam'),
+                "bu": index.medewerkers[positie].get('bu', ''),
+                "plaats": index.medewerkers[positie].get('plaats', ''),
+                "afstand_km": round(afstand, 2),  # Zelfde afronding als de tabel in index.html
+            } for rang, (positie, afstand) in enumerate(paren, 1)]
+
+        antwoord = {"lat": lat, "lon": lon}
+        bu = query.get("bu")
+        if bu is not None:
+            if bu not in index.per_bu:
+                raise LookupError(f"onbekende BU: {bu}")
+            antwoord["resultaten"] = regels(index.per_bu[bu].nearest(lat, lon, k))
+        elif per_bu:
+            antwoord["per_bu"] = {naam: regels(grid.nearest(lat, lon, k)) for naam, grid in index.per_bu.items()}
+        else:
+            antwoord["resultaten"] = regels(index.totaal.nearest(lat, lon, k))
+        return antwoord
+
+    def verwerk(self, methode, doel, body):
+        """Geef (status, JSON data) voor een HTTP request"""
+        url = urlsplit(doel)
+        params = {naam: waarden[-1] for naam, waarden in parse_qs(url.query).items()}
+        per_bu = params.pop("per_bu", "").lower() in ("1", "true", "ja")
+        try:
+            if url.path == "/health" and methode == "GET":
+                index = self.index
+                return 200, {"status": "ok", "medewerkers": len(index.medewerkers), "bus": len(index.per_bu),
+                             "geladen": index.geladen, "bron": self.adressen_path, "verzoeken": self.verzoeken}
+            if url.path == "/nearest" and methode == "GET":
+                return 200, self.zoek(params, per_bu=per_bu)
+            if url.path == "/nearest" and methode == "POST":
+                # Meerdere zoekopdrachten in één request: {"queries": [...], "k": 5, "per_bu": false}
+                data = json.loads(body or b"{}")
+                if not isinstance(data, dict) or not isinstance(data.get("queries"), list):
+                    raise ValueError('verwacht JSON met "queries": [...]')
+                k = data.get("k", 5)
+                per_bu = bool(data.get("per_bu", per_bu))
+                resultaten = []
+                for query in data["queries"]:
+                    try:
+                        resultaten.append(self.zoek(dict(query), k=k, per_bu=per_bu))
+                    except (ValueError, LookupError, TypeError) as e:
+                        resultaten.append({"fout": str(e)})
+                return 200, {"resultaten": resultaten}
+            return 404, {"fout": f"onbekend pad: {methode} {url.path}"}
+        except LookupError as e:
+            return 404, {"fout": str(e)}
+        except (ValueError, TypeError) as e:
+            return 400, {"fout": str(e)}
+
+    def antwoord(self, methode, doel, body):
+        """(status, JSON body) voor een HTTP request; draait in een thread, buiten de event loop"""
+        try:
+            status, data = self.verwerk(methode, doel, body)
+            return status, json_body(data)
+        except Exception as e:
+            # Onverwachte fout bij één request: antwoord met 500 in plaats van de verbinding te sluiten
+            print(f"[FOUT] {methode} {doel}: {type(e).__name__}: {e}")
+            return 500, json_body({"fout": "interne fout"})
+
+    async def handle(self, reader, writer):
+        """Eén HTTP/1.1 verbinding (met keep-alive)
+        Zoeken en JSON maken gebeurt in de thread pool van de loop (zoals het herladen van de index), zodat
+        een grote POST /nearest de andere verbindingen niet ophoudt.
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                regel = await reader.readline()
+                if not regel.strip():
+                    break
+                delen = regel.decode('latin-1').split()
+                if len(delen) != 3:
+                    break
+                methode, doel, http_versie = delen
+                headers = {}
+                while True:
+                    header = await reader.readline()
+                    if header in (b"\r\n", b"\n", b""):
+                        break
+                    naam, _, waarde = header.decode('latin-1').partition(":")
+                    headers[naam.strip().lower()] = waarde.strip()
+                lengte = int(headers.get("content-length") or 0)
+                if lengte > SERVER_MAX_BODY:
+                    status, payload = 413, json_body({"fout": "request te groot"})
+                    keep_alive = False
+                else:
+                    body = await reader.readexactly(lengte) if lengte else b""
+                    self.verzoeken += 1
+                    keep_alive = http_versie == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                    status, payload = await loop.run_in_executor(None, self.antwoord, methode.upper(), doel, body)
+                writer.write(
+                    f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}\r\n"
+                    f"Content-Type: application/json; charset=utf-8\r\n"
+                    f"Content-Length: {len(payload)}\r\n"
+                    f"Access-Control-Allow-Origin: *\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode('latin-1') + payload
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host, port):
+        server = await asyncio.start_server(self.handle, host, port)
+        print(f"[OK] Luistert op http://{host}:{port} (GET /nearest?lat=..&lon=..&k=5, POST /nearest, GET /health)")
+        bewaker = asyncio.create_task(self.bewaak_bestanden())
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            bewaker.cancel()
+
+
+def run(args):
+    """Start de service met de opties uit add_serve_arguments()"""
+    print("=" * 60)
+    print("Dichtstbijzijnde medewerkers service")
+    print("=" * 60)
+    service = NearestService(args.adressen, args.grid_cell_size, None if args.no_geocode_cache else args.geocode_cache,
+                             args.reload_interval)
+    try:
+        asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        print("\n[INFO] Gestopt")
+
+
+def main(argv=None):
+    """Start de service (command line, zelfde opties als adrestool.py serve)"""
+    from adrestool import add_serve_arguments
+    parser = argparse.ArgumentParser(description="HTTP service voor de dichtstbijzijnde medewerkers (index in het geheugen)")
+    add_serve_arguments(parser)
+    return run(parser.parse_args(argv))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
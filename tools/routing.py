@@ -0,0 +1,200 @@
+import sqlite3
+import threading
+import time
+
+from excel_to_json import TokenBucket
+
+# Bestanden en instellingen (module globals, zie instellingen.py)
+from instellingen import ROUTING_BACKENDS, route_cache_path, ROUTE_CACHE_TTL, ROUTE_AFRONDING
+
+
+def round_coord(lat, lon):
+    """Rond een coördinaat af zoals gebruikt in de route cache en requests"""
+    return round(float(lat), ROUTE_AFRONDING), round(float(lon), ROUTE_AFRONDING)
+
+
+class RouteCache:
+    """Persistente SQLite cache voor reistijd (seconden) en afstand (meters) tussen twee coördinaten
+    Ook onbereikbare paren worden opgeslagen (duur/afstand None). De sleutel bevat backend URL en profiel:
+    een andere backend (bijv. een OSRM met een ander kaartbestand) deelt geen resultaten.
+    """
+
+    def __init__(self, path, url, profile, ttl=ROUTE_CACHE_TTL):
+        self.path = path
+        self.url = url.rstrip('/')
+        self.profile = profile
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS route ("
+            " sleutel TEXT PRIMARY KEY,"
+            " duur REAL,"
+            " afstand REAL,"
+            " cached_at REAL NOT NULL)"
+        )
+        self.conn.commit()
+
+    def sleutel(self, bron, doel):
+        return f"{self.url}|{self.profile}|{bron[0]:.{ROUTE_AFRONDING}f},{bron[1]:.{ROUTE_AFRONDING}f}" \
+               f"|{doel[0]:.{ROUTE_AFRONDING}f},{doel[1]:.{ROUTE_AFRONDING}f}"
+
+    def get_many(self, paren):
+        """Zoek paren (bron, doel) op; geeft dict met de gevonden paren -> (duur, afstand)"""
+        gevonden = {}
+        grens = time.time() - self.ttl
+        with self.lock:
+            for paar in paren:
+                row = self.conn.execute(
+                    "SELECT duur, afstand, cached_at FROM route WHERE sleutel = ?", (self.sleutel(*paar),)
+                ).fetchone()
+                if row is not None and row[2] >= grens:
+                    gevonden[paar] = (row[0], row[1])
+                    self.hits += 1
+                else:
+                    self.misses += 1
+        return gevonden
+
+    def put_many(self, resultaten):
+        """Sla een dict (bron, doel) -> (duur, afstand) op"""
+        nu = time.time()
+        with self.lock:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO route (sleutel, duur, afstand, cached_at) VALUES (?, ?, ?, ?)",
+                [(self.sleutel(*paar), duur, afstand, nu) for paar, (duur, afstand) in resultaten.items()]
+            )
+            self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def print_stats(self):
+        print(f"[INFO] Route cache: {self.hits} hits, {self.misses} misses ({self.path})")
+
+
+class RoutingEngine:
+    """Reistijd en -afstand via een OSRM-compatibel /table endpoint
+    Vraagt de matrix voor veel bron/doel paren tegelijk op (zo min mogelijk requests binnen
+    max_coordinates per request) en gebruikt optioneel een RouteCache.
+    """
+
+    def __init__(self, url, profile="driving", max_coordinates=100, rate=0, cache=None, timeout=30,
+                 user_agent="AdresAfstandTool/1.0"):
+        self.url = url.rstrip('/')
+        self.profile = profile
+        self.max_coordinates = max(2, int(max_coordinates))
+        self.cache = cache
+        self.timeout = timeout
+        self.limiter = TokenBucket(rate) if rate else None
+        self.requests = 0  # Aantal daadwerkelijke netwerk requests
+        self.fouten = 0
+        import requests  # Pas hier nodig, net als in GeocodeEngine
+        self.session = requests.Session()
+        self.session.headers["User-Agent"] = user_agent
+
+    def batches(self, per_bron):
+        """Verdeel {bron: [doelen]} over requests van maximaal max_coordinates coördinaten
+        Bronnen worden samengevoegd zolang bronnen + gezamenlijke doelen in één request passen.
+        """
+        huidig_bronnen, huidig_doelen = [], {}
+        for bron, doelen in per_bron.items():
+            doelen = list(dict.fromkeys(doelen))
+            # Een bron met meer doelen dan in één request past, wordt zelf opgesplitst
+            if len(doelen) + 1 > self.max_coordinates:
+                stap = self.max_coordinates - 1
+                for start in range(0, len(doelen), stap):
+                    yield [bron], doelen[start:start + stap]
+                continue
+            nieuw = dict(huidig_doelen)
+            nieuw.update(dict.fromkeys(doelen))
+            if huidig_bronnen and len(huidig_bronnen) + 1 + len(nieuw) > self.max_coordinates:
+                yield huidig_bronnen, list(huidig_doelen)
+                huidig_bronnen, nieuw = [], dict.fromkeys(doelen)
+            huidig_bronnen.append(bron)
+            huidig_doelen = nieuw
+        if huidig_bronnen:
+            yield huidig_bronnen, list(huidig_doelen)
+
+    def table(self, bronnen, doelen):
+        """Eén /table request; geeft (durations, distances) matrices (bronnen x doelen)"""
+        if self.limiter is not None:
+            self.limiter.acquire()
+        self.requests += 1
+        # OSRM verwacht lon,lat
+        coords = ";".join(f"{lon:.{ROUTE_AFRONDING}f},{lat:.{ROUTE_AFRONDING}f}" for lat, lon in bronnen + doelen)
+        params = {
+            "sources": ";".join(str(i) for i in range(len(bronnen))),
+            "destinations": ";".join(str(i) for i in range(len(bronnen), len(bronnen) + len(doelen))),
+            "annotations": "duration,distance",
+        }
+        response = self.session.get(f"{self.url}/table/v1/{self.profile}/{coords}", params=params,
+                                    timeout=self.timeout)
+        response.raise_for_status()
+        data = response.json()
+        if data.get("code") != "Ok":
+            raise ValueError(f"OSRM antwoord: {data.get('code')} {data.get('message', '')}".strip())
+        return data["durations"], data["distances"]
+
+    def route_pairs(self, paren):
+        """Bepaal reistijd (seconden) en afstand (meters) voor paren ((lat, lon), (lat, lon))
+        Returns: dict met per afgerond paar (duur, afstand); (None, None) als onbereikbaar of bij fout.
+        """
+        paren = {(round_coord(*bron), round_coord(*doel)) for bron, doel in paren}
+        resultaten = self.cache.get_many(paren) if self.cache is not None else {}
+
+        per_bron = {}
+        for bron, doel in sorted(paren - resultaten.keys()):
+            per_bron.setdefault(bron, []).append(doel)
+
+        for bronnen, doelen in self.batches(per_bron):
+            in_batch = set(doelen)
+            nodig = [(bron, doel) for bron in bronnen for doel in per_bron[bron] if doel in in_batch]
+            try:
+                durations, distances = self.table(bronnen, doelen)
+            except Exception as e:
+                self.fouten += 1
+                print(f"   [WAARSCHUWING] Route request mislukt ({len(bronnen)} x {len(doelen)}): {e}")
+                resultaten.update({paar: (None, None) for paar in nodig})
+                continue
+            positie = {doel: j for j, doel in enumerate(doelen)}
+            rij = {bron: i for i, bron in enumerate(bronnen)}
+            nieuw = {(bron, doel): (durations[rij[bron]][positie[doel]], distances[rij[bron]][positie[doel]])
+                     for bron, doel in nodig}
+            if self.cache is not None:
+                self.cache.put_many(nieuw)
+            resultaten.update(nieuw)
+        return resultaten
+
+    def close(self):
+        self.session.close()
+        if self.cache is not None:
+            self.cache.close()
+
+    def print_stats(self):
+        if self.cache is not None:
+            self.cache.print_stats()
+        print(f"[INFO] Route requests naar {self.url}: {self.requests} ({self.fouten} mislukt)")
+
+
+def open_routing(backend='osrm', url=None, profile=None, rate=None):
+    """Maak een RoutingEngine voor een backend (met persistente cache); url/profile/rate overschrijven de backend"""
+    instellingen = ROUTING_BACKENDS[backend]
+    url = url or instellingen["url"]
+    profile = profile or instellingen["profile"]
+    try:
+        cache = RouteCache(route_cache_path, url, profile)
+        print(f"[INFO] Route cache geopend: {route_cache_path}")
+    except sqlite3.Error as e:
+        print(f"[WAARSCHUWING] Kon route cache niet openen, routing zonder cache: {e}")
+        cache = None
+    engine = RoutingEngine(
+        url=url,
+        profile=profile,
+        max_coordinates=instellingen["max_coordinates"],
+        rate=rate if rate is not None else instellingen["rate"],
+        cache=cache
+    )
+    print(f"[INFO] Routing via {engine.url} (profiel {engine.profile})")
+    return engine
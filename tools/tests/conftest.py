@@ -0,0 +1,46 @@
+import json
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+# De tools zijn losse scripts (geen package): maak ze importeerbaar zoals bij python tools/<script>.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def stub_server():
+    """Start HTTP servers op localhost als stand-in voor Nominatim/OSRM
+    start(antwoord) geeft de basis URL; antwoord(pad, params) geeft (status, data, headers) per GET request.
+    """
+    servers = []
+
+    def start(antwoord):
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlsplit(self.path)
+                status, data, headers = antwoord(url.path, {k: v[0] for k, v in parse_qs(url.query).items()})
+                body = json.dumps(data).encode('utf-8')
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                for naam, waarde in headers.items():
+                    self.send_header(naam, waarde)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return f"http://127.0.0.1:{server.server_port}"
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,181 @@
+import hashlib
+import json
+import os
+
+import pandas as pd
+import pytest
+
+import excel_to_json
+
+DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+MEDEWERKERS = os.path.join(DATA, "medewerkers.xlsx")
+AFAS = os.path.join(DATA, "afas.xlsx")
+# adressen.json van de oorspronkelijke verwerking per rij (df.iterrows() met lineaire OE scan, zonder geocoding),
+# zonder toegevoegdOp (het begintijdstip van de run)
+GOLDEN = os.path.join(DATA, "adressen_golden.json")
+
+
+def lees_adressen(pad):
+    """adressen.json zonder toegevoegdOp (het begintijdstip van de run)"""
+    with open(pad, encoding='utf-8') as f:
+        adressen = json.load(f)
+    for adres in adressen:
+        adres.pop("toegevoegdOp", None)
+    return adressen
+
+
+def converteer(map_, *extra):
+    """Converteer de fixture in map_ zonder geocoding; geeft adressen.json als tekst zonder toegevoegdOp"""
+    uitvoer = os.path.join(map_, "adressen.json")
+    code = excel_to_json.main(["--excel", MEDEWERKERS, "--afas", AFAS, "-o", uitvoer, "--no-geocode",
+                               "--no-snapshot-cache", "--report", os.path.join(map_, "run.json")] + list(extra))
+    assert code == 0
+    return json.dumps(lees_adressen(uitvoer), indent=2, ensure_ascii=False) + "\n"
+
+
+@pytest.fixture
+def werkmap(tmp_path, monkeypatch):
+    # namen_geformatteerd.csv komt in de werkmap
+    monkeypatch.chdir(tmp_path)
+    return str(tmp_path)
+
+
+@pytest.mark.parametrize("extra", [[], ["--stream"], ["--compact"]])
+def test_gelijk_aan_golden_file(werkmap, extra):
+    with open(GOLDEN, encoding='utf-8') as f:
+        assert converteer(werkmap, *extra) == f.read()
+
+
+def test_afas_stream_gelijk_aan_pandas(tmp_path):
+    afas = pd.read_excel(AFAS)
+    in_dienst = afas[afas["Status dienstverband"] == "In dienst"].iloc[0]
+    extra = [
+        {kolom: None for kolom in afas.columns},  # volledig lege rij
+        {**in_dienst, "goeie OE": "Andere OE"},  # dubbele medewerker: het eerste voorkomen wint
+        {**in_dienst, "Naam": f"  {in_dienst['Naam']}  ", "goeie OE": "Met spaties"},
+        {**in_dienst, "Naam": "Zonder Oe", "goeie OE": None},
+        {**in_dienst, "Naam": "Zonder Status", "Status dienstverband": None},
+        {**in_dienst, "Naam": None},
+    ]
+    pad = str(tmp_path / "afas.xlsx")
+    pd.concat([afas, pd.DataFrame(extra)], ignore_index=True).to_excel(pad, index=False, engine='openpyxl')
+
+    gestreamd = excel_to_json.load_afas_oe_mapping(stream=True, path=pad, snapshot_dir=None)
+    met_pandas = excel_to_json.load_afas_oe_mapping(stream=False, path=pad, snapshot_dir=None)
+    assert gestreamd
+    # Ook de volgorde: bij dubbele namen moet dezelfde OE winnen
+    assert list(gestreamd.items()) == list(met_pandas.items())
+    assert "Andere OE" not in gestreamd.values() and "Met spaties" not in gestreamd.values()
+
+
+@pytest.mark.parametrize("extra", [[], ["--stream", "--chunk-size", "10"]])
+def test_workers_gelijk_aan_serieel(werkmap, monkeypatch, capsys, extra):
+    # Kleine chunks, zodat de 88 rijen over meerdere processen verdeeld worden
+    monkeypatch.setattr(excel_to_json, "PARALLEL_MIN_RIJEN", 10)
+    monkeypatch.setattr(excel_to_json, "PARALLEL_CHUNK_RIJEN", 10)
+    serieel = converteer(werkmap, "--workers", "1", *extra)
+    capsys.readouterr()
+    parallel = converteer(werkmap, "--workers", "2", *extra)
+    assert "Rijen voorbereiden met 2 processen" in capsys.readouterr().out
+    assert parallel == serieel
+    with open(GOLDEN, encoding='utf-8') as f:
+        assert parallel == f.read()
+
+
+def nominatim(pad, params):
+    """Stand-in voor Nominatim: vindt elk adres, met coördinaten die alleen van de query afhangen"""
+    query = json.dumps(sorted((k, v.lower()) for k, v in params.items() if k not in ("format", "limit")))
+    h = int(hashlib.sha1(query.encode('utf-8')).hexdigest()[:8], 16)
+    return 200, [{"lat": str(51 + h % 1000 / 1000), "lon": str(5 + h // 1000 % 1000 / 1000)}], {}
+
+
+def test_hervat_na_onderbreking(werkmap, monkeypatch, stub_server):
+    geocode_url = stub_server(nominatim) + "/search"
+    origineel = excel_to_json.geocode_with_fallback
+    aanroepen = []
+
+    def geocode(*args, **kwargs):
+        if len(aanroepen) == stop_na:
+            raise KeyboardInterrupt
+        aanroepen.append(args[:4])
+        return origineel(*args, **kwargs)
+
+    monkeypatch.setattr(excel_to_json, "geocode_with_fallback", geocode)
+    argumenten = ["--excel", MEDEWERKERS, "--afas", AFAS, "--no-snapshot-cache", "--geocode-url", geocode_url,
+                  "--geocode-rate", "0", "--geocode-workers", "1"]
+
+    def run(naam, *extra):
+        return excel_to_json.main(argumenten + ["-o", naam + ".json", "--report", naam + ".run.json"] + list(extra))
+
+    # Onderbroken na 5 unieke adressen; het checkpoint heeft de conversie en de gevonden adressen
+    stop_na = 5
+    assert run("adressen") == 130
+    assert not os.path.exists("adressen.json")
+    with open("adressen_checkpoint.jsonl", encoding='utf-8') as f:
+        stappen = [json.loads(regel)["stap"] for regel in f.readlines()[1:]]
+    assert stappen == ["records"] + ["geocoding"] * 5
+
+    # Hervatten: geen nieuwe conversie en alleen de overige adressen geocoden
+    def niet_converteren(*args):
+        raise AssertionError("de conversie had uit het checkpoint moeten komen")
+    monkeypatch.setattr(excel_to_json, "converteer_bronnen", niet_converteren)
+    stop_na = None
+    aanroepen.clear()
+    assert run("adressen", "--resume") == 0
+    hervat = list(aanroepen)
+    assert not os.path.exists("adressen_checkpoint.jsonl")
+
+    # Zelfde resultaat als een run zonder onderbreking
+    monkeypatch.undo()
+    monkeypatch.chdir(werkmap)
+    monkeypatch.setattr(excel_to_json, "geocode_with_fallback", geocode)
+    aanroepen.clear()
+    assert run("zonder_onderbreking") == 0
+    assert len(hervat) == len(aanroepen) - 5 and set(hervat) < set(aanroepen)
+    assert lees_adressen("adressen.json") == lees_adressen("zonder_onderbreking.json")
+
+
+def test_hervat_zonder_geocoding(werkmap, monkeypatch):
+    # Onderbroken na de conversie, tijdens het schrijven van de output: --resume converteert niet opnieuw
+    def onderbreek(*args):
+        raise KeyboardInterrupt
+    monkeypatch.setattr(excel_to_json, "save_incremental_state", onderbreek)
+    assert excel_to_json.main(["--excel", MEDEWERKERS, "--afas", AFAS, "--no-geocode", "--no-snapshot-cache"]) == 130
+    assert os.path.exists("adressen_checkpoint.jsonl")
+    monkeypatch.undo()
+    monkeypatch.chdir(werkmap)
+
+    def niet_converteren(*args):
+        raise AssertionError("de conversie had uit het checkpoint moeten komen")
+    monkeypatch.setattr(excel_to_json, "converteer_bronnen", niet_converteren)
+    with open(GOLDEN, encoding='utf-8') as f:
+        assert converteer(werkmap, "--resume") == f.read()
+
+
+def test_meerdere_werkbladen_samenvoegen(werkmap, capsys):
+    # Twee werkboeken die 10 medewerkers delen; rij 80 en 81 van de fixture zijn dubbelen van rij 3 en 5
+    medewerkers = pd.read_excel(MEDEWERKERS)
+    medewerkers.iloc[:50].to_excel("regio_a.xlsx", index=False, engine='openpyxl')
+    medewerkers.iloc[40:].to_excel("regio_b.xlsx", index=False, engine='openpyxl')
+    code = excel_to_json.main(["--excel", "regio_a.xlsx", "regio_b.xlsx", "--afas", AFAS, "-o", "adressen.json",
+                               "--no-geocode", "--no-snapshot-cache"])
+    assert code == 0
+    uitvoer = capsys.readouterr().out
+    assert "2 werkblad(en) en 1 AFAS export(s) inlezen" in uitvoer
+    assert "86 adressen uit 2 werkbladen; 12 medewerkers overgeslagen" in uitvoer
+
+    # Zelfde adressen (en IDs) als één werkboek, zonder de dubbelen uit het tweede werkboek
+    with open(GOLDEN, encoding='utf-8') as f:
+        golden = json.load(f)
+    assert lees_adressen("adressen.json") == golden[:80] + golden[82:]
+
+
+@pytest.mark.parametrize("optie, bestanden", [
+    ("--index", ["adressen.index.json", "adressen.index.bin", "adressen.index.records.json"]),
+    ("--clusters", ["adressen.clusters.json", "adressen.clusters.bin"]),
+])
+def test_index_en_clusters_alleen_met_optie(werkmap, optie, bestanden):
+    converteer(werkmap)
+    assert not any(os.path.exists(naam) for naam in bestanden)
+    converteer(werkmap, optie)
+    assert all(os.path.exists(naam) for naam in bestanden)
@@ -0,0 +1,141 @@
+import json
+import os
+
+import pytest
+
+import excel_to_json
+from excel_to_json import (AdresRecord, DELTA_MANIFEST, SHARD_MANIFEST, apply_delta, atomic_open, export_map_fout,
+                           maak_delta, write_delta_export, write_json_array, write_sharded_output)
+
+
+def records(aantal, bu_namen=("Staf", "P&O", None)):
+    return [AdresRecord(f"shared-{i:04d}", f"Medewerker {i}", "Hogeweg", str(i), "1234 AB", "Utrecht",
+                        bu=bu_namen[i % len(bu_namen)], latitude=52.0 + i / 1000, longitude=5.0)
+            for i in range(aantal)]
+
+
+def test_shards_ruimen_alleen_eigen_bestanden_op(tmp_path):
+    map_ = str(tmp_path)
+    vreemd = ["adressen.json", "adressen.index.json", "adressen.index.bin", "adressen.clusters.json",
+              "adressen.delta.3-4.json", "adressen.notities.txt"]
+    for naam in vreemd:
+        (tmp_path / naam).write_text("{}")
+
+    eerste = write_sharded_output(records(30), map_)
+    eerste_bestanden = {shard["bestand"] for shard in eerste["shards"]}
+    # Shard van een BU die verdwijnt, en een verouderde shard van een eerdere run
+    (tmp_path / "adressen.oud.0123456789ab.json.br").write_text("[]")
+
+    tweede = write_sharded_output(records(30, bu_namen=("Staf", None)), map_)
+    over = set(os.listdir(map_))
+    assert set(vreemd) <= over
+    assert "adressen.oud.0123456789ab.json.br" not in over
+    assert {shard["bestand"] for shard in tweede["shards"]} <= over
+    assert not (eerste_bestanden - {shard["bestand"] for shard in tweede["shards"]}) & over
+    with open(os.path.join(map_, SHARD_MANIFEST), encoding='utf-8') as f:
+        assert json.load(f)["totaal"] == 30
+
+
+def test_shard_map_niet_de_output_of_delta_map(tmp_path):
+    output = str(tmp_path / "adressen.json")
+    assert export_map_fout(str(tmp_path), None, output)
+    assert export_map_fout(".", None, "adressen.json")
+    assert export_map_fout("shards", "shards", output)
+    assert export_map_fout("shards", "delta", output) is None
+    assert export_map_fout(None, ".", "adressen.json") is None
+
+
+def test_oud_manifest_wordt_overgenomen(tmp_path):
+    map_ = str(tmp_path)
+    eerste = write_sharded_output(records(10), map_)
+    os.replace(os.path.join(map_, SHARD_MANIFEST), os.path.join(map_, "manifest.json"))
+    write_sharded_output(records(10, bu_namen=("Staf",)), map_)
+    over = set(os.listdir(map_))
+    assert "manifest.json" not in over and SHARD_MANIFEST in over
+    assert not {shard["bestand"] for shard in eerste["shards"] if shard["bu"] != "Staf"} & over
+
+
+ELEMENTEN = [
+    {"id": "shared-0001", "naam": "Ödül \"de\" Vries", "huisnummer": "12a", "latitude": 52.1,
+     "longitude": 5.25, "bu": None, "actief": True, "aantal": 3},
+    {"id": "shared-0002", "naam": "Regel\neinde\ten tab", "bu": "P&O", "latitude": 1e-05},
+    {},
+    {"genest": {"lijst": [1, 2.5, None]}, "leeg": [], "tekst": "€ ✓"},
+]
+
+
+@pytest.mark.parametrize("elementen", [ELEMENTEN, ELEMENTEN[:1], []])
+@pytest.mark.parametrize("compact", [False, True])
+def test_json_array_gelijk_aan_json_dumps(tmp_path, elementen, compact):
+    pad = tmp_path / "adressen.json"
+    with open(pad, "w", encoding="utf-8") as f:
+        assert write_json_array(f, iter(elementen), compact) == len(elementen)
+    if compact:
+        verwacht = json.dumps(elementen, ensure_ascii=False, separators=(",", ":"))
+    else:
+        verwacht = json.dumps(elementen, indent=2, ensure_ascii=False)
+    assert pad.read_bytes() == verwacht.encode("utf-8")
+
+
+def test_atomic_open_laat_oud_bestand_staan_bij_fout(tmp_path):
+    pad = tmp_path / "adressen.json"
+    pad.write_text("[]", encoding="utf-8")
+
+    def elementen():
+        yield ELEMENTEN[0]
+        raise RuntimeError("schrijffout halverwege")
+
+    with pytest.raises(RuntimeError):
+        with atomic_open(str(pad)) as f:
+            write_json_array(f, elementen())
+    assert pad.read_text(encoding="utf-8") == "[]"
+    assert os.listdir(tmp_path) == ["adressen.json"]
+
+    with atomic_open(str(pad)) as f:
+        write_json_array(f, ELEMENTEN)
+    assert json.loads(pad.read_text(encoding="utf-8")) == ELEMENTEN
+
+
+def test_delta_round_trip():
+    vorige = [adres.to_dict() for adres in records(10)]
+    nieuw = [dict(adres) for adres in vorige]
+    nieuw[2]["huisnummer"] = "2b"  # gewijzigd
+    del nieuw[7], nieuw[4]  # verwijderd
+    nieuw.insert(0, records(11)[10].to_dict())  # toegevoegd, vooraan, midden en achteraan
+    nieuw.insert(5, dict(nieuw[1], id="shared-0100"))
+    nieuw.append(dict(nieuw[1], id="shared-0101", bu=None))
+
+    delta = maak_delta(vorige, nieuw)
+    assert len(delta["toegevoegd"]) == 3 and len(delta["gewijzigd"]) == 1
+    assert sorted(delta["verwijderd"]) == ["shared-0004", "shared-0007"]
+    assert "volgorde" not in delta
+    assert apply_delta(vorige, delta) == nieuw
+
+    # Andere volgorde van de overgebleven adressen
+    nieuw.reverse()
+    delta = maak_delta(vorige, nieuw)
+    assert "volgorde" in delta
+    assert apply_delta(vorige, delta) == nieuw
+
+    assert apply_delta(vorige, maak_delta(vorige, [])) == []
+    assert apply_delta([], maak_delta([], nieuw)) == nieuw
+
+
+def test_oude_deltas_worden_opgeruimd(tmp_path, monkeypatch):
+    monkeypatch.setattr(excel_to_json, "DELTA_BEWAAR", 2)
+    map_ = str(tmp_path)
+    output = os.path.join(map_, "adressen.json")
+    (tmp_path / "adressen.notities.txt").write_text("")
+    adressen = records(30)
+    vorige = []
+    for versie in range(1, 6):
+        adressen[versie].huisnummer = f"{versie}a"
+        manifest = write_delta_export(adressen, vorige, map_, output=output)
+        vorige = [adres.to_dict() for adres in adressen]
+        assert manifest["dataVersie"] == versie
+
+    assert [(d["van"], d["naar"]) for d in manifest["deltas"]] == [(3, 4), (4, 5)]
+    assert sorted(os.listdir(map_)) == sorted([DELTA_MANIFEST, "adressen.notities.txt"]
+                                              + [d["bestand"] for d in manifest["deltas"]])
+    with open(os.path.join(map_, DELTA_MANIFEST), encoding="utf-8") as f:
+        assert json.load(f) == manifest
@@ -0,0 +1,137 @@
+import socket
+import threading
+import time
+
+from excel_to_json import GeocodeCache, GeocodeEngine, TokenBucket
+
+
+class Nominatim:
+    """Stand-in voor Nominatim /search: kent alleen Utrecht; `fouten` queries krijgen eerst een tijdelijke fout"""
+
+    def __init__(self, fouten=None, status=503, headers=None):
+        self.fouten = dict(fouten or {})  # query -> aantal keer een fout voordat het lukt
+        self.status = status
+        self.headers = headers or {}
+        self.requests = []  # (tijdstip, query)
+        self.lock = threading.Lock()
+
+    def __call__(self, pad, params):
+        query = params.get("q")
+        with self.lock:
+            self.requests.append((time.monotonic(), query))
+            if self.fouten.get(query, 0) > 0:
+                self.fouten[query] -= 1
+                return self.status, {"fout": "tijdelijk"}, self.headers
+        if "Utrecht" in query:
+            return 200, [{"lat": "52.0907", "lon": "5.1214"}], {}
+        return 200, [], {}
+
+
+def engine(url, **kwargs):
+    instellingen = {"rate": 0, "workers": 4, "backoff": 0.05}
+    instellingen.update(kwargs)
+    return GeocodeEngine(url=url + "/search", **instellingen)
+
+
+def test_cache_hit_zonder_request(stub_server, tmp_path):
+    server = Nominatim()
+    url = stub_server(server)
+    cache_pad = str(tmp_path / "geocode_cache.sqlite")
+
+    eerste = engine(url, cache=GeocodeCache(cache_pad))
+    assert eerste.search("Domplein 1, Utrecht") == (52.0907, 5.1214)
+    assert eerste.search("Nergens 1, Onbekend") == (None, None)
+    eerste.close()
+    assert len(server.requests) == 2
+
+    # Een nieuwe run (nieuwe engine, zelfde cache): gevonden en niet gevonden adressen komen uit de cache
+    tweede = engine(url, cache=GeocodeCache(cache_pad))
+    assert tweede.search("domplein 1,  utrecht") == (52.0907, 5.1214)
+    assert tweede.search("Nergens 1, Onbekend") == (None, None)
+    assert len(server.requests) == 2
+    assert tweede.requests == 0
+    assert (tweede.cache.hits, tweede.cache.negative_hits) == (2, 1)
+    tweede.close()
+
+
+def test_herhaalt_na_tijdelijke_fout(stub_server):
+    server = Nominatim(fouten={"Domplein 1, Utrecht": 2})
+    geocoder = engine(stub_server(server), retries=2, backoff=0.05)
+    start = time.monotonic()
+    assert geocoder.search("Domplein 1, Utrecht") == (52.0907, 5.1214)
+    # Backoff van 0.05s en daarna 0.1s
+    assert time.monotonic() - start >= 0.15
+    assert (geocoder.requests, geocoder.herhaald, geocoder.fouten) == (3, 2, 0)
+    geocoder.close()
+
+
+def test_retry_after_en_opgeven(stub_server):
+    server = Nominatim(fouten={"Domplein 1, Utrecht": 10}, status=429, headers={"Retry-After": "0"})
+    geocoder = engine(stub_server(server), retries=2, backoff=5.0)
+    start = time.monotonic()
+    assert geocoder.search("Domplein 1, Utrecht") == (None, None)
+    # Retry-After: 0 gaat voor de backoff van 5s; na retries herhalingen wordt het opgegeven
+    assert time.monotonic() - start < 2.0
+    assert (geocoder.requests, geocoder.herhaald, geocoder.fouten) == (3, 2, 1)
+    # Een mislukte query wordt niet onthouden: een latere aanroep probeert het opnieuw
+    server.fouten.clear()
+    assert geocoder.search("Domplein 1, Utrecht") == (52.0907, 5.1214)
+    geocoder.close()
+
+
+def test_geen_verbinding(stub_server):
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        poort = s.getsockname()[1]  # Vrije poort waar niemand luistert
+    geocoder = engine(f"http://127.0.0.1:{poort}", retries=1, backoff=0.01)
+    assert geocoder.search("Domplein 1, Utrecht") == (None, None)
+    assert (geocoder.requests, geocoder.herhaald, geocoder.fouten) == (2, 1, 1)
+    geocoder.close()
+
+
+def test_rate_limit_over_alle_workers(stub_server):
+    server = Nominatim()
+    geocoder = engine(stub_server(server), rate=20.0, burst=1, workers=4)
+    queries = [f"Straat {i}, Utrecht" for i in range(10)]
+    start = time.monotonic()
+    threads = [threading.Thread(target=geocoder.search, args=(q,)) for q in queries]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    duur = time.monotonic() - start
+
+    # Eén token direct, daarna 20 per seconde: 10 requests duren minstens 9/20 s
+    tijden = sorted(t for t, _ in server.requests)
+    assert len(tijden) == 10
+    assert tijden[-1] - tijden[0] >= 0.4
+    # De wachttijd is kloktijd (niet opgeteld over de threads)
+    assert 0.4 <= geocoder.limiter.wachttijd <= duur
+    geocoder.close()
+
+
+def test_token_bucket_burst():
+    bucket = TokenBucket(rate=10.0, capacity=3)
+    start = time.monotonic()
+    for _ in range(3):
+        bucket.acquire()
+    assert time.monotonic() - start < 0.05
+    bucket.acquire()
+    assert time.monotonic() - start >= 0.09
+
+
+def test_cache_opschonen_bij_sluiten(tmp_path):
+    cache_pad = str(tmp_path / "geocode_cache.sqlite")
+    cache = GeocodeCache(cache_pad, max_entries=3)
+    for i in range(5):
+        cache.put(f"Straat {i}, Utrecht", 52.0, 5.0 + i)
+    # Niet bij elke put: tijdens de run mag de cache tijdelijk groter zijn dan max_entries
+    assert cache.conn.execute("SELECT COUNT(*) FROM geocode").fetchone()[0] == 5
+    cache.close()
+
+    cache = GeocodeCache(cache_pad, max_entries=3)
+    # De oudste entries zijn verwijderd
+    assert cache.get("Straat 1, Utrecht") == (False, None, None)
+    assert cache.get("Straat 4, Utrecht") == (True, 52.0, 9.0)
+    assert cache.conn.execute("SELECT COUNT(*) FROM geocode").fetchone()[0] == 3
+    cache.close()
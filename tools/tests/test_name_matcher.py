@@ -0,0 +1,70 @@
+import random
+
+from benchmark import naam_delen, VOORNAMEN, ACHTERNAMEN
+from excel_to_json import NameMatcher, find_oe_naam, normalize_naam
+
+
+def volledige_naam(rng):
+    roepnaam, _, tussenvoegsel, achternaam = naam_delen(rng)
+    return " ".join(d for d in (roepnaam, tussenvoegsel, achternaam) if d)
+
+
+def verstoor(naam, rng):
+    """Naam met een afwijking zoals in de AFAS export: tikfout, andere voornaam of extra achternaam"""
+    keuze = rng.randrange(5)
+    if keuze == 0 and len(naam) > 3:
+        i = rng.randrange(len(naam))
+        return naam[:i] + naam[i + 1:]
+    if keuze == 1 and len(naam) > 3:
+        i = rng.randrange(len(naam) - 1)
+        return naam[:i] + naam[i + 1] + naam[i] + naam[i + 2:]
+    if keuze == 2:
+        return naam.replace(naam.split()[0], rng.choice(VOORNAMEN), 1)
+    if keuze == 3:
+        return f"{naam}-{rng.choice(ACHTERNAMEN)}"
+    return naam[:-2] + rng.choice("aeiou") + "a"
+
+
+def test_zelfde_resultaat_als_lineaire_scan():
+    rng = random.Random(7)
+    mapping = {}
+    for i in range(400):
+        mapping.setdefault(normalize_naam(volledige_naam(rng)), f"OE {i}")
+    matcher = NameMatcher(mapping)
+    namen = [verstoor(rng.choice(list(mapping)), rng) for _ in range(250)] + [volledige_naam(rng) for _ in range(50)]
+    for naam in namen:
+        assert matcher.match(naam) == find_oe_naam(naam, mapping), naam
+
+
+def test_zelfde_resultaat_bij_veel_gelijke_scores():
+    # Korte namen uit weinig letters: veel gedeelde trigrams en veel gelijke scores
+    rng = random.Random(3)
+
+    def woord():
+        return "".join(rng.choice("aeklmn ") for _ in range(rng.randint(5, 12))).strip() or "a"
+
+    mapping = {}
+    for i in range(300):
+        mapping.setdefault(woord(), f"OE {i}")
+    matcher = NameMatcher(mapping)
+    for _ in range(300):
+        naam = woord()
+        assert matcher.match(naam, min_similarity=0.0) == find_oe_naam(naam, mapping, min_similarity=0.0), naam
+
+
+def test_gelijke_score_eerste_naam_wint():
+    # Alle drie de namen scoren gelijk; de lineaire scan kiest de eerste in de volgorde van de mapping
+    mapping = {"sem hoekmab": "OE 1", "sem hoekman": "OE 2", "sem hoekmaa": "OE 3"}
+    for volgorde in (mapping, dict(reversed(list(mapping.items())))):
+        eerste = next(iter(volgorde.values()))
+        assert NameMatcher(volgorde).match("Sem Hoekma") == find_oe_naam("Sem Hoekma", volgorde) == (eerste, 20 / 21)
+
+
+def test_exacte_match_en_geen_match():
+    mapping = {"jan jansen": "OE 1", "piet de vries": "OE 2"}
+    matcher = NameMatcher(mapping)
+    assert matcher.match("Jan  Jansen.") == ("OE 1", 1.0)
+    assert matcher.match("xyz") == (None, 0.0)
+    assert matcher.match(None) == (None, 0.0)
+    # Onder de drempel: geen OE, wel de beste score (zoals find_oe_naam)
+    assert matcher.match("Jan Bakker", min_similarity=0.9) == find_oe_naam("Jan Bakker", mapping, 0.9)
@@ -0,0 +1,45 @@
+import tracemalloc
+
+import numpy as np
+
+from nearest_employees import haversine, haversine_matrix, top_k_batch, top_k_nearest
+
+
+def punten(aantal, seed):
+    rng = np.random.default_rng(seed)
+    lat = np.round(rng.uniform(50.8, 53.5, aantal), 3)
+    lon = np.round(rng.uniform(3.4, 7.2, aantal), 3)
+    lat[10:40], lon[10:40] = lat[10], lon[10]  # Collega's op één adres: veel gelijke afstanden
+    return lat, lon
+
+
+def test_matrix_gelijk_aan_haversine():
+    lat, lon = punten(300, 1)
+    qlat, qlon = punten(50, 2)
+    verwacht = haversine(qlat[:, None], qlon[:, None], lat[None, :], lon[None, :])
+    assert np.array_equal(haversine_matrix(qlat, qlon, lat, lon), verwacht)
+
+
+def test_blokken_veranderen_het_resultaat_niet():
+    lat, lon = punten(2000, 3)
+    qlat, qlon = np.concatenate([punten(200, 4)[0], lat[10:15]]), np.concatenate([punten(200, 4)[1], lon[10:15]])
+    for k in (1, 5, 35, 2000):
+        verwacht = top_k_nearest(qlat, qlon, lat, lon, k, max_matrix_mb=1024)
+        assert top_k_nearest(qlat, qlon, lat, lon, k, max_matrix_mb=0.05) == verwacht
+        indices, afstanden = top_k_batch(qlat, qlon, lat, lon, k, max_matrix_mb=0.05)
+        assert indices.tolist() == [[i for i, _ in paren] for paren in verwacht]
+        # Bij gelijke afstand wint de laagste index
+        assert all(a[0] < b[0] for paren in verwacht for a, b in zip(paren, paren[1:]) if a[1] == b[1])
+
+
+def test_geheugen_binnen_max_matrix_mb():
+    lat, lon = punten(20000, 5)
+    qlat, qlon = punten(1000, 6)
+    tracemalloc.start()
+    try:
+        top_k_nearest(qlat, qlon, lat, lon, 5, max_matrix_mb=4)
+        piek = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    # Matrix plus tijdelijke matrix binnen 4 MB; de rest zijn de resultaten (1000 x 5 paren)
+    assert piek < 5 * 1024 * 1024
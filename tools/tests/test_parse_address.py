@@ -0,0 +1,48 @@
+import random
+
+import numpy as np
+import pandas as pd
+
+from benchmark import STRATEN, PLAATSEN
+from excel_to_json import parse_address_string, parse_address_column
+
+
+def per_rij(waarden):
+    """De oorspronkelijke verwerking: parse_address_string per rij, lege waarden als None"""
+    kolommen = ([], [], [], [])
+    for waarde in waarden:
+        for kolom, deel in zip(kolommen, parse_address_string(waarde)):
+            kolom.append(deel if deel else None)
+    return kolommen
+
+
+def test_bekende_formaten():
+    assert parse_address_string("Hogeweg 24 b, 1763 XY Rotterdam") == ("Hogeweg", "24 b", "1763 XY", "Rotterdam")
+    assert parse_address_string("Laan 1940-1945 14 6991 XY") == ("Laan 1940-1945", "14", "6991 XY", None)
+    assert parse_address_string("Dorpsstraat 14A, 7955 ab  UTRECHT") == ("Dorpsstraat", "14A", "7955 AB", "UTRECHT")
+    assert parse_address_string("Kerkstraat") == ("Kerkstraat", None, None, None)
+    assert parse_address_string(np.nan) == (None, None, None, None)
+
+
+def test_kolom_gelijk_aan_per_rij():
+    rng = random.Random(11)
+    waarden = []
+    for _ in range(3000):
+        huisnummer = str(rng.randint(1, 250)) + rng.choice(["", " a", " b", "A", "-2", " bis"])
+        postcode = f"{rng.randint(1000, 9999)}{rng.choice(['', ' ', '  '])}{rng.choice(['AB', 'xy', 'Zz'])}"
+        plaats = rng.choice(PLAATSEN + ["", " GLD", "'s-Hertogenbosch"])
+        waarden.append(rng.choice([
+            f"{rng.choice(STRATEN)} {huisnummer}, {postcode} {plaats}",
+            f"{rng.choice(STRATEN)} {huisnummer} {postcode}",
+            f"  {rng.choice(STRATEN)}, {postcode}  {plaats}  ",
+            f"{postcode} {plaats}",
+            f"{rng.choice(STRATEN)} {huisnummer}",
+            rng.choice(STRATEN),
+        ]))
+    # Lege cellen, getallen en herhaalde adressen zoals in een Excel kolom
+    waarden += [None, np.nan, "", "   ", 12345, 3.5] + waarden[:50]
+    assert parse_address_column(pd.Series(waarden, dtype=object)) == per_rij(waarden)
+
+
+def test_lege_kolom():
+    assert parse_address_column(pd.Series([np.nan, np.nan])) == ([None, None],) * 4
@@ -0,0 +1,85 @@
+from routing import RouteCache, RoutingEngine, round_coord
+
+
+class Osrm:
+    """Stand-in voor OSRM /table: duur = factor x (|dlat| + |dlon|) x 1000, afstand = 10 x duur"""
+
+    def __init__(self, factor=1.0, status=200):
+        self.factor = factor
+        self.status = status
+        self.requests = []  # Aantal coördinaten per request
+
+    def __call__(self, pad, params):
+        coords = [tuple(float(x) for x in paar.split(",")) for paar in pad.split("/")[-1].split(";")]
+        self.requests.append(len(coords))
+        if self.status != 200:
+            return self.status, {"code": "Fout"}, {}
+        bronnen = [coords[int(i)] for i in params["sources"].split(";")]
+        doelen = [coords[int(i)] for i in params["destinations"].split(";")]
+        durations = [[self.factor * 1000 * (abs(b[0] - d[0]) + abs(b[1] - d[1])) for d in doelen] for b in bronnen]
+        distances = [[10 * duur for duur in rij] for rij in durations]
+        return 200, {"code": "Ok", "durations": durations, "distances": distances}, {}
+
+
+def verwacht(bron, doel, factor=1.0):
+    duur = factor * 1000 * (abs(bron[0] - doel[0]) + abs(bron[1] - doel[1]))
+    return duur, 10 * duur
+
+
+BRONNEN = [(52.0 + i / 100, 5.0) for i in range(4)]
+DOELEN = [(51.5, 4.5 + j / 100) for j in range(6)]
+PAREN = [(bron, doel) for bron in BRONNEN for doel in DOELEN]
+
+
+def test_batches_en_cache(stub_server, tmp_path):
+    server = Osrm()
+    url = stub_server(server)
+    cache_pad = str(tmp_path / "route_cache.sqlite")
+
+    engine = RoutingEngine(url, max_coordinates=5, cache=RouteCache(cache_pad, url, "driving"))
+    resultaten = engine.route_pairs(PAREN)
+    assert resultaten == {(round_coord(*b), round_coord(*d)): verwacht(b, d) for b, d in PAREN}
+    assert server.requests and max(server.requests) <= 5
+    aantal_requests = len(server.requests)
+    engine.close()
+
+    # Zelfde backend: alles uit de cache, geen nieuwe requests
+    engine = RoutingEngine(url, max_coordinates=5, cache=RouteCache(cache_pad, url + "/", "driving"))
+    assert engine.route_pairs(PAREN) == resultaten
+    assert len(server.requests) == aantal_requests
+    assert engine.cache.hits == len(PAREN)
+    engine.close()
+
+
+def test_cache_per_backend_url(stub_server, tmp_path):
+    cache_pad = str(tmp_path / "route_cache.sqlite")
+    eerste, tweede = Osrm(factor=1.0), Osrm(factor=2.0)
+    url_eerste, url_tweede = stub_server(eerste), stub_server(tweede)
+
+    engine = RoutingEngine(url_eerste, cache=RouteCache(cache_pad, url_eerste, "driving"))
+    engine.route_pairs(PAREN)
+    engine.close()
+
+    # Zelfde profiel en cache bestand, andere backend: de resultaten van de eerste worden niet gebruikt
+    engine = RoutingEngine(url_tweede, cache=RouteCache(cache_pad, url_tweede, "driving"))
+    resultaten = engine.route_pairs(PAREN)
+    assert resultaten == {(round_coord(*b), round_coord(*d)): verwacht(b, d, factor=2.0) for b, d in PAREN}
+    assert engine.cache.hits == 0 and tweede.requests
+    engine.close()
+
+
+def test_fout_wordt_niet_gecached(stub_server, tmp_path):
+    server = Osrm(status=503)
+    url = stub_server(server)
+    cache_pad = str(tmp_path / "route_cache.sqlite")
+
+    engine = RoutingEngine(url, cache=RouteCache(cache_pad, url, "driving"))
+    resultaten = engine.route_pairs(PAREN[:3])
+    assert set(resultaten.values()) == {(None, None)}
+    assert engine.fouten == 1
+    engine.close()
+
+    server.status = 200
+    engine = RoutingEngine(url, cache=RouteCache(cache_pad, url, "driving"))
+    assert engine.route_pairs(PAREN[:3]) == {(round_coord(*b), round_coord(*d)): verwacht(b, d) for b, d in PAREN[:3]}
+    engine.close()